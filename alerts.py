@@ -0,0 +1,235 @@
+import bisect
+import itertools
+import re
+import time
+
+# Regeltypen
+ABOVE = ">"                    # Wert steigt über eine Schwelle
+BELOW = "<"                    # Wert fällt unter eine Schwelle
+CROSS_ABOVE = "crosses_above"  # Feld kreuzt ein anderes Feld von unten (z.B. macd / signal)
+CROSS_BELOW = "crosses_below"
+CHANGE = "change"              # Feld ändert sich um mindestens |delta|, steigend oder fallend (z.B. score)
+
+WILDCARD = "*"                 # Regel gilt für alle Symbole
+
+_RULE_PATTERN = re.compile(
+    r"^\s*(\w+)\s*(>|<|crosses_above|crosses_below|change)\s*([-+\w.eE]+)\s*$"
+)
+
+
+class Rule:
+    __slots__ = ("rule_id", "symbol", "field", "kind", "target", "message")
+
+    def __init__(self, rule_id, symbol, field, kind, target, message=None):
+        self.rule_id = rule_id
+        self.symbol = symbol
+        self.field = field
+        self.kind = kind
+        self.target = target      # Schwelle, Delta oder Name des Vergleichsfelds
+        self.message = message
+
+    def __repr__(self):
+        return f"Rule({self.rule_id}, {self.symbol} {self.field} {self.kind} {self.target})"
+
+
+def parse_rule(text):
+    """
+    Zerlegt eine Regel in Textform, z.B.:
+        "rsi < 30", "macd crosses_above signal", "score change 3", "funding_rate > 0.001"
+
+    :return: Tupel (field, kind, target)
+    """
+    match = _RULE_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Ungültige Regel: {text!r}")
+    field, kind, target = match.groups()
+    if kind in (CROSS_ABOVE, CROSS_BELOW):
+        return field, kind, target
+    return field, kind, float(target)
+
+
+class _ThresholdIndex:
+    """Sortierte Schwellen eines (Symbol, Feld)-Paares für Binärsuche"""
+    __slots__ = ("thresholds", "rules")
+
+    def __init__(self):
+        self.thresholds = []
+        self.rules = []
+
+    def add(self, threshold, rule):
+        i = bisect.bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(i, threshold)
+        self.rules.insert(i, rule)
+
+    def remove(self, rule):
+        i = self.rules.index(rule)
+        del self.thresholds[i]
+        del self.rules[i]
+
+
+class AlertEngine:
+    """
+    Hält viele Alarmregeln, indexiert nach (Symbol, Feld). Ein Update eines
+    Symbols prüft nur die Regeln der geänderten Felder; Schwellenregeln werden
+    per Binärsuche über die sortierten Schwellen gefunden (O(log n + Treffer)).
+
+    Schwellen- und Kreuzungsregeln feuern beim Überschreiten (flankengesteuert);
+    beim ersten Wert eines Feldes feuern Schwellenregeln, deren Bedingung
+    bereits erfüllt ist.
+    """
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._rules = {}
+        self._above = {}    # (Symbol, Feld) -> _ThresholdIndex
+        self._below = {}
+        self._change = {}   # (Symbol, Feld) -> _ThresholdIndex über |delta|
+        self._cross = {}    # (Symbol, Feld) -> Liste von Kreuzungsregeln
+        self._values = {}   # (Symbol, Feld) -> letzter Wert
+        self._cross_state = {}  # (Regel-ID, Symbol) -> letztes Vorzeichen der Differenz
+        self._callbacks = []
+
+    def add(self, symbol, rule, message=None):
+        """
+        Fügt eine Regel hinzu.
+
+        :param symbol: z.B. "BTCUSDT" oder "*" für alle Symbole
+        :param rule: Regel als Text (siehe parse_rule) oder Tupel (field, kind, target)
+        :return: Regel-ID
+        """
+        field, kind, target = parse_rule(rule) if isinstance(rule, str) else rule
+        rule = Rule(next(self._ids), symbol.upper() if symbol != WILDCARD else symbol,
+                    field, kind, target, message)
+        self._rules[rule.rule_id] = rule
+        for index, key, value in self._slots(rule):
+            if kind in (CROSS_ABOVE, CROSS_BELOW):
+                index.setdefault(key, []).append(rule)
+            else:
+                index.setdefault(key, _ThresholdIndex()).add(value, rule)
+        return rule.rule_id
+
+    def remove(self, rule_id):
+        rule = self._rules.pop(rule_id)
+        for index, key, value in self._slots(rule):
+            index[key].remove(rule)
+        for key in [key for key in self._cross_state if key[0] == rule_id]:
+            del self._cross_state[key]
+
+    def _slots(self, rule):
+        if rule.kind == ABOVE:
+            return [(self._above, (rule.symbol, rule.field), rule.target)]
+        if rule.kind == BELOW:
+            return [(self._below, (rule.symbol, rule.field), rule.target)]
+        if rule.kind == CHANGE:
+            return [(self._change, (rule.symbol, rule.field), abs(rule.target))]
+        if rule.kind in (CROSS_ABOVE, CROSS_BELOW):
+            return [(self._cross, (rule.symbol, rule.field), None),
+                    (self._cross, (rule.symbol, rule.target), None)]
+        raise ValueError(f"Unbekannter Regeltyp: {rule.kind}")
+
+    def on_alert(self, callback):
+        """Registriert callback(alert), aufgerufen für jeden ausgelösten Alarm"""
+        self._callbacks.append(callback)
+
+    def __len__(self):
+        return len(self._rules)
+
+    def update(self, symbol, values):
+        """
+        Verarbeitet neue Werte eines Symbols (z.B. Indikatoren einer neuen Kerze).
+
+        :param values: Dictionary Feld -> Wert (None/NaN werden ignoriert)
+        :return: Liste der ausgelösten Alarme
+        """
+        symbol = symbol.upper()
+        alerts = []
+        cross_rules = None
+        for field, value in values.items():
+            if value is None or value != value:
+                continue
+            key = (symbol, field)
+            old = self._values.get(key)
+            self._values[key] = value
+            for scope in (key, (WILDCARD, field)):
+                index = self._above.get(scope)
+                if index is not None and (old is None or value > old):
+                    lo = 0 if old is None else bisect.bisect_left(index.thresholds, old)
+                    hi = bisect.bisect_left(index.thresholds, value)
+                    for rule in index.rules[lo:hi]:
+                        alerts.append(self._alert(rule, symbol, value, old))
+                index = self._below.get(scope)
+                if index is not None and (old is None or value < old):
+                    lo = bisect.bisect_right(index.thresholds, value)
+                    hi = len(index.thresholds) if old is None else bisect.bisect_right(index.thresholds, old)
+                    for rule in index.rules[lo:hi]:
+                        alerts.append(self._alert(rule, symbol, value, old))
+                index = self._change.get(scope)
+                if index is not None and old is not None:
+                    hi = bisect.bisect_right(index.thresholds, abs(value - old))
+                    for rule in index.rules[:hi]:
+                        alerts.append(self._alert(rule, symbol, value, old))
+                rules = self._cross.get(scope)
+                if rules:
+                    cross_rules = cross_rules or {}
+                    for rule in rules:
+                        cross_rules[rule.rule_id] = rule
+
+        # Kreuzungen erst nach Übernahme aller Werte prüfen (beide Felder aktuell)
+        for rule in (cross_rules or {}).values():
+            a = self._values.get((symbol, rule.field))
+            b = self._values.get((symbol, rule.target))
+            if a is None or b is None:
+                continue
+            state_key = (rule.rule_id, symbol)
+            sign = a > b
+            previous = self._cross_state.get(state_key)
+            self._cross_state[state_key] = sign
+            if previous is None or previous == sign:
+                continue
+            if sign == (rule.kind == CROSS_ABOVE):
+                alerts.append(self._alert(rule, symbol, a, b))
+
+        for alert in alerts:
+            for callback in self._callbacks:
+                callback(alert)
+        return alerts
+
+    def _alert(self, rule, symbol, value, reference):
+        return {
+            "rule_id": rule.rule_id,
+            "symbol": symbol,
+            "field": rule.field,
+            "kind": rule.kind,
+            "target": rule.target,
+            "value": value,
+            "previous": reference,
+            "message": rule.message or f"{symbol}: {rule.field} {rule.kind} {rule.target} ({value})",
+            "time": time.time(),
+        }
+
+
+if __name__ == "__main__":
+    import random
+
+    engine = AlertEngine()
+    symbols = [f"COIN{i}USDT" for i in range(2000)]
+    for symbol in symbols:
+        engine.add(symbol, f"rsi < {random.randint(15, 35)}")
+        engine.add(symbol, f"rsi > {random.randint(65, 85)}")
+        engine.add(symbol, "macd crosses_above signal")
+    engine.add("*", "funding_rate > 0.001", "Funding-Rate extrem hoch")
+    engine.add("*", "score change 3")
+
+    updates = 0
+    fired = 0
+    start = time.perf_counter()
+    for _ in range(5):
+        for symbol in symbols:
+            fired += len(engine.update(symbol, {
+                "rsi": random.uniform(10, 90), "macd": random.gauss(0, 1), "signal": random.gauss(0, 1),
+                "score": random.randint(0, 20), "funding_rate": random.gauss(0, 0.0005),
+            }))
+            updates += 1
+    elapsed = time.perf_counter() - start
+    print(f"{len(engine)} Regeln, {updates} Updates, {fired} Alarme, "
+          f"{elapsed / updates * 1e6:.1f} µs pro Update")
@@ -0,0 +1,46 @@
+import pandas as pd
+
+# backtesting (inkl. bokeh) und talib werden erst beim ersten Backtest importiert,
+# damit reine Analysen ohne deren Ladezeit starten.
+_strategy = None
+
+def get_strategy():
+    """Erzeugt die Backtesting-Strategie beim ersten Aufruf"""
+    global _strategy
+    if _strategy is None:
+        from backtesting import Strategy
+        import talib
+
+        # Backtesting-Strategie
+        class MyStrategy(Strategy):
+            def init(self):
+                # RSI-Indikator mit Talib
+                self.rsi = self.I(talib.RSI, self.data.Close, 14)
+
+            def next(self):
+                # Kaufsignal, wenn RSI unter 30 liegt
+                if self.rsi[-1] < 30:
+                    self.buy()
+
+        _strategy = MyStrategy
+    return _strategy
+
+def run_backtest(df):
+    """
+    Führt ein Backtesting auf den OHLCV-Daten durch.
+    Wichtige Anpassungen:
+      - Umbenennung der Spalten für Backtesting (Open, High, Low, Close)
+      - Setzen des Index als DatetimeIndex (falls 'timestamp' vorhanden)
+      - Erhöhung des initialen Cash-Betrags
+    """
+    from backtesting import Backtest
+
+    df_bt = df.rename(columns={'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close'})
+
+    # Setze 'timestamp' als Index, falls vorhanden
+    if 'timestamp' in df_bt.columns:
+        df_bt.index = pd.to_datetime(df_bt['timestamp'])
+
+    # Erhöhe den initialen Cash-Betrag (z. B. 50.000 statt 10.000)
+    bt = Backtest(df_bt, get_strategy(), cash=50000, commission=0.002)
+    return bt.run()
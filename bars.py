@@ -0,0 +1,224 @@
+from collections import deque
+
+from kerzen import KlineSeries
+
+# Globale Einstellungen
+HISTORY = 500           # Anzahl abgeschlossener Bars, die pro Definition gehalten werden
+
+
+class BarBuilder:
+    """
+    Basisklasse für Bars aus dem Trade-Stream. Jeder Trade wird in O(1)
+    verarbeitet; sobald die Schließbedingung erfüllt ist, liefert update()
+    die fertige Bar im Format einer Binance-Kline (12 Felder), damit sie mit
+    denselben Funktionen weiterverarbeitet werden kann wie REST-Klines.
+    """
+    __slots__ = ("open_time", "open", "high", "low", "close", "volume",
+                 "quote_volume", "trades", "taker_buy_base", "taker_buy_quote", "last_time")
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.open_time = None
+        self.open = self.high = self.low = self.close = 0.0
+        self.volume = self.quote_volume = 0.0
+        self.taker_buy_base = self.taker_buy_quote = 0.0
+        self.trades = 0
+        self.last_time = None
+
+    def update(self, time_ms, price, qty, maker):
+        """
+        Verarbeitet einen Trade.
+
+        :param maker: True, wenn der Käufer Maker war (Feld "m"), d.h. der Taker verkauft hat
+        :return: fertige Bar als Liste oder None
+        """
+        notional = price * qty
+        if self.open_time is None:
+            self.open_time = time_ms
+            self.open = self.high = self.low = price
+        elif price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.volume += qty
+        self.quote_volume += notional
+        self.trades += 1
+        self.last_time = time_ms
+        if not maker:
+            self.taker_buy_base += qty
+            self.taker_buy_quote += notional
+        if self._complete(qty, notional, maker):
+            return self._emit()
+        return None
+
+    def _complete(self, qty, notional, maker):
+        raise NotImplementedError
+
+    def _emit(self):
+        bar = [self.open_time, self.open, self.high, self.low, self.close, self.volume,
+               self.last_time, self.quote_volume, self.trades,
+               self.taker_buy_base, self.taker_buy_quote, 0]
+        self._reset()
+        return bar
+
+
+class TickBars(BarBuilder):
+    """Schließt nach einer festen Anzahl von Trades"""
+    __slots__ = ("threshold",)
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        super().__init__()
+
+    def _complete(self, qty, notional, maker):
+        return self.trades >= self.threshold
+
+
+class VolumeBars(BarBuilder):
+    """Schließt, sobald das Basisvolumen die Schwelle erreicht"""
+    __slots__ = ("threshold",)
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        super().__init__()
+
+    def _complete(self, qty, notional, maker):
+        return self.volume >= self.threshold
+
+
+class DollarBars(BarBuilder):
+    """Schließt, sobald das Quote-Volumen (z.B. USDT) die Schwelle erreicht"""
+    __slots__ = ("threshold",)
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        super().__init__()
+
+    def _complete(self, qty, notional, maker):
+        return self.quote_volume >= self.threshold
+
+
+class ImbalanceBars(BarBuilder):
+    """
+    Tick-Imbalance-Bars: Jeder Trade zählt +1 (Taker kauft) oder -1 (Taker
+    verkauft). Die Bar schließt, wenn |Summe| die erwartete Imbalance
+    E[T] * E[|2 * P(Kauf) - 1|] übersteigt. Beide Erwartungswerte werden nach
+    jeder Bar per EWMA nachgeführt; E[T] bleibt zwischen min_ticks und
+    max_ticks, damit die Schwelle weder kollabiert noch explodiert.
+    """
+    __slots__ = ("imbalance", "expected_ticks", "expected_imbalance", "alpha",
+                 "min_ticks", "max_ticks")
+
+    def __init__(self, expected_ticks=100, alpha=0.1, min_ticks=10, max_ticks=None):
+        self.expected_ticks = float(expected_ticks)
+        self.expected_imbalance = 0.2   # Startwert für E[|2 * P(Kauf) - 1|]
+        self.alpha = alpha
+        self.min_ticks = min_ticks
+        self.max_ticks = max_ticks or 10 * expected_ticks
+        self.imbalance = 0
+        super().__init__()
+
+    @property
+    def threshold(self):
+        return max(self.expected_ticks * self.expected_imbalance, 1.0)
+
+    def _complete(self, qty, notional, maker):
+        self.imbalance += -1 if maker else 1
+        if self.trades < self.min_ticks or abs(self.imbalance) < self.threshold:
+            return False
+        alpha = self.alpha
+        expected = self.expected_ticks + alpha * (self.trades - self.expected_ticks)
+        self.expected_ticks = min(max(expected, self.min_ticks), self.max_ticks)
+        self.expected_imbalance += alpha * (abs(self.imbalance) / self.trades - self.expected_imbalance)
+        self.imbalance = 0
+        return True
+
+
+BAR_TYPES = {
+    "tick": TickBars,
+    "volume": VolumeBars,
+    "dollar": DollarBars,
+    "imbalance": ImbalanceBars,
+}
+
+
+class BarHub:
+    """
+    Verwaltet beliebig viele Bar-Definitionen pro Symbol, z.B.:
+
+        hub = BarHub()
+        hub.add("BTCUSDT", "dollar_1m", "dollar", 1_000_000)
+        hub.add("BTCUSDT", "tick_500", "tick", 500)
+
+    Abgeschlossene Bars werden pro Definition in einem Ringpuffer gehalten und
+    können als DataFrame direkt an calculate_indicators/calculate_score
+    übergeben werden.
+    """
+
+    def __init__(self, history=HISTORY):
+        self.history = history
+        self._builders = {}   # Symbol -> Liste von (Name, Builder)
+        self._bars = {}       # (Symbol, Name) -> deque abgeschlossener Bars
+        self._callbacks = []
+
+    def add(self, symbol, name, bar_type, *args, **kwargs):
+        builder = BAR_TYPES[bar_type](*args, **kwargs)
+        self._builders.setdefault(symbol.upper(), []).append((name, builder))
+        self._bars[(symbol.upper(), name)] = deque(maxlen=self.history)
+        return builder
+
+    def on_bar(self, callback):
+        """Registriert callback(symbol, name, bar), aufgerufen bei jeder fertigen Bar"""
+        self._callbacks.append(callback)
+
+    def on_trade(self, symbol, time_ms, price, qty, maker):
+        """Leitet einen Trade an alle Definitionen des Symbols weiter"""
+        symbol = symbol.upper()
+        finished = None
+        for name, builder in self._builders.get(symbol, ()):
+            bar = builder.update(time_ms, price, qty, maker)
+            if bar is not None:
+                self._bars[(symbol, name)].append(bar)
+                for callback in self._callbacks:
+                    callback(symbol, name, bar)
+                if finished is None:
+                    finished = []
+                finished.append((name, bar))
+        return finished
+
+    def on_message(self, trade):
+        """Übernimmt eine Nachricht aus dem <symbol>@trade-Stream"""
+        return self.on_trade(trade["s"], trade["T"], float(trade["p"]), float(trade["q"]), trade["m"])
+
+    def bars(self, symbol, name):
+        return list(self._bars[(symbol.upper(), name)])
+
+    def series(self, symbol, name, precision=None):
+        """Abgeschlossene Bars als KlineSeries"""
+        kwargs = {"precision": precision} if precision is not None else {}
+        return KlineSeries.from_klines(symbol.upper(), name, self.bars(symbol, name), **kwargs)
+
+    def frame(self, symbol, name):
+        """Abgeschlossene Bars als DataFrame im Format von get_historical_data"""
+        return self.series(symbol, name).to_frame()
+
+
+if __name__ == "__main__":
+    import random
+
+    hub = BarHub()
+    hub.add("BTCUSDT", "tick_100", "tick", 100)
+    hub.add("BTCUSDT", "volume_5", "volume", 5.0)
+    hub.add("BTCUSDT", "dollar_250k", "dollar", 250_000)
+    hub.add("BTCUSDT", "imbalance", "imbalance", expected_ticks=100)
+
+    price = 50_000.0
+    for i in range(100_000):
+        price *= 1 + random.gauss(0, 0.0001)
+        hub.on_trade("BTCUSDT", i * 10, price, random.expovariate(20), random.random() < 0.5)
+
+    for name in ("tick_100", "volume_5", "dollar_250k", "imbalance"):
+        print(f"{name:<12} {len(hub.bars('BTCUSDT', name))} Bars")
@@ -0,0 +1,383 @@
+import os
+import struct
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import festkomma
+
+# Globale Einstellungen
+BOOK_DIR = "books"              # Wurzelverzeichnis der Orderbuch-Historie
+SNAPSHOT_INTERVAL_MS = 60_000   # Abstand der Vollsnapshots (= Länge eines Blocks)
+COMPRESSION_LEVEL = 6
+
+BID = 0
+ASK = 1
+
+MAGIC = b"BOOK"
+VERSION = 1
+# Magic, Version, Start, Ende, Levelanzahl, komprimierte Länge, Preis-/Mengenstellen
+BLOCK_HEADER = struct.Struct("<4sHqqIIBB")
+
+# Eine Leveländerung; qty = 0 bedeutet "Level entfernt". Preis und Menge als
+# Festkomma (int64) mit den Stellen aus dem Blockheader, siehe festkomma.py.
+# Der erste Zeitpunkt eines Blocks enthält den vollständigen Snapshot.
+LEVEL_DTYPE = np.dtype([
+    ("time", "<i8"),
+    ("side", "u1"),
+    ("price", "<i8"),
+    ("qty", "<i8"),
+])
+
+# Sidecar-Index (<Tag>.idx): ein Eintrag pro Block
+INDEX_DTYPE = np.dtype([
+    ("start", "<i8"),
+    ("end", "<i8"),
+    ("offset", "<i8"),
+])
+
+
+def _day_of(time_ms):
+    return datetime.fromtimestamp(time_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _pack(levels, start):
+    """
+    Spaltenweise (Zeiten als Differenzen, die erste relativ zum Blockstart) und
+    komprimiert – Spalten komprimieren deutlich besser
+    """
+    times = np.diff(levels["time"], prepend=start)
+    raw = b"".join((times.tobytes(), levels["side"].tobytes(),
+                    levels["price"].tobytes(), levels["qty"].tobytes()))
+    return zlib.compress(raw, COMPRESSION_LEVEL)
+
+
+def _unpack(payload, count, start):
+    raw = zlib.decompress(payload)
+    levels = np.empty(count, dtype=LEVEL_DTYPE)
+    offset = 0
+    for name in ("time", "side", "price", "qty"):
+        size = count * LEVEL_DTYPE[name].itemsize
+        levels[name] = np.frombuffer(raw, dtype=LEVEL_DTYPE[name], count=count, offset=offset)
+        offset += size
+    levels["time"] = start + np.cumsum(levels["time"])
+    return levels
+
+
+def _to_levels(order_book_side, fixed):
+    """Level als Dictionary Festkomma-Preis -> Festkomma-Menge (eine Konvertierung pro Seite)"""
+    if not len(order_book_side):
+        return {}
+    levels = np.asarray(order_book_side, dtype=np.float64)
+    return dict(zip(fixed.prices(levels[:, 0]).tolist(), fixed.quantities(levels[:, 1]).tolist()))
+
+
+class _Block:
+    __slots__ = ("start", "end", "rows", "fixed")
+
+    def __init__(self, start, fixed):
+        self.start = start
+        self.end = start
+        self.rows = []
+        self.fixed = fixed      # Festkomma-Stellen des Blocks (gelten für alle Zeilen)
+
+
+class BookTape:
+    """
+    Orderbuch-Historie mit einer Datei pro Symbol und Tag:
+
+        <root>/<SYMBOL>/<YYYY-MM-DD>.book   Blöcke (Header + komprimierte Levels)
+        <root>/<SYMBOL>/<YYYY-MM-DD>.idx    Seek-Index (Start, Ende, Offset je Block)
+
+    Jeder Block beginnt mit einem vollständigen Snapshot, danach folgen nur die
+    geänderten Level (Delta). Preise und Mengen werden als Festkomma-Ganzzahlen
+    gespeichert, Änderungen daher exakt erkannt. Für einen Zeitpunkt t wird
+    per Binärsuche im Index der passende Block gefunden und nur dieser
+    entpackt; Abfragen liefern Preise und Mengen als float.
+    """
+
+    def __init__(self, root=BOOK_DIR, snapshot_interval_ms=SNAPSHOT_INTERVAL_MS):
+        self.root = root
+        self.snapshot_interval_ms = snapshot_interval_ms
+        self._state = {}    # Symbol -> (bids, asks) als Dictionary Festkomma-Preis -> Festkomma-Menge
+        self._blocks = {}   # Symbol -> offener _Block
+
+    def path(self, symbol, day, suffix=".book"):
+        return os.path.join(self.root, symbol.upper(), f"{day}{suffix}")
+
+    def record(self, symbol, order_book, time_ms=None):
+        """
+        Übernimmt einen Orderbuch-Stand (z.B. von orderbuch.get_order_book oder
+        aus dem <symbol>@depth20-Stream) und speichert die Änderungen.
+        """
+        symbol = symbol.upper()
+        time_ms = int(time.time() * 1000) if time_ms is None else int(time_ms)
+        block = self._blocks.get(symbol)
+        fixed = festkomma.for_symbol(symbol)
+        if block is not None and (time_ms - block.start >= self.snapshot_interval_ms
+                                  or block.fixed is not fixed):
+            self._write(symbol, block)
+            block = None
+        book = (_to_levels(order_book.get("bids", []), fixed), _to_levels(order_book.get("asks", []), fixed))
+        if block is None:
+            # Neuer Block: vollständiger Snapshot
+            block = self._blocks[symbol] = _Block(time_ms, fixed)
+            for side, levels in zip((BID, ASK), book):
+                block.rows.extend((time_ms, side, price, qty) for price, qty in levels.items())
+        else:
+            for side, old, new in zip((BID, ASK), self._state[symbol], book):
+                block.rows.extend((time_ms, side, price, 0) for price in old.keys() - new.keys())
+                block.rows.extend((time_ms, side, price, qty) for price, qty in new.items()
+                                  if old.get(price) != qty)
+        block.end = time_ms
+        self._state[symbol] = book
+
+    def _write(self, symbol, block):
+        levels = np.array(block.rows, dtype=LEVEL_DTYPE)
+        payload = _pack(levels, block.start)
+        day = _day_of(block.start)
+        path = self.path(symbol, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            self.index(symbol, day)  # fehlenden oder unvollständigen Index erst neu auf die Platte schreiben
+        with open(path, "ab") as f:
+            offset = f.tell()
+            f.write(BLOCK_HEADER.pack(MAGIC, VERSION, block.start, block.end, len(levels), len(payload),
+                                      block.fixed.price_decimals, block.fixed.qty_decimals))
+            f.write(payload)
+        entry = np.array([(block.start, block.end, offset)], dtype=INDEX_DTYPE)
+        with open(self.path(symbol, day, ".idx"), "ab") as f:
+            f.write(entry.tobytes())
+
+    def flush(self):
+        """Schreibt alle offenen Blöcke (danach beginnt jedes Symbol mit einem neuen Snapshot)"""
+        for symbol, block in self._blocks.items():
+            self._write(symbol, block)
+        self._blocks.clear()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def index(self, symbol, day):
+        """
+        Seek-Index eines Tages. Fehlt er oder deckt er die Datei nicht bis zum
+        Ende ab (z.B. Absturz zwischen dem Schreiben von Block und Indexeintrag),
+        wird er aus den Blockheadern neu aufgebaut und gespeichert.
+        """
+        path = self.path(symbol, day, ".idx")
+        data_path = self.path(symbol, day)
+        if os.path.exists(path) and os.path.getsize(path) % INDEX_DTYPE.itemsize == 0:
+            entries = np.fromfile(path, dtype=INDEX_DTYPE)
+            if self._covers(data_path, entries):
+                return entries
+        entries = []
+        if os.path.exists(data_path):
+            with open(data_path, "rb") as f:
+                while True:
+                    offset = f.tell()
+                    header = f.read(BLOCK_HEADER.size)
+                    if len(header) < BLOCK_HEADER.size:
+                        break
+                    _, _, start, end, _, size, _, _ = BLOCK_HEADER.unpack(header)
+                    entries.append((start, end, offset))
+                    f.seek(size, os.SEEK_CUR)
+            tmp = path + ".tmp"
+            np.array(entries, dtype=INDEX_DTYPE).tofile(tmp)
+            os.replace(tmp, path)
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    @staticmethod
+    def _covers(data_path, entries):
+        """True, wenn der letzte Indexeintrag bis zum Dateiende reicht"""
+        size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        if not len(entries):
+            return size == 0
+        offset = int(entries["offset"][-1])
+        with open(data_path, "rb") as f:
+            f.seek(offset)
+            header = f.read(BLOCK_HEADER.size)
+        if len(header) < BLOCK_HEADER.size:
+            return False
+        return offset + BLOCK_HEADER.size + BLOCK_HEADER.unpack(header)[5] == size
+
+    def read_block(self, symbol, day, offset):
+        """:return: (Levels im Format LEVEL_DTYPE, FixedPoint mit den Stellen des Blocks)"""
+        with open(self.path(symbol, day), "rb") as f:
+            f.seek(offset)
+            magic, version, start, _, count, size, price_decimals, qty_decimals = BLOCK_HEADER.unpack(
+                f.read(BLOCK_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Unbekanntes Orderbuch-Format: {self.path(symbol, day)}")
+            fixed = festkomma.FixedPoint(symbol.upper(), price_decimals, qty_decimals)
+            return _unpack(f.read(size), count, start), fixed
+
+    def _block_at(self, symbol, time_ms):
+        """(Tag, Offset) des letzten Blocks mit Start <= time_ms (sucht auch im Vortag)"""
+        day = datetime.fromtimestamp(time_ms / 1000, tz=timezone.utc).date()
+        for candidate in (day, day - timedelta(days=1)):
+            index = self.index(symbol, candidate.isoformat())
+            i = np.searchsorted(index["start"], time_ms, side="right") - 1
+            if i >= 0:
+                return candidate.isoformat(), int(index["offset"][i])
+        return None
+
+    def book_at(self, symbol, time_ms, depth=None):
+        """
+        Rekonstruiert das Orderbuch zum Zeitpunkt time_ms.
+
+        :return: (bids, asks) als Arrays der Form (Level, 2) mit Preis und Menge,
+                 Bids absteigend, Asks aufsteigend sortiert
+        """
+        empty = np.empty((0, 2))
+        found = self._block_at(symbol.upper(), time_ms)
+        if found is None:
+            return empty, empty
+        levels, fixed = self.read_block(symbol.upper(), *found)
+        levels = levels[:np.searchsorted(levels["time"], time_ms, side="right")]
+        return _state_of(levels, fixed, depth)
+
+    def replay(self, symbol, start_ms, end_ms, depth=None):
+        """
+        Liefert (time_ms, bids, asks) zuerst für den Stand zu start_ms (Snapshot
+        und Deltas davor, sofern schon aufgezeichnet), danach für jeden
+        gespeicherten Stand mit start_ms < t < end_ms
+        """
+        symbol = symbol.upper()
+        found = self._block_at(symbol, start_ms)
+        # Stand zu Beginn des Fensters; entfällt, wenn genau zu start_ms eine Änderung gespeichert ist
+        opening = (start_ms, *self.book_at(symbol, start_ms, depth)) if found is not None else None
+        for state in self._changes(symbol, start_ms, end_ms, depth, found):
+            if opening is not None:
+                if state[0] != start_ms:
+                    yield opening
+                opening = None
+            yield state
+        if opening is not None and start_ms < end_ms:
+            yield opening
+
+    def _changes(self, symbol, start_ms, end_ms, depth, found):
+        """Gespeicherte Stände mit start_ms <= t < end_ms"""
+        first_day = found[0] if found is not None else _day_of(start_ms)
+        for day in self.days(symbol):
+            if day < first_day:
+                continue
+            for start, end, offset in self.index(symbol, day):
+                if end < start_ms:
+                    continue
+                if start >= end_ms:
+                    return
+                levels, fixed = self.read_block(symbol, day, int(offset))
+                times = levels["time"]
+                bounds = np.flatnonzero(np.diff(times)) + 1
+                book = ({}, {})
+                for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(levels)]):
+                    for side, price, qty in zip(levels["side"][lo:hi].tolist(), levels["price"][lo:hi].tolist(),
+                                                levels["qty"][lo:hi].tolist()):
+                        if qty:
+                            book[side][price] = qty
+                        else:
+                            book[side].pop(price, None)
+                    t = int(times[lo])
+                    if start_ms <= t < end_ms:
+                        yield (t, _sorted_side(book[BID], True, depth, fixed),
+                               _sorted_side(book[ASK], False, depth, fixed))
+
+    def days(self, symbol):
+        directory = os.path.join(self.root, symbol.upper())
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-5] for name in os.listdir(directory) if name.endswith(".book"))
+
+
+def _sorted_side(levels, descending, depth, fixed):
+    side = np.array(sorted(levels.items(), reverse=descending), dtype=np.int64).reshape(-1, 2)
+    side = side[:depth] if depth else side
+    return np.column_stack([fixed.to_price(side[:, 0]), fixed.to_qty(side[:, 1])])
+
+
+def _state_of(levels, fixed, depth=None):
+    """Letzter Stand je (Seite, Preis) – vektorisiert statt Level für Level anzuwenden"""
+    reversed_levels = levels[::-1]
+    keys = np.stack([reversed_levels["side"].astype(np.int64), reversed_levels["price"]], axis=1)
+    _, first = np.unique(keys, axis=0, return_index=True)
+    latest = reversed_levels[first]
+    latest = latest[latest["qty"] > 0]
+    sides = []
+    for side, descending in ((BID, True), (ASK, False)):
+        rows = latest[latest["side"] == side]
+        order = np.argsort(rows["price"])
+        if descending:
+            order = order[::-1]
+        rows = rows[order][:depth] if depth else rows[order]
+        sides.append(np.column_stack([fixed.to_price(rows["price"]), fixed.to_qty(rows["qty"])]))
+    return tuple(sides)
+
+
+def record_order_books(symbols, tape, every=10.0, limit=100, duration=None):
+    """
+    Pollt die Orderbücher der Symbole alle `every` Sekunden (Batch-Abruf über
+    den Scheduler mit Backfill-Priorität) und schreibt sie in das BookTape.
+    """
+    import orderbuch
+    import scheduler
+
+    festkomma.load()
+    stop_at = None if duration is None else time.monotonic() + duration
+    while stop_at is None or time.monotonic() < stop_at:
+        started = time.monotonic()
+        books = orderbuch.get_order_books(symbols, limit=limit, priority=scheduler.BACKFILL)
+        now_ms = int(time.time() * 1000)
+        for symbol, book in books.items():
+            if book is not None:
+                tape.record(symbol, book, now_ms)
+        time.sleep(max(0.0, every - (time.monotonic() - started)))
+
+
+async def record_depth_stream(symbols, tape, levels=20, speed="100ms"):
+    """Zeichnet den <symbol>@depth<levels>@<speed>-Stream auf (Zeitstempel = Empfangszeit)"""
+    import asyncio
+
+    from stream_hub import DROP_OLDEST, StreamHub
+
+    await asyncio.to_thread(festkomma.load)
+    hub = StreamHub()
+    consumer = hub.subscribe([f"{s.lower()}@depth{levels}@{speed}" for s in symbols], policy=DROP_OLDEST)
+    async with hub:
+        async for stream, data in consumer:
+            tape.record(stream.split("@", 1)[0], data)
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Speicherbedarf und Zugriffszeit mit einem synthetischen 100-Level-Buch (1 Stand pro Sekunde)
+    root = sys.argv[1] if len(sys.argv) > 1 else "/tmp/book_demo"
+    rng = np.random.default_rng(0)
+    tape = BookTape(root)
+    start_ms = 1_700_000_000_000
+    mid = 100.0
+    updates = 3600
+    for i in range(updates):
+        mid *= np.exp(rng.normal(0, 0.0002))
+        bids = [[f"{round(mid - 0.01 * (k + 1), 2)}", f"{rng.gamma(2, 1) if k < 5 or rng.random() < 0.1 else 1.0:.3f}"]
+                for k in range(100)]
+        asks = [[f"{round(mid + 0.01 * (k + 1), 2)}", f"{rng.gamma(2, 1) if k < 5 or rng.random() < 0.1 else 1.0:.3f}"]
+                for k in range(100)]
+        tape.record("DEMO", {"bids": bids, "asks": asks}, start_ms + i * 1000)
+    tape.close()
+    day = tape.days("DEMO")[0]
+    size = os.path.getsize(tape.path("DEMO", day)) + os.path.getsize(tape.path("DEMO", day, ".idx"))
+    raw = updates * 200 * 16
+    print(f"{updates} Stände: {size / 1024:.0f} KiB (roh {raw / 1024:.0f} KiB, Faktor {raw / size:.1f})")
+    begin = time.perf_counter()
+    for t in rng.integers(start_ms, start_ms + updates * 1000, 100):
+        tape.book_at("DEMO", int(t), depth=20)
+    print(f"book_at: {(time.perf_counter() - begin) * 10:.2f} ms pro Abfrage")
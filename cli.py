@@ -0,0 +1,421 @@
+import time
+
+_START = time.perf_counter()
+
+import argparse
+import importlib
+import json
+import os
+import sys
+
+# Alle schweren Abhängigkeiten (pandas, numpy, ta, talib, backtesting, websockets)
+# werden erst im jeweiligen Unterbefehl geladen. Dieses Modul selbst nutzt nur die
+# Standardbibliothek, damit z.B. `cli.py book BTCUSDT` nicht die Ladezeit von
+# backtesting/bokeh bezahlt.
+
+BACKFILL_DIR = "klines"   # Zielverzeichnis für Backfills
+
+_import_seconds = 0.0
+
+
+def _load(module):
+    """Importiert ein Modul und merkt sich die Ladezeit für --timing"""
+    global _import_seconds
+    start = time.perf_counter()
+    loaded = importlib.import_module(module)
+    _import_seconds += time.perf_counter() - start
+    return loaded
+
+
+# Option -> globale Einstellung des Scanners
+_SCAN_SETTINGS = (("interval", "INTERVAL"), ("min_score", "MIN_SCORE"), ("export", "EXPORT_DIR"),
+                  ("max_symbols", "MAX_SYMBOLS"), ("shards", "SHARDS"), ("listen", "SHARD_LISTEN"))
+
+
+def cmd_scan(args):
+    scanner = _load(args.scanner)
+    unsupported = [f"--{option.replace('_', '-')}" for option, name in _SCAN_SETTINGS
+                   if getattr(args, option) is not None and not hasattr(scanner, name)]
+    if unsupported:
+        print(f"Scanner {args.scanner} unterstützt nicht: {', '.join(unsupported)}", file=sys.stderr)
+        return 1
+    if args.interval:
+        scanner.INTERVAL = args.interval
+    if args.min_score is not None:
+        scanner.MIN_SCORE = args.min_score
+    if args.export:
+        scanner.EXPORT_DIR = args.export
+    if args.shards:
+        scanner.SHARDS = args.shards
+    if args.listen:
+        if not _load("shard").AUTHKEY:
+            print("Für --listen muss SHARD_AUTHKEY gesetzt sein (gemeinsamer Schlüssel der Worker)",
+                  file=sys.stderr)
+            return 1
+        scanner.SHARD_LISTEN = _address(args.listen)
+    if args.max_symbols is not None:
+        scanner.MAX_SYMBOLS = args.max_symbols or None
+    scanner.main()
+
+
+def _address(text):
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def cmd_shard_worker(args):
+    if not _load("shard").AUTHKEY:
+        print("SHARD_AUTHKEY ist nicht gesetzt (gleicher Schlüssel wie beim Koordinator)", file=sys.stderr)
+        return 1
+    _load("shard").run_worker(_address(args.coordinator), name=args.name)
+
+
+def cmd_analyze(args):
+    engine = _load("alerts").AlertEngine()
+    sides = {}  # Regel-ID -> Orderseite; nur Regeln mit "buy:"/"sell:" lösen Orders aus
+    if args.alert:
+        for text in args.alert:
+            side, _, rule = text.rpartition(":")
+            side = side.strip().upper()
+            if side not in ("", "BUY", "SELL"):
+                print(f"Unbekannte Orderseite in {text!r} (erlaubt: buy:, sell:)", file=sys.stderr)
+                return 1
+            rule_id = engine.add("*", rule)
+            if side:
+                sides[rule_id] = side
+    else:
+        sides[engine.add("*", "rsi < 30", "KAUF-Signal: RSI unter 30")] = "BUY"
+    if len(args.symbols) > 1 and args.module != "open":
+        print(f"Mehrere Symbole werden nur von --module open unterstützt, nicht von {args.module}",
+              file=sys.stderr)
+        return 1
+    if args.cache and args.module != "open":
+        print(f"--cache wird nur von --module open unterstützt, nicht von {args.module}", file=sys.stderr)
+        return 1
+    if args.execute and not sides:
+        print("--execute ohne Regel mit Orderseite (z.B. \"buy: rsi < 30\"), es werden keine Orders gesendet",
+              file=sys.stderr)
+
+    kwargs = {}
+    if args.cache:
+        kwargs["cache"] = _load("indikator_cache").IndicatorCache(args.cache)
+    if len(args.symbols) > 1:
+        # Watchlist: alle Requests parallel, Indikatoren in einem Durchlauf
+        analyses = _load("open").get_binance_data_many(args.symbols, args.interval, limit=args.limit, **kwargs)
+    else:
+        module = _load(args.module)
+        data = module.get_binance_data(symbol=args.symbols[0], interval=args.interval, limit=args.limit, **kwargs)
+        analyses = {args.symbols[0]: module.format_output(data) if data else None}
+
+    gateway = None
+    if args.execute and sides:
+        try:
+            gateway = _gateway(args)
+        except (sys.modules["execution"].OrderError, OSError) as e:  # inkl. requests.RequestException
+            print(f"Börse nicht erreichbar, keine Orders möglich: {e}", file=sys.stderr)
+            return 1
+
+    status = None
+    for symbol, analysis in analyses.items():
+        if analysis is None:
+            status = 1
+            continue
+        ohlcv = analysis["technical_data"]["ohlcv"]
+        price = float(ohlcv[-1]["close"]) if len(ohlcv) else None
+        if not args.ohlcv:
+            analysis["technical_data"].pop("ohlcv")
+        print(f"Analyseergebnisse: {symbol}")
+        print(json.dumps(analysis, indent=2, default=str))
+
+        # Alarmregeln auf die aktuellen Indikatoren und Futures-Daten anwenden
+        values = dict(analysis["technical_data"]["indicators"])
+        values.update(analysis["market_sentiment"])
+        values = {k: v for k, v in values.items() if isinstance(v, (int, float))}
+        for alert in engine.update(symbol, values):
+            print(alert["message"])
+            side = sides.get(alert["rule_id"])
+            if gateway is not None and side and price:
+                status = _execute_signal(gateway, alert, side, args.quote / price) or status
+    if gateway is not None:
+        gateway.close()
+    return status
+
+
+def _gateway(args):
+    """Execution-Gateway mit API_KEY/API_SECRET aus der Umgebung bzw. .env (wie main.py)"""
+    execution = _load("execution")
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    gateway = execution.ExecutionGateway(os.getenv("API_KEY"), os.getenv("API_SECRET"),
+                                         base_url=args.exchange, test=args.execute == "test")
+    # Verbindung, Uhrzeit und Filter vor dem ersten Signal vorbereiten
+    return gateway.warm([symbol.upper() for symbol in args.symbols])
+
+
+def _execute_signal(gateway, alert, side, quantity):
+    """Market-Order der Regelseite (BUY/SELL) für einen ausgelösten Alarm"""
+    execution = sys.modules["execution"]
+    try:
+        result = gateway.order(alert["symbol"], side, quantity, signal_time=alert["time"])
+    except (execution.OrderError, OSError) as e:
+        print(f"Order fehlgeschlagen: {e}", file=sys.stderr)
+        return 1
+    latency = result["latency_ms"]
+    print(f"Order {result.get('orderId', '(Test)')} gesendet: Signal -> Bestätigung "
+          f"{latency['signal_to_ack']:.1f} ms (Roundtrip {latency['send_to_ack']:.1f} ms)")
+    return None
+
+
+def cmd_mock_exchange(args):
+    mock_exchange = _load("mock_exchange")
+    if args.bench:
+        mock_exchange.benchmark()
+        return
+    server = mock_exchange.serve(args.host, args.port)
+    print(f"Lokale Börse läuft auf {server.url} (API-Key {mock_exchange.API_KEY!r}, "
+          f"Secret {mock_exchange.API_SECRET!r})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def cmd_screener(args):
+    screener = _load("screener")
+    if args.bench:
+        screener.benchmark()
+        return
+    if args.max_symbols is not None:
+        screener.histori.MAX_SYMBOLS = args.max_symbols or None
+    server = screener.serve(args.host, args.port)
+    server.state.start(args.interval)
+    print(f"Screener-API läuft auf {server.url} (Aktualisierung alle {args.interval:g} s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def cmd_book(args):
+    if args.record:
+        book_tape = _load("book_tape")
+        with book_tape.BookTape(args.record) as tape:
+            try:
+                book_tape.record_order_books(args.symbols, tape, every=args.every,
+                                             limit=args.limit, duration=args.duration)
+            except KeyboardInterrupt:
+                print("Aufzeichnung beendet.")
+        return
+    orderbuch = _load("orderbuch")
+    if len(args.symbols) == 1 and not args.metrics:
+        orderbuch.print_order_book(orderbuch.get_order_book(args.symbols[0], limit=args.limit))
+        return
+    metrics = orderbuch.get_book_metrics(args.symbols, limit=args.limit, notional=args.notional)
+    print(metrics.to_string(float_format=lambda x: f"{x:.6g}"))
+
+
+def cmd_trades(args):
+    asyncio = _load("asyncio")
+    echtzeit = _load("echtzeit_tradedaten")
+    tape = None
+    if args.record:
+        tape = _load("trade_tape").TradeTape(args.record)
+    try:
+        asyncio.run(echtzeit.listen_trades_per_minute(args.symbol.lower(), tape=tape))
+    except KeyboardInterrupt:
+        print("Streaming beendet.")
+    finally:
+        if tape is not None:
+            tape.close()
+
+
+def _time_ms(text):
+    """ISO-Datum bzw. -Zeitpunkt (UTC) in Millisekunden"""
+    from datetime import datetime, timezone
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def cmd_backtest(args):
+    if args.tape:
+        return _tick_backtest(args)
+    module = _load("open")
+    backtest = _load("backtest")
+    data = module.get_binance_data(symbol=args.symbol, interval=args.interval, limit=args.limit)
+    if not data:
+        return 1
+    print("Backtesting-Ergebnisse:")
+    print(backtest.run_backtest(data["ohlcv"]))
+
+
+def _tick_backtest(args):
+    tick_backtest = _load("tick_backtest")
+    trade_tape = _load("trade_tape")
+    tape = trade_tape.TradeTape(args.tape)
+    days = tape.days(args.symbol)
+    if not days:
+        print(f"Keine Trades für {args.symbol.upper()} in {args.tape}", file=sys.stderr)
+        return 1
+    start_ms = _time_ms(args.start or days[0])
+    end_ms = _time_ms(args.end) if args.end else _time_ms(days[-1]) + 86_400_000
+    books = _load("book_tape").BookTape(args.books) if args.books else None
+    if books is not None:
+        strategy = tick_backtest.BookImbalanceStrategy(qty=args.qty)
+    else:
+        strategy = tick_backtest.TradeFlowStrategy(qty=args.qty)
+    result = tick_backtest.backtest_ticks(
+        args.symbol.upper(), strategy, start_ms, end_ms, tape=tape, books=books, depth=args.depth,
+        latency=tick_backtest.LatencyModel(args.latency, args.jitter))
+    result.pop("fill_log")
+    print("Tick-Backtest-Ergebnisse:")
+    for key, value in result.items():
+        print(f"{key:<18} {value:.6g}" if isinstance(value, float) else f"{key:<18} {value}")
+
+
+def cmd_backfill(args):
+    request_cache = _load("request_cache")
+    kerzen = _load("kerzen")
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - int(args.days * 86_400_000)
+    exporter = _load("export").ParquetExporter(args.export) if args.export else None
+    loaded = {}
+    for symbol in args.symbols:
+        klines = request_cache.get_klines_range(symbol, args.interval, start_ms, end_ms)
+        loaded[symbol] = kerzen.KlineSeries.from_klines(symbol, args.interval, klines)
+    # Sortieren und Duplikate entfernen; Lücken hat die Börse selbst (der Bereich ist vollständig geladen)
+    loaded, checks = _load("luecken").repair_many(loaded, args.interval, refetch=False, fill=False)
+    for symbol, series in loaded.items():
+        directory = os.path.join(args.output, symbol)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{args.interval}.npy")
+        series.save(path)
+        check = checks.get(symbol)
+        note = f" ({check.missing_candles} fehlende Kerzen, {check.duplicates} Duplikate)" if check else ""
+        print(f"{symbol}: {len(series)} Kerzen -> {path}{note}")
+        if exporter is not None:
+            exporter.write_klines(symbol, args.interval, series)
+    if exporter is not None:
+        exporter.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Binance-Analysewerkzeuge")
+    parser.add_argument("--timing", action="store_true",
+                        help="Start-, Import- und Gesamtzeit ausgeben")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("scan", help="Marktscanner (Score-Ranking)")
+    p.add_argument("--scanner", choices=["histori", "main"], default="histori")
+    p.add_argument("--interval", help="Zeitrahmen der Kerzen (nur histori)")
+    p.add_argument("--min-score", type=int, help="Mindestscore für die Filterung (nur histori)")
+    p.add_argument("--export", metavar="DIR", help="Alle Scan-Ergebnisse als Parquet exportieren (nur histori)")
+    p.add_argument("--max-symbols", type=int, help="Anzahl analysierter Coins (0 = alle, nur histori)")
+    p.add_argument("--shards", type=int, help="Scan auf N Worker-Prozesse verteilen (nur histori)")
+    p.add_argument("--listen", metavar="HOST:PORT",
+                   help="Koordinator-Adresse für zusätzliche Worker auf anderen Rechnern "
+                        "(ohne Host nur 127.0.0.1; erfordert SHARD_AUTHKEY)")
+    p.set_defaults(func=cmd_scan)
+
+    p = sub.add_parser("shard-worker", help="Worker für einen verteilten Scan (cli.py scan --shards)")
+    p.add_argument("coordinator", metavar="HOST:PORT")
+    p.add_argument("--name")
+    p.set_defaults(func=cmd_shard_worker)
+
+    p = sub.add_parser("analyze", help="Analyse eines oder mehrerer Symbole")
+    p.add_argument("symbols", nargs="+")
+    p.add_argument("--interval", default="30m")
+    p.add_argument("--limit", type=int, default=100)
+    p.add_argument("--module", choices=["open", "copilot", "deep"], default="open",
+                   help="Analysemodul (copilot und deep nur für ein Symbol)")
+    p.add_argument("--ohlcv", action="store_true", help="OHLCV-Daten mit ausgeben")
+    p.add_argument("--alert", action="append", metavar="REGEL",
+                   help='Alarmregel, z.B. "rsi < 30" oder "funding_rate > 0.001" (mehrfach möglich); '
+                        'mit Orderseite "buy: rsi < 30" bzw. "sell: rsi > 70" für --execute')
+    p.add_argument("--cache", metavar="DIR", nargs="?", const="indicator_cache",
+                   help="Indikatoren über den persistenten Indikator-Cache berechnen (nur --module open)")
+    p.add_argument("--execute", choices=["test", "live"],
+                   help="Für Alarme von Regeln mit Orderseite (buy:/sell:) eine Market-Order senden "
+                        "(test = /order/test, nichts wird ausgeführt)")
+    p.add_argument("--quote", type=float, default=10.0, help="Ordergröße in Quote-Währung (z.B. USDT)")
+    p.add_argument("--exchange", default="https://api.binance.com",
+                   help="Basis-URL für Orders, z.B. die lokale Börse von `cli.py mock-exchange`")
+    p.set_defaults(func=cmd_analyze)
+
+    p = sub.add_parser("book", help="Orderbuch bzw. Orderbuch-Kennzahlen")
+    p.add_argument("symbols", nargs="+")
+    p.add_argument("--limit", type=int, default=10)
+    p.add_argument("--metrics", action="store_true", help="Kennzahlen statt Level ausgeben")
+    p.add_argument("--notional", type=float, default=10_000)
+    p.add_argument("--record", metavar="DIR", help="Orderbücher periodisch in die Orderbuch-Historie schreiben")
+    p.add_argument("--every", type=float, default=10.0, help="Abstand der Aufzeichnung in Sekunden")
+    p.add_argument("--duration", type=float, help="Dauer der Aufzeichnung in Sekunden (Standard: unbegrenzt)")
+    p.set_defaults(func=cmd_book)
+
+    p = sub.add_parser("trades", help="Echtzeit-Trades pro Minute")
+    p.add_argument("symbol")
+    p.add_argument("--record", metavar="DIR", help="Trades zusätzlich in ein Trade-Tape schreiben")
+    p.set_defaults(func=cmd_trades)
+
+    p = sub.add_parser("backtest", help="RSI-Backtest auf Binance-Klines bzw. Tick-Backtest auf einem Trade-Tape")
+    p.add_argument("symbol")
+    p.add_argument("--interval", default="30m")
+    p.add_argument("--limit", type=int, default=500)
+    p.add_argument("--tape", metavar="DIR", help="Tick-Backtest auf den aufgezeichneten Trades in DIR")
+    p.add_argument("--books", metavar="DIR", help="Orderbuch-Historie für die Ausführung (nur --tape)")
+    p.add_argument("--start", help="Beginn (ISO, UTC), Standard: erster aufgezeichneter Tag")
+    p.add_argument("--end", help="Ende (ISO, UTC, exklusiv), Standard: Ende des letzten Tages")
+    p.add_argument("--latency", type=float, default=50, help="Orderlatenz in ms (nur --tape)")
+    p.add_argument("--jitter", type=float, default=20, help="mittlerer Latenz-Jitter in ms (nur --tape)")
+    p.add_argument("--qty", type=float, default=0.01, help="Positionsgröße der Beispielstrategie")
+    p.add_argument("--depth", type=int, help="Orderbuch-Level pro Seite (nur --books)")
+    p.set_defaults(func=cmd_backtest)
+
+    p = sub.add_parser("mock-exchange", help="Lokale Börse für Order-Tests (siehe --exchange)")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--bench", action="store_true", help="Signal->Order-Latenz messen und beenden")
+    p.set_defaults(func=cmd_mock_exchange)
+
+    p = sub.add_parser("screener", help="Lokale Read-only-API mit den Ergebnissen des letzten Scans")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8088)
+    p.add_argument("--interval", type=float, default=300, help="Sekunden zwischen zwei Scans")
+    p.add_argument("--max-symbols", type=int, help="Anzahl analysierter Coins (0 = alle)")
+    p.add_argument("--bench", action="store_true", help="Abfragelatenz gegen synthetische Daten messen und beenden")
+    p.set_defaults(func=cmd_screener)
+
+    p = sub.add_parser("backfill", help="Historische Klines als .npy speichern")
+    p.add_argument("symbols", nargs="+")
+    p.add_argument("--interval", default="1h")
+    p.add_argument("--days", type=float, default=30)
+    p.add_argument("--output", default=BACKFILL_DIR)
+    p.add_argument("--export", metavar="DIR", help="Klines zusätzlich als partitioniertes Parquet exportieren")
+    p.set_defaults(func=cmd_backfill)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    ready = time.perf_counter()
+    try:
+        status = args.func(args)
+    except OSError as e:  # requests.RequestException ist eine Unterklasse von OSError
+        print(f"Fehler beim Abruf der Daten: {e}", file=sys.stderr)
+        status = 1
+    if args.timing:
+        done = time.perf_counter()
+        print(f"\nStart (CLI bereit): {(ready - _START) * 1000:.1f} ms, "
+              f"Importe: {_import_seconds * 1000:.1f} ms, "
+              f"Gesamt: {(done - _START) * 1000:.1f} ms", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,8 @@
-import requests
+import request_cache
 import pandas as pd
-from ta import momentum, trend, volatility
 import numpy as np
 from datetime import datetime
-from backtesting import Backtest, Strategy
-from ta import momentum, trend, volatility
+from backtest import run_backtest
 
 BINANCE_API_URL = "https://api.binance.com/api/v3"
 FUTURES_API_URL = "https://fapi.binance.com/fapi/v1"
@@ -21,12 +19,8 @@ def get_binance_data(symbol, interval, limit=100):
     
     # OHLCV-Daten abrufen
     try:
-        response = requests.get(f"{BINANCE_API_URL}/klines", params={
-            "symbol": symbol,
-            "interval": interval,
-            "limit": limit
-        })
-        ohlcv = response.json()
+        # Klines über den gemeinsamen Cache (Single-Flight, geschlossene Kerzen im Speicher)
+        ohlcv = request_cache.get_klines(symbol, interval, limit)
         
         df = pd.DataFrame(ohlcv, columns=[
             'timestamp', 'open', 'high', 'low', 'close', 'volume',
@@ -53,6 +47,7 @@ def get_binance_data(symbol, interval, limit=100):
 
     # Technische Indikatoren berechnen
     try:
+        from ta import momentum, trend, volatility  # erst hier laden (Startzeit)
         df = data['ohlcv'].copy()
         
         # RSI
@@ -93,8 +88,8 @@ def get_binance_data(symbol, interval, limit=100):
     
     # Futures-Daten abrufen
     try:
-        oi = requests.get(f"{FUTURES_API_URL}/openInterest", params={"symbol": symbol}).json()
-        funding = requests.get(f"{FUTURES_API_URL}/fundingRate", params={"symbol": symbol}).json()
+        oi = request_cache.fetch_json(f"{FUTURES_API_URL}/openInterest", {"symbol": symbol})
+        funding = request_cache.fetch_json(f"{FUTURES_API_URL}/fundingRate", {"symbol": symbol})
         data['futures'] = {
             'open_interest': oi,
             'funding_rate': funding
@@ -146,36 +141,6 @@ def format_output(data):
         }
     }
 
-# Backtesting-Strategie
-class MyStrategy(Strategy):
-    def init(self):
-        # RSI-Indikator mit Talib
-        self.rsi = self.I(talib.RSI, self.data.Close, 14)
-        
-    def next(self):
-        # Kaufsignal, wenn RSI unter 30 liegt
-        if self.rsi[-1] < 30:
-            self.buy()
-
-def run_backtest(df):
-    """
-    Führt ein Backtesting auf den OHLCV-Daten durch.
-    Wichtige Anpassungen:
-      - Umbenennung der Spalten für Backtesting (Open, High, Low, Close)
-      - Setzen des Index als DatetimeIndex (falls 'timestamp' vorhanden)
-      - Erhöhung des initialen Cash-Betrags
-    """
-    df_bt = df.rename(columns={'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close'})
-    
-    # Setze 'timestamp' als Index, falls vorhanden
-    if 'timestamp' in df_bt.columns:
-        df_bt.index = pd.to_datetime(df_bt['timestamp'])
-    
-    # Erhöhe den initialen Cash-Betrag (z. B. 50.000 statt 10.000)
-    bt = Backtest(df_bt, MyStrategy, cash=50000, commission=0.002)
-    return bt.run()
-
-
 if __name__ == "__main__":
     btc_data = get_binance_data(symbol="QTUMUSDT", interval="30m", limit=50)
     if btc_data:
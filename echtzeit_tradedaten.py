@@ -1,51 +1,314 @@
 import asyncio
-import websockets
 import json
+import re
+import sys
 import time
+import numpy as np
+import festkomma
+from trade_tape import TradeTape
+from latenz import LatencyMonitor
+from quantile import TradeSizeMonitor
+from stream_hub import BLOCK, StreamHub
 
-async def listen_trades_per_minute(symbol: str = "btcusdt"):
+BATCH_SIZE = 512        # Nachrichten, ab denen sofort verarbeitet wird
+FLUSH_INTERVAL = 0.1    # Sekunden zwischen zwei Verarbeitungsläufen des Timers
+
+# Extrahiert nur die benötigten Felder (E, t, p, q, T, m) aus den Trade-Nachrichten.
+# Die Feldreihenfolge der Binance-Nachrichten ist fest; Felder dazwischen (b, a) werden übersprungen.
+TRADE_PATTERN = re.compile(
+    r'"E":(\d+),"s":"[^"]*","t":(\d+),"p":"([^"]+)","q":"([^"]+)",[^}]*?"T":(\d+),"m":(true|false)'
+)
+MINUTE_MS = 60_000
+
+class TradeAggregator:
+    """
+    Verarbeitet Trade-Nachrichten stapelweise: Ein Regex-Durchlauf über den
+    zusammengefügten Batch ersetzt json.loads pro Nachricht, Preise und Mengen
+    werden spaltenweise in Festkomma-Einheiten (int, siehe festkomma.py)
+    umgerechnet. Zählt Trades und Volumen (exakt) pro Minute der Trade-Zeit
+    (Börsenuhr, Feld "T") und reicht die Trades optional an ein TradeTape,
+    einen BarHub und einen TradeSizeMonitor (Größenverteilung, Wal-Erkennung)
+    weiter. Abgeschlossene Minuten landen als (minute_ms, trades, volumen) in
+    `completed`.
+    """
+
+    def __init__(self, symbol: str, tape=None, bars=None, latency=None, sizes=None, fixed=None):
+        self.symbol = symbol.upper()
+        self.stream = f"{symbol.lower()}@trade"
+        self.tape = tape
+        self.bars = bars
+        self.latency = latency
+        self.sizes = sizes
+        self.fixed = fixed or festkomma.for_symbol(symbol)
+        self.trade_count = 0
+        self.volume_units = 0  # Volumen der laufenden Minute in Mengeneinheiten
+        self.minute = None     # Beginn der laufenden Minute (ms, Börsenzeit)
+        self.completed = []
+
+    @property
+    def total_volume(self):
+        return self.fixed.to_qty(self.volume_units)
+
+    def _parse(self, messages: list):
+        """:return: (trades, Ereigniszeiten E, Preise und Mengen als int64-Arrays)"""
+        matches = TRADE_PATTERN.findall("\n".join(messages))
+        if len(matches) != len(messages):
+            # Unerwartetes Format – auf vollständiges JSON-Parsing zurückfallen
+            return self._decode(json.loads("[" + ",".join(messages) + "]"))
+        if not matches:
+            return self._convert([], [], [], [], [], [])
+        events, ids, prices, quantities, times, makers = zip(*matches)
+        ids, times, events = map(int, ids), map(int, times), [int(e) for e in events]
+        makers = [m == "true" for m in makers]
+        return self._convert(ids, times, prices, quantities, makers, events)
+
+    def _decode(self, decoded: list):
+        """Wie _parse für bereits dekodierte Nachrichten (Dictionaries)"""
+        decoded = [d for d in decoded if d.get("e") == "trade"]
+        ids, times = [d["t"] for d in decoded], [d["T"] for d in decoded]
+        prices, quantities = [d["p"] for d in decoded], [d["q"] for d in decoded]
+        makers, events = [d["m"] for d in decoded], [d.get("E", d["T"]) for d in decoded]
+        return self._convert(ids, times, prices, quantities, makers, events)
+
+    def _convert(self, ids, times, prices, quantities, makers, events):
+        prices, quantities = self.fixed.prices(prices), self.fixed.quantities(quantities)
+        trades = list(zip(ids, times, prices.tolist(), quantities.tolist(), makers))
+        return trades, events, prices, quantities
+
+    def parse_batch(self, messages: list) -> list:
+        """Liefert Tupel (trade_id, time_ms, price, qty, maker) mit Preis/Menge in Einheiten von self.fixed"""
+        return self._parse(messages)[0]
+
+    def _count(self, trades):
+        if self.minute is None:
+            self.minute = trades[0][1] // MINUTE_MS * MINUTE_MS
+        if trades[-1][1] < self.minute + MINUTE_MS:
+            # Normalfall: der ganze Batch gehört zur laufenden Minute
+            self.trade_count += len(trades)
+            self.volume_units += sum(trade[3] for trade in trades)
+            return
+        for trade in trades:
+            if trade[1] >= self.minute + MINUTE_MS:
+                self.completed.append((self.minute, self.trade_count, self.total_volume))
+                self.reset()
+                self.minute = trade[1] // MINUTE_MS * MINUTE_MS
+            self.trade_count += 1
+            self.volume_units += trade[3]
+
+    def add_batch(self, messages: list, received: list = None) -> list:
+        """
+        :param received: lokale Empfangszeiten (time.time()) der Nachrichten für den LatencyMonitor
+        """
+        return self._add(*self._parse(messages), received)
+
+    def _add(self, trades, event_times, prices, quantities, received):
+        if trades:
+            self._count(trades)
+        if self.tape is not None:
+            for trade in trades:
+                self.tape.append(self.symbol, *trade, fixed=self.fixed)
+        if (self.bars is not None or self.sizes is not None) and trades:
+            # BarHub und Größenverteilung rechnen in float
+            float_prices = self.fixed.to_price(prices)
+            float_quantities = self.fixed.to_qty(quantities)
+            if self.bars is not None:
+                for trade, price, qty in zip(trades, float_prices.tolist(), float_quantities.tolist()):
+                    self.bars.on_trade(self.symbol, trade[1], price, qty, trade[4])
+            if self.sizes is not None:
+                self.sizes.add_arrays(np.array([trade[1] for trade in trades], dtype=np.int64), float_prices,
+                                      float_quantities, np.array([trade[4] for trade in trades], dtype=bool))
+        if self.latency is not None and received is not None and len(event_times) == len(received):
+            self.latency.observe_batch(self.stream, event_times, received)
+        return trades
+
+    def reset(self):
+        self.trade_count = 0
+        self.volume_units = 0
+
+def _print_whale(whale):
+    print(f"WAL {whale['symbol']}: {whale['side']} {whale['qty']} zu {whale['price']} "
+          f"({whale['notional']:,.0f} USDT, Schwelle p{whale['percentile'] * 100:g}: {whale['threshold']:,.0f})")
+
+async def listen_trades_per_minute(symbol: str = "btcusdt", tape=None, bars=None, latency=None, sizes=None,
+                                   hub=None):
     """
     Abonniert den Echtzeit-Trades-Stream von Binance für das angegebene Symbol
-    und aggregiert die Trades pro Minute.
-    
+    und aggregiert die Trades pro Minute (nach Trade-Zeit der Börse).
+
     Es werden pro Minute:
       - Die Anzahl der Trades gezählt
       - Das gesamte gehandelte Volumen summiert
+      - Die Latenz Börse -> Empfang -> Verarbeitung ausgegeben
+      - Die Verteilung der Tradegrößen (p50/p90/p99) ausgegeben; Wal-Trades
+        über dem gleitenden Perzentil werden sofort gemeldet
+
+    Die Trades kommen über einen stream_hub.StreamHub (Reconnect mit Backoff
+    und erneutem Abonnieren nach Verbindungsabbrüchen) als undekodierte
+    Rohnachrichten; sie werden aus der Queue des Konsumenten blockweise
+    entnommen und stapelweise geparst (sobald BATCH_SIZE erreicht ist oder
+    spätestens alle FLUSH_INTERVAL Sekunden durch einen separaten Timer).
+
+    :param tape: optionales trade_tape.TradeTape, in das jeder Trade geschrieben wird
+    :param bars: optionaler bars.BarHub für Tick-, Volumen-, Dollar- und Imbalance-Bars
+    :param latency: optionaler latenz.LatencyMonitor (Standard: neuer Monitor mit Zeitabgleich)
+    :param sizes: optionaler quantile.TradeSizeMonitor (Standard: neuer Monitor, Wale werden ausgegeben)
+    :param hub: optionaler, mit anderen Konsumenten geteilter StreamHub (Standard: eigener Hub)
     """
-    uri = f"wss://stream.binance.com:9443/ws/{symbol}@trade"
-    async with websockets.connect(uri) as websocket:
-        print(f"Verbunden mit dem Echtzeit-Trades-Stream für {symbol.upper()}!")
-        
-        trades = []            # Hier sammeln wir die Trade-Daten
-        minute_start = time.time()  # Startzeit der aktuellen Minute
+    # Tick-/Lot-Größen für die Festkomma-Darstellung (exchangeInfo, dauerhaft gecacht)
+    await asyncio.to_thread(festkomma.load)
+    latency = latency or LatencyMonitor()
+    if sizes is None:
+        sizes = TradeSizeMonitor(symbol)
+        sizes.on_whale(_print_whale)
+    aggregator = TradeAggregator(symbol, tape=tape, bars=bars, latency=latency, sizes=sizes)
+    pending = []               # Rohnachrichten, die noch nicht verarbeitet wurden
+    received = []              # Empfangszeiten der Frames (time.time() im Hub) der Nachrichten in pending
 
+    def process():
+        nonlocal pending, received
+        if pending:
+            batch, pending = pending, []
+            times, received = received, []
+            aggregator.add_batch(batch, times)
+
+    async def clock_sync():
+        # Uhrenversatz zur Börse regelmäßig neu schätzen (blockierender HTTP-Aufruf im Thread)
+        while True:
+            await asyncio.to_thread(latency.clock.maybe_sync)
+            await asyncio.sleep(60)
+
+    def summarize():
+        process()
+        while aggregator.completed:
+            minute_ms, count, volume = aggregator.completed.pop(0)
+            stats = latency.summary(aggregator.stream)
+            print(f"\n--- Zusammenfassung der Minute {time.strftime('%H:%M', time.gmtime(minute_ms / 1000))} UTC ---")
+            print(f"Anzahl Trades: {count}")
+            print(f"Gesamtvolumen: {volume}")
+            print(f"Latenz Börse->Empfang p50/p99: {stats['exchange_to_receive_p50_ms']} / "
+                  f"{stats['exchange_to_receive_p99_ms']} ms, Empfang->Verarbeitung p99: "
+                  f"{stats['receive_to_processed_p99_ms']} ms, Uhrversatz: {stats['clock_offset_ms']:.1f} ms")
+            while sizes.completed and sizes.completed[0]["minute"] < minute_ms:
+                sizes.completed.pop(0)
+            if sizes.completed and sizes.completed[0]["minute"] == minute_ms:
+                row = sizes.completed.pop(0)
+                print(f"Tradegröße p50/p90/p99/max: {row['qty_p50']:.6g} / {row['qty_p90']:.6g} / "
+                      f"{row['qty_p99']:.6g} / {row['qty_max']:.6g}")
+                print(f"Notional p50/p90/p99/max: {row['notional_p50']:,.0f} / {row['notional_p90']:,.0f} / "
+                      f"{row['notional_p99']:,.0f} / {row['notional_max']:,.0f} USDT")
+            print(f"------------------------------------------\n")
+
+            # Tape-Puffer einmal pro Minute auf die Platte schreiben
+            if tape is not None:
+                tape.flush()
+
+    async def flush_timer():
         while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
             try:
-                # Versuche, eine Nachricht zu empfangen (Timeout nach 1 Sekunde, um den Zeitcheck zu ermöglichen)
-                message = await asyncio.wait_for(websocket.recv(), timeout=1.0)
-                trade_data = json.loads(message)
-                trades.append(trade_data)
-            except asyncio.TimeoutError:
-                # Kein Trade innerhalb von 1 Sekunde empfangen – fahren mit der Überprüfung fort
-                pass
-            
-            current_time = time.time()
-            if current_time - minute_start >= 60:
-                # Aggregation der Trades der letzten Minute
-                trade_count = len(trades)
-                total_volume = sum(float(trade.get("q", 0)) for trade in trades)
-                
-                print(f"\n--- Zusammenfassung der letzten Minute ---")
-                print(f"Anzahl Trades: {trade_count}")
-                print(f"Gesamtvolumen: {total_volume}")
-                print(f"------------------------------------------\n")
-                
-                # Zurücksetzen für die nächste Minute
-                trades = []
-                minute_start = current_time
+                summarize()
+            except Exception as e:
+                # Fehler melden, ohne dass Minutenzusammenfassungen und Tape-Flush dauerhaft ausbleiben
+                print(f"Fehler bei der Verarbeitung der Trades: {type(e).__name__}: {e}")
+
+    own_hub = hub is None
+    hub = hub or StreamHub()
+    # Backpressure statt verworfener Trades: Tape und Minutenzählung brauchen jeden Trade
+    consumer = hub.subscribe(aggregator.stream, maxsize=10 * BATCH_SIZE, policy=BLOCK, raw=True)
+    if own_hub:
+        await hub.start()
+    print(f"Echtzeit-Trades-Stream für {symbol.upper()} abonniert!")
+    tasks = [asyncio.create_task(flush_timer()), asyncio.create_task(clock_sync())]
+    try:
+        while True:
+            # Empfangszeit stammt vom Hub (Ankunft des Frames), nicht von der Entnahme aus der Queue
+            for _, message, received_at in await consumer.get_batch(BATCH_SIZE):
+                pending.append(message)
+                received.append(received_at)
+            if len(pending) >= BATCH_SIZE:
+                process()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        hub.unsubscribe(consumer)
+        if own_hub:
+            await hub.stop()
+
+def benchmark_ingestion(n: int = 500_000, batch_size: int = BATCH_SIZE):
+    """
+    Misst den Durchsatz der Batch-Verarbeitung im Vergleich zu json.loads pro
+    Nachricht (ohne Netzwerk, mit synthetischen Trade-Nachrichten), zuletzt
+    über den StreamHub wie im Live-Betrieb (Combined-Stream-Frames, Rohmodus).
+    """
+    messages = [
+        json.dumps({"e": "trade", "E": 1700000000000 + i, "s": "BTCUSDT", "t": i,
+                    "p": f"{50000 + i % 100:.8f}", "q": f"{0.001 * (i % 50 + 1):.8f}",
+                    "T": 1700000000000 + i, "m": i % 2 == 0, "M": True}, separators=(",", ":"))
+        for i in range(n)
+    ]
+
+    start = time.perf_counter()
+    volume = 0.0
+    for message in messages:
+        volume += float(json.loads(message).get("q", 0))
+    baseline = n / (time.perf_counter() - start)
+
+    aggregator = TradeAggregator("BTCUSDT")
+    start = time.perf_counter()
+    for i in range(0, n, batch_size):
+        aggregator.add_batch(messages[i:i + batch_size])
+    batched = n / (time.perf_counter() - start)
+
+    # Gleiche Verarbeitung inklusive Latenzmessung (Empfangszeit pro Nachricht);
+    # die synthetischen Ereigniszeiten liegen weit zurück, daher ohne Rückstandswarnung
+    monitored = TradeAggregator("BTCUSDT", latency=LatencyMonitor(lag_threshold_ms=float("inf")))
+    received = [time.time()] * batch_size
+    start = time.perf_counter()
+    for i in range(0, n, batch_size):
+        batch = messages[i:i + batch_size]
+        monitored.add_batch(batch, received[:len(batch)])
+    with_latency = n / (time.perf_counter() - start)
+
+    # Zusätzlich mit Größenverteilung und Wal-Erkennung
+    sized = TradeAggregator("BTCUSDT", sizes=TradeSizeMonitor("BTCUSDT"))
+    start = time.perf_counter()
+    for i in range(0, n, batch_size):
+        sized.add_batch(messages[i:i + batch_size])
+    with_sizes = n / (time.perf_counter() - start)
+
+    # Wie listen_trades_per_minute: Frames durch den Hub, blockweise aus der Queue
+    frames = ['{"stream":"btcusdt@trade","data":' + message + "}" for message in messages]
+    hubbed = TradeAggregator("BTCUSDT")
+    start = time.perf_counter()
+    asyncio.run(_through_hub(frames, hubbed, batch_size))
+    through_hub = n / (time.perf_counter() - start)
+    assert sum(c[1] for c in hubbed.completed) + hubbed.trade_count == n
+
+    completed = aggregator.completed + [(aggregator.minute, aggregator.trade_count, aggregator.total_volume)]
+    assert sum(c[1] for c in completed) == n
+    assert abs(sum(c[2] for c in completed) - volume) < 1e-6 * volume
+    print(f"json.loads pro Nachricht: {baseline:>12,.0f} Trades/s")
+    print(f"Batch (Größe {batch_size}):     {batched:>12,.0f} Trades/s")
+    print(f"Batch mit Latenzmessung:  {with_latency:>12,.0f} Trades/s")
+    print(f"Batch mit Größenskizze:   {with_sizes:>12,.0f} Trades/s")
+    print(f"Über den StreamHub:       {through_hub:>12,.0f} Trades/s")
+
+async def _through_hub(frames, aggregator, batch_size):
+    hub = StreamHub()
+    consumer = hub.subscribe(aggregator.stream, maxsize=batch_size, raw=True)
+    for i in range(0, len(frames), batch_size):
+        for frame in frames[i:i + batch_size]:
+            hub._on_frame(frame, time.time())
+        batch = await consumer.get_batch(batch_size)
+        aggregator.add_batch([message for _, message, _ in batch])
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        benchmark_ingestion()
+        sys.exit()
     try:
-        asyncio.run(listen_trades_per_minute("btcusdt"))
+        with TradeTape() as tape:
+            asyncio.run(listen_trades_per_minute("btcusdt", tape=tape))
     except KeyboardInterrupt:
         print("Streaming beendet.")
@@ -0,0 +1,245 @@
+import hashlib
+import hmac
+import math
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import festkomma
+import metriken
+import request_cache
+import scheduler
+
+# Globale Einstellungen
+API_URL = "https://api.binance.com"
+ORDER_PATH = "/api/v3/order"
+TEST_ORDER_PATH = "/api/v3/order/test"   # prüft Signatur und Filter, ohne die Order auszuführen
+RECV_WINDOW = 5000          # ms, die eine signierte Anfrage gültig bleibt
+KEEPALIVE_INTERVAL = 30     # Sekunden ohne Anfrage, nach denen die Verbindung per /ping warm gehalten wird
+TIMEOUT = 5                 # Sekunden pro Order-Request
+ORDER_WEIGHT = 1
+
+BUY = "BUY"
+SELL = "SELL"
+
+
+class OrderError(Exception):
+    """Order wurde lokal (Filter) oder von der Börse abgelehnt"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class SymbolFilters:
+    """
+    Tick- und Lot-Größen eines Symbols (PRICE_FILTER, LOT_SIZE, NOTIONAL bzw.
+    MIN_NOTIONAL aus /exchangeInfo). Preise und Mengen werden ganzzahlig auf
+    Vielfache der Schrittweite gerundet und mit fester Stellenzahl formatiert,
+    so dass die Börse sie nie wegen Rundungsfehlern ablehnt.
+    """
+    __slots__ = ("symbol", "tick_size", "step_size", "min_qty", "max_qty", "min_notional",
+                 "_price_format", "_qty_format")
+
+    def __init__(self, symbol, tick_size, step_size, min_qty=0.0, max_qty=math.inf, min_notional=0.0):
+        self.symbol = symbol
+        self.tick_size = float(tick_size)
+        self.step_size = float(step_size)
+        self.min_qty = float(min_qty)
+        self.max_qty = float(max_qty) or math.inf
+        self.min_notional = float(min_notional)
+        self._price_format = f"{{:.{festkomma.decimals(tick_size)}f}}"
+        self._qty_format = f"{{:.{festkomma.decimals(step_size)}f}}"
+
+    @classmethod
+    def from_exchange_info(cls, info):
+        """:param info: Eintrag aus exchangeInfo["symbols"]"""
+        filters = {f["filterType"]: f for f in info.get("filters", ())}
+        price = filters.get("PRICE_FILTER", {})
+        lot = filters.get("LOT_SIZE", {})
+        notional = filters.get("NOTIONAL") or filters.get("MIN_NOTIONAL") or {}
+        return cls(info["symbol"], price.get("tickSize", "0.00000001"), lot.get("stepSize", "0.00000001"),
+                   lot.get("minQty", 0), lot.get("maxQty", 0), notional.get("minNotional", 0))
+
+    def price(self, price, side=None):
+        """Preis auf den Tick runden: Kauf ab-, Verkauf aufrunden (nie aggressiver als gewünscht)"""
+        ticks = price / self.tick_size
+        if side == BUY:
+            ticks = math.floor(ticks + 1e-9)
+        elif side == SELL:
+            ticks = math.ceil(ticks - 1e-9)
+        else:
+            ticks = round(ticks)
+        return self._price_format.format(ticks * self.tick_size)
+
+    def quantity(self, qty):
+        """Menge auf die Lot-Größe abrunden"""
+        return self._qty_format.format(math.floor(qty / self.step_size + 1e-9) * self.step_size)
+
+    def check(self, qty, price):
+        """Prüft LOT_SIZE und NOTIONAL lokal; :raise OrderError:"""
+        qty = float(qty)
+        if qty < self.min_qty or qty <= 0:
+            raise OrderError(f"{self.symbol}: Menge {qty} unter minQty {self.min_qty}", -1013)
+        if qty > self.max_qty:
+            raise OrderError(f"{self.symbol}: Menge {qty} über maxQty {self.max_qty}", -1013)
+        if price is not None and qty * float(price) < self.min_notional:
+            raise OrderError(f"{self.symbol}: Ordervolumen {qty * float(price):.8g} unter "
+                             f"minNotional {self.min_notional}", -1013)
+
+
+def load_filters(base_url=API_URL):
+    """
+    Filter aller Symbole aus /exchangeInfo. Die Antwort liegt dauerhaft im
+    Request-Cache (dieselbe Abfrage wie die Symbolliste des Scanners).
+
+    :return: Dictionary Symbol -> SymbolFilters
+    """
+    info = request_cache.fetch_json(f"{base_url}/api/v3/exchangeInfo", ttl=None, priority=scheduler.SCAN)
+    return {s["symbol"]: SymbolFilters.from_exchange_info(s) for s in info["symbols"]}
+
+
+class ExecutionGateway:
+    """
+    Sendet signierte Orders mit möglichst wenig Verzögerung:
+
+    - eine persistente Session (TCP/TLS wird per warm() vorab aufgebaut und
+      mit /ping warm gehalten, solange keine Orders gesendet werden),
+    - ein vorbereiteter HMAC-SHA256-Zustand (inneres/äußeres Pad des Secrets
+      sind bereits verarbeitet, pro Order wird nur die Query nachgeschoben),
+    - Tick-/Lot-Größen aus exchangeInfo, die einmalig geladen werden,
+    - Zeitstempel in Börsenzeit über latenz.ClockOffset.
+
+    Pro Order werden die Latenzen Signal -> gesendet, gesendet -> bestätigt und
+    Signal -> bestätigt in metriken erfasst (order_latency).
+    """
+
+    def __init__(self, api_key, api_secret, base_url=API_URL, test=True, filters=None,
+                 clock=None, keepalive=KEEPALIVE_INTERVAL):
+        import latenz
+
+        self.base_url = base_url.rstrip("/")
+        self.order_url = self.base_url + (TEST_ORDER_PATH if test else ORDER_PATH)
+        self.test = test
+        self.filters = filters
+        self.clock = clock or latenz.ClockOffset(url=f"{self.base_url}/api/v3/time")
+        self.keepalive = keepalive
+        self.session = requests.Session()
+        self.session.mount(self.base_url, HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.headers.update({"X-MBX-APIKEY": api_key or "",
+                                     "Content-Type": "application/x-www-form-urlencoded"})
+        self._mac = hmac.new((api_secret or "").encode(), digestmod=hashlib.sha256)
+        self._scheduler = scheduler.for_url(self.order_url)
+        self._last_used = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sign(self, query):
+        mac = self._mac.copy()
+        mac.update(query.encode())
+        return mac.hexdigest()
+
+    def symbol_filters(self, symbol):
+        if self.filters is None:
+            self.filters = load_filters(self.base_url)
+        filters = self.filters.get(symbol)
+        if filters is None:
+            raise OrderError(f"Unbekanntes Symbol: {symbol}", -1121)
+        return filters
+
+    def warm(self, symbols=None):
+        """
+        Baut die Verbindung auf, gleicht die Uhr ab, lädt die Filter und startet
+        den Keepalive-Thread. Danach kostet eine Order nur noch einen Roundtrip.
+        """
+        self._ping()
+        self.clock.maybe_sync(interval=0)
+        for symbol in symbols or ():
+            self.symbol_filters(symbol)
+        if self.keepalive and self._thread is None:
+            self._thread = threading.Thread(target=self._keepalive_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def _ping(self):
+        self.session.get(f"{self.base_url}/api/v3/ping", timeout=TIMEOUT).raise_for_status()
+        self._last_used = time.monotonic()
+
+    def _keepalive_loop(self):
+        while not self._stop.wait(self.keepalive / 2):
+            if time.monotonic() - self._last_used >= self.keepalive:
+                try:
+                    self._ping()
+                except requests.RequestException as e:
+                    print(f"Keepalive zur Börse fehlgeschlagen: {e}")
+            self.clock.maybe_sync()
+
+    def order(self, symbol, side, quantity, price=None, signal_time=None, client_order_id=None):
+        """
+        Sendet eine Market- (ohne price) bzw. Limit-Order (GTC).
+
+        :param signal_time: Zeitpunkt des Signals (time.time(), z.B. alert["time"]) für die Latenzmessung
+        :return: Antwort der Börse, ergänzt um "latency_ms"
+        :raise OrderError: bei Filterverletzung oder Ablehnung durch die Börse
+        """
+        signal_time = time.time() if signal_time is None else signal_time
+        filters = self.symbol_filters(symbol)
+        qty = filters.quantity(quantity)
+        if price is None:
+            filters.check(qty, None)
+            query = f"symbol={symbol}&side={side}&type=MARKET&quantity={qty}"
+        else:
+            limit = filters.price(price, side)
+            filters.check(qty, limit)
+            query = f"symbol={symbol}&side={side}&type=LIMIT&timeInForce=GTC&quantity={qty}&price={limit}"
+        if client_order_id:
+            query += f"&newClientOrderId={client_order_id}"
+        query += f"&newOrderRespType=ACK&recvWindow={RECV_WINDOW}&timestamp={int(self.clock.server_ms())}"
+        # bytes statt str: http.client sendet Header und Body dann in einem Segment (kein Nagle-Delay)
+        body = f"{query}&signature={self.sign(query)}".encode()
+
+        self._scheduler.acquire(ORDER_WEIGHT, scheduler.INTERACTIVE)
+        response = None
+        sent = time.time()
+        try:
+            response = self.session.post(self.order_url, data=body, timeout=TIMEOUT)
+        finally:
+            self._scheduler.release(response)
+        acked = time.time()
+        self._last_used = time.monotonic()
+
+        metriken.record_response(response)
+        for stage, seconds in (("signal_to_send", sent - signal_time), ("send_to_ack", acked - sent),
+                               ("signal_to_ack", acked - signal_time)):
+            metriken.REGISTRY.observe("order_latency", seconds, stage=stage)
+        try:
+            result = response.json()
+        except ValueError:
+            result = {}
+        if response.status_code != 200:
+            metriken.REGISTRY.inc("orders_rejected", symbol=symbol)
+            raise OrderError(f"{symbol}: Order abgelehnt ({response.status_code}): "
+                             f"{result.get('msg', response.text[:200])}", result.get("code"))
+        metriken.REGISTRY.inc("orders_sent", symbol=symbol, test=self.test)
+        result["latency_ms"] = {"signal_to_send": (sent - signal_time) * 1000,
+                                "send_to_ack": (acked - sent) * 1000,
+                                "signal_to_ack": (acked - signal_time) * 1000}
+        return result
+
+    def buy(self, symbol, quantity, price=None, signal_time=None):
+        return self.order(symbol, BUY, quantity, price, signal_time)
+
+    def sell(self, symbol, quantity, price=None, signal_time=None):
+        return self.order(symbol, SELL, quantity, price, signal_time)
+
+    def close(self):
+        self._stop.set()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,208 @@
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# pyarrow wird erst beim Schreiben/Lesen geladen (optionale Abhängigkeit)
+
+# Globale Einstellungen
+EXPORT_DIR = "export"       # Wurzelverzeichnis der Datensätze
+BATCH_ROWS = 50_000         # Zeilen im Puffer, ab denen automatisch geschrieben wird
+ROW_GROUP_SIZE = 64_000     # Zeilen pro Parquet-Row-Group
+COMPRESSION = "zstd"
+
+# Datensätze und ihre Partitionsspalten (Hive-Layout: spalte=wert/...)
+KLINES = "klines"
+INDICATORS = "indicators"
+SCANS = "scans"
+PARTITIONS = {
+    KLINES: ("interval", "date", "symbol"),
+    INDICATORS: ("interval", "date", "symbol"),
+    # Ein Scan enthält alle Symbole; pro Symbol eine Datei wären hunderte Kleinstdateien.
+    # Das Symbol bleibt Spalte, die Dateien sind danach sortiert (Row-Group-Statistiken).
+    SCANS: ("interval", "date"),
+}
+# Granularität der date-Partition: Monate für Kerzen (sonst Kleinstdateien mit 24 Zeilen
+# bei 1h-Kerzen), Tage für Scans
+DATE_UNITS = {KLINES: "M", INDICATORS: "M", SCANS: "D"}
+TIME_COLUMNS = {KLINES: "open_time", INDICATORS: "open_time", SCANS: "scan_time"}
+
+
+def _dates(open_time_ms, unit="D"):
+    """Datum (UTC, YYYY-MM bzw. YYYY-MM-DD) je Zeile aus Millisekunden-Zeitstempeln"""
+    return np.asarray(open_time_ms, dtype="datetime64[ms]").astype(f"datetime64[{unit}]").astype(str)
+
+
+def _to_ms(timestamps):
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        return timestamps.to_numpy().astype("datetime64[ms]").astype(np.int64)
+    return np.asarray(timestamps, dtype=np.int64)
+
+
+class ParquetExporter:
+    """
+    Schreibt Klines, Indikatoren und Scan-Ergebnisse als partitionierte
+    Parquet-Datensätze (<root>/<dataset>/interval=.../date=.../symbol=.../*.parquet).
+
+    Zeilen werden pro Partition gepuffert und in Batches geschrieben (eine Datei
+    pro Partition und Flush), damit ein Scan über hunderte Symbole nicht für jede
+    Zeile eine Datei öffnet. Dateien sind unveränderlich; neue Daten landen in
+    neuen Dateien.
+    """
+
+    def __init__(self, root=EXPORT_DIR, batch_rows=BATCH_ROWS):
+        self.root = root
+        self.batch_rows = batch_rows
+        self._buffers = {}   # (dataset, Partitionswerte) -> Liste von DataFrames
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_klines(self, symbol, interval, klines):
+        """
+        :param klines: KlineSeries oder DataFrame mit 'timestamp' (ms oder datetime)
+        """
+        if hasattr(klines, "data"):
+            df = pd.DataFrame(klines.data)
+        else:
+            df = klines.rename(columns={"timestamp": "open_time"})
+        self._append(KLINES, symbol, interval, df)
+
+    def write_indicators(self, symbol, interval, df):
+        """
+        :param df: DataFrame mit 'timestamp' (ms oder datetime) und beliebigen Indikatorspalten
+        """
+        self._append(INDICATORS, symbol, interval, df.rename(columns={"timestamp": "open_time"}))
+
+    def write_scan(self, results, interval, scan_time=None):
+        """
+        Speichert alle Ergebnisse eines Scans (nicht nur die ausgegebene Top-Liste).
+
+        :param results: Liste von Dictionaries (z.B. analyze_symbol), je mit 'symbol'
+        :param scan_time: Zeitpunkt des Scans in ms (Standard: jetzt)
+        """
+        if not results:
+            return
+        scan_time = int(time.time() * 1000) if scan_time is None else scan_time
+        df = pd.DataFrame(results).sort_values("symbol", kind="stable")
+        df.insert(0, "scan_time", np.int64(scan_time))
+        date = str(_dates([scan_time], DATE_UNITS[SCANS])[0])
+        self._add((SCANS, interval, date), df)
+
+    def _append(self, dataset, symbol, interval, df):
+        df = df.copy()
+        df["open_time"] = _to_ms(df["open_time"])
+        dates = _dates(df["open_time"].to_numpy(), DATE_UNITS[dataset])
+        # Zeilen nach Partition aufteilen (Klines sind sortiert -> zusammenhängende Blöcke)
+        bounds = np.flatnonzero(dates[1:] != dates[:-1]) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(df)]):
+            if end > start:
+                self._add((dataset, interval, str(dates[start]), symbol.upper()), df.iloc[start:end])
+
+    def _add(self, key, df):
+        with self._lock:
+            self._buffers.setdefault(key, []).append(df)
+            self._rows += len(df)
+            full = self._rows >= self.batch_rows
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Schreibt alle gepufferten Partitionen"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        with self._lock:
+            buffers, self._buffers, self._rows = self._buffers, {}, 0
+        for (dataset, *values), frames in buffers.items():
+            directory = os.path.join(self.root, dataset, *(
+                f"{column}={value}" for column, value in zip(PARTITIONS[dataset], values)
+            ))
+            os.makedirs(directory, exist_ok=True)
+            table = pa.Table.from_pandas(pd.concat(frames, ignore_index=True), preserve_index=False)
+            path = os.path.join(directory, f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet")
+            pq.write_table(table, path + ".tmp", row_group_size=ROW_GROUP_SIZE, compression=COMPRESSION)
+            os.replace(path + ".tmp", path)
+
+    def close(self):
+        self.flush()
+
+
+def read(dataset, columns=None, symbols=None, interval=None, start_date=None, end_date=None,
+         root=EXPORT_DIR):
+    """
+    Liest einen exportierten Datensatz. Nur die angefragten Spalten und die
+    passenden Partitionen (Verzeichnisse) werden gelesen; innerhalb der
+    Partitionen wird zusätzlich exakt nach der Zeitspalte gefiltert. Das Schema
+    ist die Vereinigung der gelesenen Dateien: später hinzugekommene Spalten
+    (z.B. buy_slippage_bps im Scan) sind in älteren Dateien None.
+
+    :param columns: Liste der Spalten (None = alle)
+    :param symbols: Liste von Symbolen (None = alle)
+    :param start_date, end_date: "YYYY-MM-DD" (inklusive)
+    :return: DataFrame
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    path = os.path.join(root, dataset)
+    if not os.path.isdir(path):
+        return pd.DataFrame(columns=columns)
+    data = ds.dataset(path, format="parquet", partitioning="hive")
+
+    conditions = []
+    if symbols is not None:
+        conditions.append(ds.field("symbol").isin([s.upper() for s in symbols]))
+    if interval is not None:
+        conditions.append(ds.field("interval") == interval)
+    unit, time_column = DATE_UNITS[dataset], TIME_COLUMNS[dataset]
+    if start_date is not None:
+        start = np.datetime64(start_date, "D")
+        conditions.append(ds.field("date") >= str(start.astype(f"datetime64[{unit}]")))
+        conditions.append(ds.field(time_column) >= int(start.astype("datetime64[ms]").astype(np.int64)))
+    if end_date is not None:
+        end = np.datetime64(end_date, "D")
+        conditions.append(ds.field("date") <= str(end.astype(f"datetime64[{unit}]")))
+        conditions.append(ds.field(time_column) < int((end + 1).astype("datetime64[ms]").astype(np.int64)))
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+
+    # Ohne eigenes Schema übernimmt pyarrow das der ersten Datei und verwirft neuere Spalten
+    schemas = [fragment.physical_schema for fragment in data.get_fragments(filter=condition)]
+    schema = pa.unify_schemas([data.schema, *schemas], promote_options="permissive")
+    data = ds.dataset(path, schema=schema, format="parquet", partitioning="hive")
+    return data.to_table(columns=columns, filter=condition).to_pandas()
+
+
+if __name__ == "__main__":
+    import shutil
+    import sys
+
+    root = sys.argv[1] if len(sys.argv) > 1 else "/tmp/export_demo"
+    shutil.rmtree(root, ignore_errors=True)
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    with ParquetExporter(root) as exporter:
+        for i in range(200):
+            n = 24 * 90
+            close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+            exporter.write_indicators(f"COIN{i}USDT", "1h", pd.DataFrame({
+                "timestamp": 1_700_000_000_000 + np.arange(n, dtype=np.int64) * 3_600_000,
+                "close": close, "rsi": rng.uniform(0, 100, n), "macd": rng.normal(0, 1, n),
+            }))
+    print(f"Export: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    df = read(INDICATORS, columns=["open_time", "symbol", "rsi"], symbols=["COIN7USDT"],
+              start_date="2023-12-01", root=root)
+    print(f"Lesen (1 Symbol, 1 Spalte, ab Datum): {len(df)} Zeilen, "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
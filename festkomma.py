@@ -0,0 +1,188 @@
+import numpy as np
+
+# Globale Einstellungen
+DEFAULT_DECIMALS = 8        # Stellen der Binance-Strings ("0.01000000"); Werte bis ca. 9.2e10 (int64)
+
+_LIMIT = 2.0 ** 63          # Betrag ab hier nicht mehr als int64 darstellbar
+
+
+def decimals(step):
+    """Nachkommastellen einer Schrittweite aus exchangeInfo (z.B. "0.00100000" -> 3)"""
+    text = f"{float(step):.10f}".rstrip("0")
+    return len(text.split(".")[1]) if "." in text else 0
+
+
+def _overflow(scale):
+    # scale kann auch ein Array sein (eine Skalierung pro Symbol, siehe orderbuch.parse_order_books)
+    return ValueError(f"Wert außerhalb des int64-Bereichs bei Skalierung {float(np.max(scale)):g} "
+                      f"(zu viele Nachkommastellen, tickSize/stepSize mit festkomma.load laden)")
+
+
+def to_units(values, scale):
+    """
+    Werte (Strings oder Zahlen) * scale -> int64-Array
+
+    :raise ValueError: wenn ein Wert nicht in int64 passt (oder NaN ist) – statt stillem Überlauf
+    """
+    scaled = np.rint(np.asarray(values, dtype=np.float64) * scale)
+    if not (np.abs(scaled) < _LIMIT).all():
+        raise _overflow(scale)
+    return scaled.astype(np.int64)
+
+
+def _checked(units, scale):
+    if abs(units) >= _LIMIT:
+        raise _overflow(scale)
+    return units
+
+
+def rescale(units, from_decimals, to_decimals):
+    """
+    Ganzzahlige Einheiten exakt auf eine andere Stellenzahl umrechnen
+
+    :raise ValueError: wenn das Ergebnis nicht mehr in int64 passt oder beim
+                       Verringern der Stellen ein Rest entstünde (statt still abzuschneiden)
+    """
+    if to_decimals >= from_decimals:
+        factor = 10 ** (to_decimals - from_decimals)
+        if np.size(units) and int(np.max(np.abs(units))) > (2 ** 63 - 1) // factor:
+            raise ValueError(f"Umrechnung von {from_decimals} auf {to_decimals} Nachkommastellen "
+                             f"überschreitet den int64-Bereich")
+        return units * factor
+    divisor = 10 ** (from_decimals - to_decimals)
+    if np.any(units % divisor):
+        raise ValueError(f"Umrechnung von {from_decimals} auf {to_decimals} Nachkommastellen "
+                         f"ist nicht exakt (Werte mit mehr Stellen)")
+    return units // divisor
+
+
+class FixedPoint:
+    """
+    Festkomma-Darstellung von Preisen und Mengen eines Symbols als int64:
+    Preis * 10^price_decimals bzw. Menge * 10^qty_decimals, mit den Stellen
+    aus tickSize/stepSize. Gültige Preise und Mengen sind damit ganze Zahlen,
+    Gleichheit und Suche nach Preisleveln sind exakt.
+
+    Umgerechnet wird über float64 und Runden auf die nächste Einheit; das ist
+    exakt, solange Wert * 10^decimals unter 2^53 liegt (bei acht Stellen
+    Werte bis etwa 9 * 10^7). Passt ein Wert nicht mehr in int64 (bei acht
+    Stellen ab etwa 9.2 * 10^10, z.B. Mengen bei PEPE oder SHIB ohne geladene
+    exchangeInfo), wird ValueError ausgelöst statt still überzulaufen. Produkte zweier Festkommawerte (Notional)
+    werden als float gerechnet, da sie int64 überlaufen können.
+    """
+    __slots__ = ("symbol", "price_decimals", "qty_decimals", "price_scale", "qty_scale")
+
+    def __init__(self, symbol, price_decimals=DEFAULT_DECIMALS, qty_decimals=DEFAULT_DECIMALS):
+        self.symbol = symbol
+        self.price_decimals = int(price_decimals)
+        self.qty_decimals = int(qty_decimals)
+        self.price_scale = 10 ** self.price_decimals
+        self.qty_scale = 10 ** self.qty_decimals
+
+    @classmethod
+    def from_filters(cls, filters):
+        """:param filters: execution.SymbolFilters (tickSize/stepSize aus exchangeInfo)"""
+        return cls(filters.symbol, decimals(filters.tick_size), decimals(filters.step_size))
+
+    def __repr__(self):
+        return f"FixedPoint({self.symbol!r}, price_decimals={self.price_decimals}, qty_decimals={self.qty_decimals})"
+
+    def price(self, value):
+        """Preis (String oder Zahl) -> int"""
+        return _checked(round(float(value) * self.price_scale), self.price_scale)
+
+    def qty(self, value):
+        """Menge (String oder Zahl) -> int"""
+        return _checked(round(float(value) * self.qty_scale), self.qty_scale)
+
+    def prices(self, values):
+        """Preise (Strings oder Zahlen) -> int64-Array; eine einzige Konvertierung für alle Werte"""
+        return to_units(values, self.price_scale)
+
+    def quantities(self, values):
+        return to_units(values, self.qty_scale)
+
+    def to_price(self, units):
+        """int bzw. int64-Array -> float (nächstgelegener float zum exakten Dezimalwert)"""
+        return units / self.price_scale
+
+    def to_qty(self, units):
+        return units / self.qty_scale
+
+    def format_price(self, units):
+        """Exakte Dezimaldarstellung, z.B. für Orders und Ausgaben"""
+        return _format(int(units), self.price_decimals)
+
+    def format_qty(self, units):
+        return _format(int(units), self.qty_decimals)
+
+
+def _format(units, places):
+    if not places:
+        return str(units)
+    sign = "-" if units < 0 else ""
+    whole, fraction = divmod(abs(units), 10 ** places)
+    return f"{sign}{whole}.{fraction:0{places}d}"
+
+
+# Symbol -> FixedPoint; ohne geladene exchangeInfo gilt DEFAULT_DECIMALS
+_registry = {}
+
+
+def register(fixed_points):
+    """:param fixed_points: Dictionary Symbol -> FixedPoint"""
+    _registry.update(fixed_points)
+
+
+def for_symbol(symbol):
+    """FixedPoint eines Symbols (ohne Netzwerkzugriff; siehe load)"""
+    symbol = symbol.upper()
+    fixed = _registry.get(symbol)
+    if fixed is None:
+        fixed = _registry[symbol] = FixedPoint(symbol)
+    return fixed
+
+
+def load(base_url=None):
+    """
+    Lädt tickSize/stepSize aller Symbole aus /exchangeInfo (dieselbe,
+    dauerhaft gecachte Abfrage wie execution.load_filters) und registriert sie.
+    Ist die Börse nicht erreichbar, bleiben die Standardstellen aktiv.
+
+    :return: Dictionary Symbol -> FixedPoint
+    """
+    import execution
+
+    try:
+        filters = execution.load_filters(base_url or execution.API_URL)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Tick-Größen nicht verfügbar, verwende {DEFAULT_DECIMALS} Nachkommastellen: {e}")
+        return {}
+    fixed_points = {symbol: FixedPoint.from_filters(f) for symbol, f in filters.items()}
+    register(fixed_points)
+    return fixed_points
+
+
+if __name__ == "__main__":
+    import time
+
+    # Parsen von 100 Orderbüchern x 2 x 100 Levels: float-Matrix vs. Festkomma
+    rng = np.random.default_rng(0)
+    prices = [f"{p:.8f}" for p in np.round(60_000 + rng.normal(0, 50, 20_000), 2)]
+    quantities = [f"{q:.8f}" for q in np.round(rng.exponential(0.5, 20_000), 5)]
+    fixed = FixedPoint("BTCUSDT", 2, 5)
+
+    start = time.perf_counter()
+    for _ in range(10):
+        as_float = np.array(prices, dtype=np.float64)
+    floats = (time.perf_counter() - start) / 10
+    start = time.perf_counter()
+    for _ in range(10):
+        as_units = fixed.prices(prices)
+    units = (time.perf_counter() - start) / 10
+    print(f"{len(prices)} Preise: float {floats * 1000:.2f} ms, Festkomma {units * 1000:.2f} ms")
+
+    exact = [int(p.replace(".", "")) // 10 ** 6 for p in prices]
+    print(f"Festkomma exakt: {as_units.tolist() == exact}, "
+          f"Summe der Mengen exakt: {fixed.format_qty(fixed.quantities(quantities).sum())} "
+          f"(float: {sum(float(q) for q in quantities)!r})")
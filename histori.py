@@ -1,63 +1,98 @@
-import requests
 import pandas as pd
-import numpy as np
 import time
+import numpy as np
 from concurrent.futures import ThreadPoolExecutor
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+import metriken
+import request_cache
+import orderbuch
+import korrelation
+import scheduler
+import muster
+import luecken
+from kerzen import KlineSeries
 
 # Globale Einstellungen
 INTERVAL = '1d'         # Zeitrahmen für die Analyse
 DATA_LIMIT = 500        # Anzahl der Datenpunkte
-MAX_WORKERS = 5         # Parallelität für API Requests
+MAX_WORKERS = 16        # Obergrenze der Parallelität (Budget und Tempo regelt der Scheduler)
 MIN_SCORE = 7           # Mindestscore für die Filterung
-
-def create_session():
-    """Erstellt eine Session mit Retry-Logic"""
-    session = requests.Session()
-    retries = Retry(
-        total=5,
-        backoff_factor=0.3,
-        status_forcelist=[429, 500, 502, 503, 504]
-    )
-    session.mount('https://', HTTPAdapter(max_retries=retries))
-    return session
+METRICS_EXPORT = None   # Pfad für Metrik-Export (.prom oder .json), None = aus
+LIQUIDITY_FILTER = False  # Kandidaten mit zu dünnem Orderbuch verwerfen
+LIQUIDITY_NOTIONAL = 10_000  # Ordergröße (USDT) für die Slippage-Berechnung
+MAX_SLIPPAGE_BPS = 20   # Maximal erlaubte Slippage in Basispunkten
+MAX_CORRELATION = None  # z.B. 0.8: Top-Liste ohne stark korrelierte Coins (None = aus)
+MAX_SYMBOLS = 500       # Anzahl analysierter Coins (None = alle USDT-Paare)
+SHARDS = None           # z.B. 4: Scan auf Worker-Prozesse verteilen (siehe shard.py), None = aus
+SHARD_LISTEN = None     # (Host, Port) des Koordinators für entfernte Worker, None = nur lokal
+EXPORT_DIR = None       # Verzeichnis für den Parquet-Export aller Scan-Ergebnisse und Indikatoren, None = aus
+PATTERNS = tuple(muster.PATTERNS)  # Kerzenmuster als zusätzliche Score-Faktoren (leer = aus)
+VALIDATE_KLINES = True  # Kerzen vor den Indikatoren auf Lücken/Duplikate prüfen und reparieren (siehe luecken.py)
 
 def get_binance_trading_pairs():
     """Hole alle aktiven USDT Trading-Paare"""
-    session = create_session()
     url = "https://api.binance.com/api/v3/exchangeInfo"
-    response = session.get(url)
-    data = response.json()
+    data = request_cache.fetch_json(url, ttl=None, priority=scheduler.SCAN)
     return [
         symbol['symbol'] for symbol in data['symbols']
         if symbol['status'] == 'TRADING' and symbol['symbol'].endswith("USDT")
     ]
 
-def get_historical_data(symbol, interval=INTERVAL, limit=DATA_LIMIT):
-    """Hole historische Kursdaten"""
+def get_kline_series(symbol, interval=None, limit=None):
+    """
+    Hole historische Kursdaten als KlineSeries
+
+    :param interval, limit: Standard INTERVAL bzw. DATA_LIMIT (zur Laufzeit gelesen, z.B. nach cli.py scan --interval)
+    """
+    interval = interval or INTERVAL
+    limit = limit or DATA_LIMIT
     try:
-        session = create_session()
-        url = "https://api.binance.com/api/v3/klines"
-        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
-        response = session.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        df = pd.DataFrame(data, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades', 
-            'taker_buy_base', 'taker_buy_quote', 'ignore'
-        ]).apply(pd.to_numeric)
-        return df
+        # Request, Retries und JSON-Parsing laufen über den gemeinsamen Kerzen-Cache
+        data = request_cache.get_klines(symbol, interval, limit, priority=scheduler.SCAN)
+        # Kompakter Container statt 12 Spalten als object -> float64
+        with metriken.stage("to_numeric"):
+            return KlineSeries.from_klines(symbol, interval, data)
     except Exception as e:
         print(f"Fehler bei {symbol}: {str(e)}")
         return None
 
+def get_historical_data(symbol, interval=None, limit=None):
+    """Hole historische Kursdaten"""
+    series = get_kline_series(symbol, interval, limit)
+    return None if series is None else series.to_frame()
+
+def load_series(symbols):
+    """
+    Kerzen aller Symbole parallel laden und anschließend gemeinsam in einem
+    Durchlauf auf Lücken, Duplikate und Rücksprünge prüfen. Nur fehlende
+    Bereiche auffälliger Symbole werden nachgeladen.
+
+    :return: Dictionary Symbol -> KlineSeries
+    """
+    series = {}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [(sym, executor.submit(get_kline_series, sym)) for sym in symbols]
+        for sym, future in futures:
+            result = future.result()
+            if result is not None:
+                series[sym] = result
+            # Rate Limits regelt der Request-Scheduler (Gewichtsbudget statt Pausen)
+    
+    if VALIDATE_KLINES and series:
+        # Prüfung gegen das Intervall, mit dem jede Serie tatsächlich geladen wurde
+        by_interval = {}
+        for sym, s in series.items():
+            by_interval.setdefault(s.interval, {})[sym] = s
+        with metriken.stage("validate_klines"):
+            for interval, group in by_interval.items():
+                repaired, _ = luecken.repair_many(group, interval, priority=scheduler.SCAN)
+                series.update(repaired)
+    return series
+
 def calculate_indicators(df):
     """Berechnung der technischen Indikatoren"""
     # Preprocessing
     df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df = df[['timestamp', 'close', 'volume', 'quote_volume']].copy()
+    df = df[['timestamp', 'open', 'high', 'low', 'close', 'volume', 'quote_volume']].copy()
     
     # RSI
     delta = df['close'].diff()
@@ -100,8 +135,12 @@ def calculate_indicators(df):
     required_columns = ['ma50', 'ma200', 'rsi', 'macd', 'signal', 'vol_ma20']
     return df.dropna(subset=required_columns)
 
-def calculate_score(df):
-    """Berechnung des Bewertungsscores"""
+def calculate_score(df, patterns=None):
+    """
+    Berechnung des Bewertungsscores
+
+    :param patterns: Kerzenmuster der letzten Kerze ({Muster: +1/-1}, siehe muster.scan_frames)
+    """
     latest = df.iloc[-1]
     score = 0
     
@@ -149,15 +188,27 @@ def calculate_score(df):
         if obv_trend:
             score += 2
     
+    # Kerzenmuster (bärische Muster zählen negativ)
+    if patterns:
+        score += muster.pattern_score(patterns)
+    
     return score
 
-def analyze_symbol(symbol):
-    """Analysiere ein einzelnes Symbol"""
-    df = get_historical_data(symbol)
-    if df is None or len(df) < 250:
+def prepare_symbol(symbol, series=None):
+    """
+    Daten laden und Indikatoren berechnen
+
+    :param series: bereits geladene (und geprüfte) KlineSeries, sonst Abruf über den Cache
+    :return: DataFrame oder None
+    """
+    if series is None:
+        series = get_kline_series(symbol)
+    if series is None or len(series) < 250:
         return None
+    df = series.to_frame()
     
-    df = calculate_indicators(df)
+    with metriken.stage("calculate_indicators"):
+        df = calculate_indicators(df)
     if df.empty:
         return None
     
@@ -166,8 +217,13 @@ def analyze_symbol(symbol):
     # Überprüfe auf fehlende Werte
     if any(pd.isna(v) for v in [latest['rsi'], latest['ma50'], latest['ma200']]):
         return None
-    
-    score = calculate_score(df)
+    return df
+
+def score_symbol(symbol, df, patterns=None):
+    """Score und Ergebniszeile eines vorbereiteten Symbols"""
+    latest = df.iloc[-1]
+    with metriken.stage("calculate_score"):
+        score = calculate_score(df, patterns)
     
     return {
         'symbol': symbol,
@@ -178,43 +234,167 @@ def analyze_symbol(symbol):
         'momentum_7d': round(latest['momentum_7d'], 1),
         'ma50_slope': round(latest['ma50_slope'], 2),
         'score': score,
-        'trend': 'Up' if latest['ma50'] > latest['ma200'] else 'Down'
+        'trend': 'Up' if latest['ma50'] > latest['ma200'] else 'Down',
+        'patterns': ','.join(f"{name}{'+' if signal > 0 else '-'}" for name, signal in sorted((patterns or {}).items()))
     }
 
-def main():
-    """Hauptfunktion"""
-    symbols = get_binance_trading_pairs()[:500]  # Analysiere erste 100 Coins
-    
-    print(f"Analysiere {len(symbols)} Coins...")
-    results = []
-    
+def analyze_symbol(symbol):
+    """Analysiere ein einzelnes Symbol"""
+    series = load_series([symbol]).get(symbol)
+    df = prepare_symbol(symbol, series) if series is not None else None
+    if df is None:
+        return None
+    patterns = muster.scan_frames({symbol: df}, PATTERNS).get(symbol) if PATTERNS else None
+    return score_symbol(symbol, df, patterns)
+
+def prepare_frames(symbols):
+    """Daten aller Symbole laden und prüfen, dann Indikatoren; :return: Dictionary Symbol -> DataFrame"""
+    frames = {}
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(analyze_symbol, sym) for sym in symbols]
-        for i, future in enumerate(futures):
+        futures = [(sym, executor.submit(prepare_symbol, sym, series))
+                   for sym, series in load_series(symbols).items()]
+        for sym, future in futures:
             try:
-                result = future.result()
-                if result and result['score'] >= MIN_SCORE:
-                    results.append(result)
+                df = future.result()
+                if df is not None:
+                    frames[sym] = df
             except Exception as e:
                 print(f"Fehler bei Verarbeitung: {str(e)}")
-            
-            # Rate Limit Management
-            if (i + 1) % 10 == 0:
-                time.sleep(1)
+    return frames
+
+def score_frames(frames):
+    """
+    Kerzenmuster für alle Symbole in einem vektorisierten Durchlauf, danach
+    Score und Ergebniszeile je Symbol.
+
+    :return: Liste der Ergebniszeilen (alle bewerteten Coins)
+    """
+    patterns = {}
+    if PATTERNS and frames:
+        with metriken.stage("patterns"):
+            patterns = muster.scan_frames(frames, PATTERNS)
+    
+    scanned = []
+    for sym, df in frames.items():
+        try:
+            scanned.append(score_symbol(sym, df, patterns.get(sym)))
+        except Exception as e:
+            print(f"Fehler bei Verarbeitung: {str(e)}")
+    return scanned
+
+def scan_symbols(symbols):
+    """
+    Analysiert alle Symbole: Daten und Indikatoren parallel, Kerzenmuster
+    anschließend für alle Symbole in einem vektorisierten Durchlauf.
+
+    :return: (Kandidaten mit score >= MIN_SCORE, alle bewerteten Coins)
+    """
+    frames = prepare_frames(symbols)
+    export_indicators(frames)
+    scanned = score_frames(frames)  # auch Coins unter MIN_SCORE (für den Export)
+    results = [r for r in scanned if r['score'] >= MIN_SCORE]
+    return results, scanned
+
+def rank_results(results):
+    """Liquiditätsfilter, Sortierung nach Score und Korrelationsbereinigung der Kandidaten"""
+    # Liquiditätsfilter über die Orderbücher aller Kandidaten (ein Batch-Abruf)
+    if LIQUIDITY_FILTER and results:
+        with metriken.stage("book_metrics"):
+            book = orderbuch.get_book_metrics(
+                [r['symbol'] for r in results], notional=LIQUIDITY_NOTIONAL, priority=scheduler.SCAN
+            )
+        for r in results:
+            r['slippage_bps'] = book['buy_slippage_bps'].get(r['symbol'], np.nan)
+        results = [r for r in results if r['slippage_bps'] <= MAX_SLIPPAGE_BPS]
     
     # Sortiere Ergebnisse nach Score
     sorted_results = sorted(results, key=lambda x: x['score'], reverse=True)
     
-    # Ausgabe der Top 15 Coins
+    # Korrelationsbereinigte Auswahl (Kerzen kommen aus dem Cache des Scans); die Matrix
+    # wird über die Scans hinweg nur um die seither geschlossenen Kerzen fortgeschrieben
+    if MAX_CORRELATION is not None and sorted_results:
+        with metriken.stage("correlation"):
+            now_ms = int(time.time() * 1000)
+            closes = {
+                r['symbol']: [(k[0], float(k[4])) for k in request_cache.get_klines(r['symbol'], INTERVAL, DATA_LIMIT, priority=scheduler.SCAN)
+                              if k[6] < now_ms]
+                for r in sorted_results
+            }
+            rolling = korrelation.shared(closes)
+            sorted_results = korrelation.diversified_top_k(
+                sorted_results, rolling, k=15, max_correlation=MAX_CORRELATION
+            )
+    return sorted_results
+
+def print_top(sorted_results):
+    """Ausgabe der Top 15 Coins"""
     print("\nTop Kandidaten:")
     print(f"{'Symbol':<8} {'Preis':<10} {'Score':<6} {'RSI':<6} {'Vol%':<6} "
-          f"{'M7d%':<6} {'MA50 Slope':<12} {'MACD Hist':<10} {'Trend'}")
+          f"{'M7d%':<6} {'MA50 Slope':<12} {'MACD Hist':<10} {'Trend':<6} {'Muster'}")
     
     for coin in sorted_results[:15]:
         print(f"{coin['symbol']:<8} {coin['price']:<10.2f} {coin['score']:<6} "
               f"{coin['rsi']:<6.1f} {coin['volume_pct']:<6.1f} "
               f"{coin['momentum_7d']:<6.1f} {coin['ma50_slope']:<12.2f} "
-              f"{coin['macd_hist']:<10.4f} {coin['trend']}")
+              f"{coin['macd_hist']:<10.4f} {coin['trend']:<6} {coin.get('patterns', '')}")
+
+def export_scan(scanned):
+    """Vollständiges Scan-Ergebnis als Parquet sichern (partitioniert nach Intervall/Datum)"""
+    if EXPORT_DIR and scanned:
+        import export
+        with metriken.stage("export"):
+            with export.ParquetExporter(EXPORT_DIR) as exporter:
+                exporter.write_scan(scanned, INTERVAL)
+
+# Öffnungszeit der zuletzt exportierten Kerze je (Symbol, Intervall) in diesem Prozess
+_exported_until = {}
+
+def export_indicators(frames):
+    """
+    Kerzen und berechnete Indikatoren der Scan-Frames als Parquet sichern. Nur
+    abgeschlossene Kerzen, und pro Symbol nur die seit dem letzten Export neuen
+    (sonst schriebe jeder Scan die ganze Historie erneut).
+    """
+    if EXPORT_DIR and frames:
+        import export
+        step = request_cache.INTERVAL_MS.get(INTERVAL, 0)
+        now_ms = int(time.time() * 1000)
+        with metriken.stage("export"):
+            with export.ParquetExporter(EXPORT_DIR) as exporter:
+                for sym, df in frames.items():
+                    open_time = df['timestamp'].to_numpy().astype('datetime64[ms]').astype(np.int64)
+                    new = (open_time + step <= now_ms) & (open_time > _exported_until.get((sym, INTERVAL), -1))
+                    if new.any():
+                        exporter.write_indicators(sym, INTERVAL, df[new])
+                        _exported_until[(sym, INTERVAL)] = int(open_time[new].max())
+
+def export_metrics():
+    """Laufzeitmetriken pro Stage/Endpoint exportieren"""
+    if METRICS_EXPORT:
+        with open(METRICS_EXPORT, "w") as f:
+            if METRICS_EXPORT.endswith(".json"):
+                f.write(metriken.export_json())
+            else:
+                f.write(metriken.export_prometheus())
+
+def main():
+    """Hauptfunktion"""
+    symbols = get_binance_trading_pairs()[:MAX_SYMBOLS]
+    
+    print(f"Analysiere {len(symbols)} Coins...")
+    if SHARDS:
+        # Worker exportieren ihre bewerteten Coins selbst und melden nur ihr Top-K
+        import shard
+        if SHARD_LISTEN:
+            # Worker melden sich von anderen Rechnern an (cli.py shard-worker HOST:PORT)
+            results = shard.scan_sharded(symbols, SHARDS, local_workers=0, address=SHARD_LISTEN)
+        else:
+            results = shard.scan_sharded(symbols, SHARDS)
+    else:
+        results, scanned = scan_symbols(symbols)
+        export_scan(scanned)
+    print_top(rank_results(results))
+    export_metrics()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
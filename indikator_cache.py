@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import indikatoren
+import metriken
+
+# Globale Einstellungen
+CACHE_DIR = "indicator_cache"   # Wurzelverzeichnis des Caches
+EMA_WARMUP = 20                 # Vorlauf (x Fensterlänge) beim Fortschreiben rekursiver Indikatoren
+
+
+def _rsi(inputs, window=14):
+    return {"rsi": indikatoren.rsi(inputs["close"], window)}
+
+
+def _macd(inputs, window_fast=12, window_slow=26, window_sign=9):
+    line, signal = indikatoren.macd(inputs["close"], window_fast, window_slow, window_sign)
+    return {"macd": line, "signal": signal}
+
+
+def _sma(inputs, window=50):
+    return {"sma": indikatoren.sma(inputs["close"], window)}
+
+
+def _bollinger(inputs, window=20, window_dev=2):
+    upper, middle, lower = indikatoren.bollinger(inputs["close"], window, window_dev)
+    return {"upper": upper, "middle": middle, "lower": lower}
+
+
+def _atr(inputs, window=14):
+    return {"atr": indikatoren.atr(inputs["high"], inputs["low"], inputs["close"], window)}
+
+
+# Name -> (Funktion, Eingabespalten, Vorlauf in Kerzen für das Fortschreiben)
+# Gleitende Fenster sind mit Vorlauf = Fensterlänge exakt; bei EMA-basierten
+# Indikatoren klingt der Startwert nach EMA_WARMUP Fensterlängen auf < 1e-9 ab.
+INDICATORS = {
+    "rsi": (_rsi, ("close",), lambda p: EMA_WARMUP * p.get("window", 14)),
+    "macd": (_macd, ("close",), lambda p: EMA_WARMUP * (p.get("window_slow", 26) + p.get("window_sign", 9))),
+    "sma": (_sma, ("close",), lambda p: p.get("window", 50)),
+    "bollinger": (_bollinger, ("close",), lambda p: p.get("window", 20)),
+    "atr": (_atr, ("high", "low", "close"), lambda p: EMA_WARMUP * p.get("window", 14)),
+}
+
+
+def _open_times(df):
+    """Öffnungszeiten in Millisekunden (Spalte 'timestamp' als int oder datetime)"""
+    timestamps = df["timestamp"]
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        return timestamps.to_numpy().astype("datetime64[ms]").astype(np.int64)
+    return timestamps.to_numpy(dtype=np.int64)
+
+
+class IndicatorCache:
+    """
+    Persistenter Cache berechneter Indikatorspalten.
+
+    Pro (Symbol, Intervall, Indikator, Parameter) gibt es eine Datei mit den
+    Öffnungszeiten, den Eingabespalten und den Ergebnisspalten als unkomprimierte
+    NumPy-Spalten (.npz). Der angefragte Zeitraum wird über die Öffnungszeiten in
+    der Datei gesucht und genutzt, soweit die gespeicherten Eingaben exakt mit
+    den übergebenen Kerzen übereinstimmen. Ab der ersten Abweichung (typisch:
+    die zuletzt noch offene Kerze) und für neue Kerzen am Ende wird (mit
+    Vorlauf) neu berechnet und angehängt, statt den Eintrag zu verwerfen.
+    Beginnt der Zeitraum vor dem gespeicherten oder weicht schon die erste
+    Kerze ab, werden die gespeicherten Kerzen außerhalb des Zeitraums mit den
+    übergebenen vereinigt und gemeinsam neu berechnet, so dass eine längere
+    Historie erhalten bleibt.
+
+    Werte stammen dabei aus der gesamten gespeicherten Historie: bei EMA-basierten
+    Indikatoren sind sie für ein gleitendes Fenster also "eingeschwungener" als
+    eine Neuberechnung nur auf dem Fenster.
+    """
+
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+
+    def path(self, symbol, interval, indicator, params):
+        params_key = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+        return os.path.join(self.root, symbol.upper(), interval, f"{indicator}-{params_key}.npz")
+
+    def get(self, df, symbol, interval, indicator, **params):
+        """
+        Liefert die Indikatorspalten für alle Zeilen von df.
+
+        :param df: DataFrame mit 'timestamp' und den Eingabespalten (z.B. 'close')
+        :return: DataFrame mit den Ergebnisspalten, Index wie df
+        """
+        func, input_columns, warmup = INDICATORS[indicator]
+        times = _open_times(df)
+        if len(times) == 0:
+            return pd.DataFrame(index=df.index)
+        inputs = {column: df[column].to_numpy(dtype=np.float64) for column in input_columns}
+        path = self.path(symbol, interval, indicator, params)
+
+        cached = self._load(path)
+        offset, matched = self._locate(cached, times, inputs) if cached is not None else (None, 0)
+        if offset is not None:
+            # Gespeicherte Zeilen ab der ersten Abweichung (z.B. die beim letzten Aufruf
+            # noch offene Kerze) verwerfen und wie neue Kerzen fortschreiben
+            cached = {name: values[:offset + matched] for name, values in cached.items()}
+            n_cached = offset + matched
+            n_new = len(times) - matched
+            if n_new <= 0:
+                metriken.REGISTRY.inc("indicator_cache", result="hit", indicator=indicator)
+                return pd.DataFrame({name[4:]: values[offset:offset + len(times)]
+                                     for name, values in cached.items() if name.startswith("out_")},
+                                    index=df.index)
+
+            # Nur die neuen Kerzen berechnen (mit Vorlauf) und anhängen
+            metriken.REGISTRY.inc("indicator_cache", result="extend", indicator=indicator)
+            times = np.concatenate([cached["open_time"], times[-n_new:]])
+            inputs = {c: np.concatenate([cached["in_" + c], v[-n_new:]]) for c, v in inputs.items()}
+            start = max(0, n_cached - warmup(params))
+            tail = func({c: pd.Series(v[start:]) for c, v in inputs.items()}, **params)
+            outputs = {
+                name: np.concatenate([cached["out_" + name], series.to_numpy()[-n_new:]])
+                for name, series in tail.items()
+            }
+        else:
+            metriken.REGISTRY.inc("indicator_cache", result="miss", indicator=indicator)
+            offset = 0
+            if cached is not None:
+                # Gespeicherte Kerzen vor und nach dem angefragten Zeitraum behalten (z.B. eine
+                # längere Historie aus dem Backfill) und über die Vereinigung neu berechnen
+                cached_times = cached["open_time"]
+                offset = int(np.searchsorted(cached_times, times[0]))
+                after = int(np.searchsorted(cached_times, times[-1], side="right"))
+                times = np.concatenate([cached_times[:offset], times, cached_times[after:]])
+                inputs = {c: np.concatenate([cached["in_" + c][:offset], v, cached["in_" + c][after:]])
+                          for c, v in inputs.items()}
+            full = func({c: pd.Series(v) for c, v in inputs.items()}, **params)
+            outputs = {name: series.to_numpy() for name, series in full.items()}
+
+        self._save(path, times, inputs, outputs)
+        end = offset + len(df.index)
+        return pd.DataFrame({name: values[offset:end] for name, values in outputs.items()}, index=df.index)
+
+    @staticmethod
+    def _locate(cached, times, inputs):
+        """
+        :return: (Position von times[0] in der Datei, Anzahl übereinstimmender Zeilen ab dort);
+                 (None, 0), falls schon die erste Zeile abweicht
+        """
+        cached_times = cached["open_time"]
+        offset = int(np.searchsorted(cached_times, times[0]))
+        if offset >= len(cached_times) or cached_times[offset] != times[0]:
+            return None, 0
+        n = min(len(cached_times) - offset, len(times))
+        same = cached_times[offset:offset + n] == times[:n]
+        for column, values in inputs.items():
+            stored = cached["in_" + column][offset:offset + n]
+            same &= (stored == values[:n]) | (np.isnan(stored) & np.isnan(values[:n]))
+        matched = n if same.all() else int(np.argmin(same))
+        if matched == 0:
+            return None, 0
+        return offset, matched
+
+    @staticmethod
+    def _load(path):
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    @staticmethod
+    def _save(path, times, inputs, outputs):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {"open_time": times}
+        arrays.update({"in_" + c: v for c, v in inputs.items()})
+        arrays.update({"out_" + name: v for name, v in outputs.items()})
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    n = 5000
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    df = pd.DataFrame({"timestamp": np.arange(n, dtype=np.int64) * 3_600_000, "close": close,
+                       "high": close * 1.01, "low": close * 0.99})
+    cache = IndicatorCache("/tmp/indicator_cache_demo")
+    for label, frame in (("Neuberechnung", df.iloc[:-10]), ("Treffer", df.iloc[100:-10]),
+                         ("Fortschreiben", df.iloc[110:])):
+        start = time.perf_counter()
+        for window in range(5, 55, 5):
+            cache.get(frame, "DEMO", "1h", "rsi", window=window)
+        print(f"{label:<14} {(time.perf_counter() - start) * 1000:.1f} ms (10 RSI-Parameter)")
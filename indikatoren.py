@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# Vektorisierte Indikatoren mit denselben Formeln wie die `ta`-Bibliothek
+# (RSIIndicator, MACD, SMAIndicator, BollingerBands, AverageTrueRange).
+# Alle Funktionen akzeptieren eine Series oder einen DataFrame mit einer Spalte
+# pro Symbol; führende NaN (kürzere Historie) werden wie ein späterer Start behandelt.
+
+
+def rsi(close, window=14):
+    diff = close.diff(1)
+    up = diff.where(diff > 0, 0.0).where(close.notna())
+    down = (-diff.where(diff < 0, 0.0)).where(close.notna())
+    ema_up = up.ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    ema_down = down.ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    rs = ema_up / ema_down
+    result = 100 - (100 / (1 + rs))
+    return result.mask(ema_down == 0, 100).where(ema_down.notna())
+
+
+def macd(close, window_fast=12, window_slow=26, window_sign=9):
+    """:return: (macd, signal)"""
+    ema_fast = close.ewm(span=window_fast, min_periods=window_fast, adjust=False).mean()
+    ema_slow = close.ewm(span=window_slow, min_periods=window_slow, adjust=False).mean()
+    line = ema_fast - ema_slow
+    signal = line.ewm(span=window_sign, min_periods=window_sign, adjust=False).mean()
+    return line, signal
+
+
+def sma(close, window):
+    return close.rolling(window, min_periods=window).mean()
+
+
+def bollinger(close, window=20, window_dev=2):
+    """:return: (upper, middle, lower)"""
+    middle = close.rolling(window, min_periods=window).mean()
+    std = close.rolling(window, min_periods=window).std(ddof=0)
+    return middle + window_dev * std, middle, middle - window_dev * std
+
+
+def atr(high, low, close, window=14):
+    prev_close = close.shift(1)
+    true_range = np.fmax(np.fmax(high - low, (high - prev_close).abs()), (low - prev_close).abs())
+    # Startwert wie bei ta: Mittelwert der ersten `window` True Ranges, danach Wilder-Glättung
+    valid = true_range.notna().cumsum()
+    seed = true_range.rolling(window, min_periods=window).mean()
+    seeded = true_range.where(valid > window).mask(valid == window, seed)
+    return seeded.ewm(alpha=1 / window, adjust=False).mean()
+
+
+def right_aligned(frames, column):
+    """
+    Stapelt eine Spalte mehrerer Symbol-DataFrames rechtsbündig zu einem
+    DataFrame (Zeilen = Position vom Ende, Spalten = Symbole). Kürzere Historien
+    erhalten führende NaN, so dass keine Lücken innerhalb einer Serie entstehen.
+    """
+    length = max((len(df) for df in frames.values()), default=0)
+    matrix = np.full((length, len(frames)), np.nan)
+    for j, df in enumerate(frames.values()):
+        if len(df):
+            matrix[length - len(df):, j] = df[column].to_numpy(dtype=np.float64)
+    return pd.DataFrame(matrix, columns=list(frames))
@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+
+# Standardgenauigkeit für Preis- und Volumenfelder (np.float32 halbiert den Speicherbedarf)
+DEFAULT_PRECISION = np.float64
+
+# Felder, die aus den 12 Spalten der Binance-Klines übernommen werden (Index in der Rohliste).
+# close_time, taker_buy_* und ignore werden verworfen.
+KLINE_FIELDS = {
+    "open_time": 0,
+    "open": 1,
+    "high": 2,
+    "low": 3,
+    "close": 4,
+    "volume": 5,
+    "quote_volume": 7,
+    "trades": 8,
+}
+
+
+def kline_dtype(precision=DEFAULT_PRECISION):
+    """Strukturierter NumPy-Datentyp für eine Kerze"""
+    precision = np.dtype(precision)
+    return np.dtype([
+        ("open_time", "<i8"),     # Öffnungszeit in Millisekunden
+        ("open", precision),
+        ("high", precision),
+        ("low", precision),
+        ("close", precision),
+        ("volume", precision),
+        ("quote_volume", precision),
+        ("trades", "<i4"),
+    ])
+
+
+class KlineSeries:
+    """
+    Kompakter OHLCV-Container für ein Symbol/Intervall.
+
+    Die Daten liegen in einem einzigen strukturierten NumPy-Array. Die Spalten
+    (z.B. series.close) sind Views ohne Kopie und können direkt an
+    Indikatorfunktionen übergeben werden.
+    """
+    __slots__ = ("symbol", "interval", "data")
+
+    def __init__(self, symbol, interval, data):
+        self.symbol = symbol
+        self.interval = interval
+        self.data = data
+
+    @classmethod
+    def from_klines(cls, symbol, interval, klines, precision=DEFAULT_PRECISION):
+        """
+        Erzeugt die Serie aus der Rohantwort von /api/v3/klines.
+
+        :param klines: Liste der Kerzen (je 12 Felder, Zahlen als Strings)
+        :param precision: np.float32 oder np.float64
+        """
+        dtype = kline_dtype(precision)
+        data = np.empty(len(klines), dtype=dtype)
+        if len(klines):
+            columns = list(zip(*klines))
+            for name, index in KLINE_FIELDS.items():
+                data[name] = np.asarray(columns[index], dtype=dtype[name])
+        return cls(symbol, interval, data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, item):
+        """Slicing liefert eine neue Serie als View auf dieselben Daten"""
+        if isinstance(item, str):
+            return self.data[item]
+        return KlineSeries(self.symbol, self.interval, self.data[item])
+
+    def __repr__(self):
+        return (f"KlineSeries({self.symbol!r}, {self.interval!r}, "
+                f"len={len(self)}, dtype={self.precision.name}, nbytes={self.nbytes})")
+
+    @property
+    def precision(self):
+        return self.data.dtype["close"]
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    @property
+    def open_time(self):
+        return self.data["open_time"]
+
+    @property
+    def open(self):
+        return self.data["open"]
+
+    @property
+    def high(self):
+        return self.data["high"]
+
+    @property
+    def low(self):
+        return self.data["low"]
+
+    @property
+    def close(self):
+        return self.data["close"]
+
+    @property
+    def volume(self):
+        return self.data["volume"]
+
+    @property
+    def quote_volume(self):
+        return self.data["quote_volume"]
+
+    @property
+    def trades(self):
+        return self.data["trades"]
+
+    def tail(self, n):
+        return self[-n:] if n else self[:0]
+
+    def append(self, klines):
+        """Hängt neue Rohkerzen an; eine noch offene letzte Kerze wird ersetzt"""
+        new = KlineSeries.from_klines(self.symbol, self.interval, klines, self.precision).data
+        if len(new) and len(self.data):
+            keep = np.searchsorted(self.data["open_time"], new["open_time"][0])
+            self.data = np.concatenate([self.data[:keep], new])
+        elif len(new):
+            self.data = new
+        return self
+
+    def save(self, path):
+        """Speichert die Serie als .npy-Datei (strukturiertes Array)"""
+        np.save(path, self.data)
+
+    @classmethod
+    def load(cls, path, symbol, interval, mmap=True):
+        """Lädt eine mit save() gespeicherte Serie, standardmäßig memory-mapped"""
+        return cls(symbol, interval, np.load(path, mmap_mode="r" if mmap else None))
+
+    def to_frame(self, columns=None):
+        """
+        Wandelt die Serie in einen DataFrame im Format der Skripte um
+        (Spalte 'timestamp' in Millisekunden statt 'open_time').
+        """
+        columns = columns or list(KLINE_FIELDS)
+        frame = pd.DataFrame({
+            ("timestamp" if name == "open_time" else name): self.data[name]
+            for name in columns
+        })
+        return frame
+
+
+class KlineStore:
+    """Hält viele KlineSeries (Symbol x Intervall) mit überschaubarem Speicherbedarf"""
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        self.precision = precision
+        self._series = {}
+
+    def put(self, symbol, interval, klines):
+        series = self._series.get((symbol, interval))
+        if series is None:
+            series = KlineSeries.from_klines(symbol, interval, klines, self.precision)
+            self._series[(symbol, interval)] = series
+        else:
+            series.append(klines)
+        return series
+
+    def get(self, symbol, interval):
+        return self._series.get((symbol, interval))
+
+    def __len__(self):
+        return len(self._series)
+
+    def __iter__(self):
+        return iter(self._series.values())
+
+    @property
+    def nbytes(self):
+        return sum(series.nbytes for series in self._series.values())
+
+
+def memory_budget(n_series, n_candles, precision=DEFAULT_PRECISION):
+    """
+    Berechnet den Speicherbedarf in Bytes für n_series Serien mit je n_candles Kerzen.
+    Beispiel: 2000 Serien x 500 Kerzen in float32 ≈ 36 MB.
+    """
+    return n_series * n_candles * kline_dtype(precision).itemsize
+
+
+if __name__ == "__main__":
+    for precision in (np.float32, np.float64):
+        size = memory_budget(2000, 500, precision)
+        print(f"{np.dtype(precision).name}: {kline_dtype(precision).itemsize} Bytes/Kerze, "
+              f"2000 Serien x 500 Kerzen = {size / 1e6:.1f} MB")
@@ -0,0 +1,239 @@
+import numpy as np
+
+# Globale Einstellungen
+WINDOW = 100            # Anzahl Renditen im rollierenden Fenster
+MAX_CORRELATION = 0.8   # Maximale Korrelation zu bereits gewählten Symbolen
+
+
+class RollingCorrelation:
+    """
+    Rollierende Kovarianz-/Korrelationsmatrix der Renditen vieler Symbole.
+
+    Statt bei jeder neuen Kerze über das ganze Fenster neu zu rechnen, werden
+    Summen und Kreuzprodukte inkrementell nachgeführt: die neue Rendite wird
+    addiert, die aus dem Fenster fallende abgezogen (O(N²) pro Kerze statt
+    O(Fenster·N²)). Um Rundungsfehler zu begrenzen, wird nach jeweils einem
+    vollen Fensterdurchlauf exakt aus dem Ringpuffer neu berechnet.
+    Fehlende Renditen (NaN) werden als 0 gezählt.
+
+    Über mehrere Scans hinweg wird der Zustand mit extend weitergeführt: nur
+    neu geschlossene Kerzen werden angehängt, neue Symbole und Symbole mit
+    Lücken werden spaltenweise aus ihren Schlusskursen nachgetragen.
+    """
+
+    def __init__(self, symbols, window=WINDOW):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.window = window
+        n = len(self.symbols)
+        self._buffer = np.zeros((window, n))
+        self._sum = np.zeros(n)
+        self._cross = np.zeros((n, n))
+        self._times = np.zeros(window, dtype=np.int64)   # Kerzenzeit je Zeile des Ringpuffers
+        self._pos = 0
+        self.count = 0
+        self._last_prices = None
+        self.last_time = None                           # Zeit der zuletzt angehängten Kerze
+        self._last_seen = np.full(n, -1, dtype=np.int64)  # letzte Kerze mit Preis je Symbol
+
+    def update(self, returns, time_ms=0):
+        """Fügt einen Renditevektor (Reihenfolge wie self.symbols) hinzu"""
+        r = np.nan_to_num(np.asarray(returns, dtype=np.float64))
+        old = self._buffer[self._pos]
+        self._sum += r - old
+        self._cross += np.outer(r, r)
+        self._cross -= np.outer(old, old)
+        self._buffer[self._pos] = r
+        self._times[self._pos] = time_ms
+        self._pos = (self._pos + 1) % self.window
+        self.count += 1
+        if self._pos == 0:
+            self._recompute()
+
+    def update_prices(self, prices, time_ms=0):
+        """
+        Fügt die Schlusskurse einer neu geschlossenen Kerze hinzu
+        (Dictionary Symbol -> Preis oder Array); berechnet daraus Log-Renditen.
+
+        :param time_ms: Öffnungszeit der Kerze (für extend)
+        """
+        if isinstance(prices, dict):
+            prices = np.array([prices.get(symbol, np.nan) for symbol in self.symbols], dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+        if self._last_prices is not None:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self.update(np.log(prices / self._last_prices), time_ms)
+        self._last_prices = np.where(np.isnan(prices), self._last_prices, prices) \
+            if self._last_prices is not None else prices
+        self._last_seen[~np.isnan(prices)] = time_ms
+        self.last_time = time_ms
+
+    def extend(self, closes):
+        """
+        Führt den Zustand mit den Schlusskursen eines neuen Scans weiter:
+        Symbole, die neu sind oder seit ihrer letzten Kerze fehlten, werden aus
+        ihren Kursen nachgetragen (O(Fenster·N) je Symbol), danach werden nur
+        die Kerzen nach last_time angehängt.
+
+        :param closes: Dictionary Symbol -> Liste von (open_time, close) abgeschlossener Kerzen
+        :return: Anzahl angehängter Kerzen, oder None, wenn mehr als ein Fenster
+                 fehlt (dann ist from_closes günstiger)
+        """
+        new_times = sorted({t for series in closes.values() for t, _ in series if t > self.last_time})
+        if len(new_times) > self.window:
+            return None
+        self._add_symbols([symbol for symbol in closes if symbol not in self.index])
+        stale = [symbol for symbol in closes if self._last_seen[self.index[symbol]] < self.last_time]
+        if stale:
+            self._refill({symbol: closes[symbol] for symbol in stale})
+        rows = {t: np.full(len(self.symbols), np.nan) for t in new_times}
+        for symbol, series in closes.items():
+            j = self.index[symbol]
+            for t, close in series:
+                row = rows.get(t)
+                if row is not None:
+                    row[j] = close
+        for t in new_times:
+            self.update_prices(rows[t], t)
+        return len(new_times)
+
+    def _add_symbols(self, symbols):
+        """Neue, vorerst leere Spalten (werden von _refill gefüllt)"""
+        if not symbols:
+            return
+        k = len(symbols)
+        for symbol in symbols:
+            self.index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        self._buffer = np.hstack([self._buffer, np.zeros((self.window, k))])
+        self._sum = np.r_[self._sum, np.zeros(k)]
+        n = len(self.symbols)
+        cross = np.zeros((n, n))
+        cross[:n - k, :n - k] = self._cross
+        self._cross = cross
+        self._last_prices = np.r_[self._last_prices, np.full(k, np.nan)]
+        self._last_seen = np.r_[self._last_seen, np.full(k, -1, dtype=np.int64)]
+
+    def _refill(self, closes):
+        """Ersetzt die Spalten der Symbole durch Renditen aus ihren Kursen zu den Zeiten im Ringpuffer"""
+        columns = [self.index[symbol] for symbol in closes]
+        filled = self._times > 0
+        for symbol, j in zip(closes, columns):
+            series = sorted(closes[symbol])
+            times = np.array([t for t, _ in series], dtype=np.int64)
+            prices = np.array([close for _, close in series], dtype=np.float64)
+            # Rendite einer Zeile: Kurs zu ihrer Zeit gegenüber dem letzten Kurs davor
+            at = np.searchsorted(times, self._times)
+            exact = filled & (at < len(times)) & (times[np.minimum(at, len(times) - 1)] == self._times)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                returns = np.where(exact & (at > 0),
+                                   np.log(prices[np.minimum(at, len(times) - 1)] / prices[np.maximum(at - 1, 0)]),
+                                   0.0)
+            self._buffer[:, j] = np.nan_to_num(returns)
+            last = np.searchsorted(times, self.last_time, side="right") - 1
+            self._last_prices[j] = prices[last] if last >= 0 else np.nan
+            self._last_seen[j] = self.last_time if last >= 0 and times[last] == self.last_time else -1
+        block = self._buffer.T @ self._buffer[:, columns]
+        self._cross[:, columns] = block
+        self._cross[columns, :] = block.T
+        self._sum[columns] = self._buffer[:, columns].sum(axis=0)
+
+    def _recompute(self):
+        self._sum = self._buffer.sum(axis=0)
+        self._cross = self._buffer.T @ self._buffer
+
+    def covariance(self):
+        n = min(self.count, self.window)
+        if n < 2:
+            return np.full((len(self.symbols),) * 2, np.nan)
+        return (self._cross - np.outer(self._sum, self._sum) / n) / (n - 1)
+
+    def correlation(self):
+        cov = self.covariance()
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = cov / np.outer(std, std)
+        corr = np.clip(np.nan_to_num(corr), -1.0, 1.0)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    @classmethod
+    def from_closes(cls, closes, window=WINDOW):
+        """
+        Baut den Zustand aus historischen Schlusskursen auf.
+
+        :param closes: Dictionary Symbol -> Liste von (open_time, close)
+        """
+        symbols = list(closes)
+        times = sorted({t for series in closes.values() for t, _ in series})[-(window + 1):]
+        position = {t: i for i, t in enumerate(times)}
+        matrix = np.full((len(times), len(symbols)), np.nan)
+        for j, symbol in enumerate(symbols):
+            for t, close in closes[symbol]:
+                i = position.get(t)
+                if i is not None:
+                    matrix[i, j] = close
+        rolling = cls(symbols, window)
+        for t, row in zip(times, matrix):
+            rolling.update_prices(row, t)
+        return rolling
+
+
+# Über Scans hinweg weitergeführter Zustand (siehe shared)
+_shared = None
+
+
+def shared(closes, window=WINDOW):
+    """
+    RollingCorrelation für wiederholte Scans: beim ersten Aufruf (oder wenn
+    mehr als ein Fenster fehlt) aus den Kursen aufgebaut, danach nur um die
+    seit dem letzten Aufruf geschlossenen Kerzen fortgeschrieben.
+
+    :param closes: Dictionary Symbol -> Liste von (open_time, close) abgeschlossener Kerzen
+    """
+    global _shared
+    if (_shared is None or _shared.window != window or _shared.last_time is None
+            or _shared.extend(closes) is None):
+        _shared = RollingCorrelation.from_closes(closes, window)
+    return _shared
+
+
+def diversified_top_k(results, rolling, k=15, max_correlation=MAX_CORRELATION):
+    """
+    Wählt aus den nach Score sortierten Scanner-Ergebnissen die besten k aus,
+    wobei ein Kandidat übersprungen wird, wenn seine Renditekorrelation zu einem
+    bereits gewählten Symbol max_correlation übersteigt.
+
+    :param results: Liste von Dictionaries mit 'symbol' und 'score'
+    :param rolling: RollingCorrelation mit den Renditen der Symbole
+    """
+    corr = rolling.correlation()
+    ranked = sorted(results, key=lambda x: x['score'], reverse=True)
+    selected, selected_idx = [], []
+    for result in ranked:
+        i = rolling.index.get(result['symbol'])
+        if i is not None and selected_idx and np.abs(corr[i, selected_idx]).max() > max_correlation:
+            continue
+        selected.append(result)
+        if i is not None:
+            selected_idx.append(i)
+        if len(selected) >= k:
+            break
+    return selected
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    n_symbols, window = 500, WINDOW
+    market = rng.normal(0, 0.01, 2000)
+    returns = market[:, None] * rng.uniform(0, 1.5, n_symbols) + rng.normal(0, 0.01, (2000, n_symbols))
+    rolling = RollingCorrelation([f"S{i}" for i in range(n_symbols)], window)
+    start = time.perf_counter()
+    for row in returns:
+        rolling.update(row)
+    per_update = (time.perf_counter() - start) / len(returns)
+    exact = np.corrcoef(returns[-window:].T)
+    print(f"{n_symbols} Symbole: {per_update * 1000:.2f} ms pro Kerze, "
+          f"max. Abweichung {np.abs(rolling.correlation() - exact).max():.2e}")
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import metriken
+
+# Globale Einstellungen
+TIME_URL = "https://api.binance.com/api/v3/time"
+SYNC_SAMPLES = 5            # Messungen pro Synchronisation (die mit kleinster RTT zählt)
+RESYNC_INTERVAL = 300       # Sekunden zwischen zwei Synchronisationen
+LAG_THRESHOLD_MS = 1000     # Ab diesem Rückstand (Börsenzeit - Ereigniszeit) gilt die Pipeline als hinterher
+LAG_RECOVER_MS = 250        # Unter diesem Rückstand gilt sie wieder als aktuell
+
+
+class ClockOffset:
+    """
+    Schätzt den Versatz der lokalen Uhr gegenüber der Börsenzeit (NTP-Verfahren):
+
+        offset = serverTime - (t_sende + t_empfang) / 2
+
+    Von mehreren Messungen wird die mit der kleinsten Round-Trip-Zeit verwendet;
+    die Unsicherheit ist höchstens RTT / 2.
+    """
+
+    def __init__(self, url=TIME_URL, samples=SYNC_SAMPLES):
+        self.url = url
+        self.samples = samples
+        self.offset_ms = 0.0
+        self.rtt_ms = None
+        self.synced_at = None
+        self._session = None
+
+    def sync(self):
+        """Misst den Versatz neu; :return: offset_ms"""
+        import requests
+        import scheduler
+
+        if self._session is None:
+            self._session = requests.Session()
+        best = None
+        for _ in range(self.samples):
+            sent = time.time() * 1000
+            response = scheduler.send(self._session, self.url, priority=scheduler.INTERACTIVE)
+            received = time.time() * 1000
+            response.raise_for_status()
+            server = response.json()["serverTime"]
+            rtt = received - sent
+            if best is None or rtt < best[1]:
+                best = (server - (sent + received) / 2, rtt)
+        self.offset_ms, self.rtt_ms = best
+        self.synced_at = time.monotonic()
+        metriken.REGISTRY.observe("clock_sync_rtt", self.rtt_ms / 1000)
+        return self.offset_ms
+
+    def maybe_sync(self, interval=RESYNC_INTERVAL):
+        """Synchronisiert, falls die letzte Messung älter als interval Sekunden ist"""
+        if self.synced_at is None or time.monotonic() - self.synced_at >= interval:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Zeitabgleich mit der Börse fehlgeschlagen: {e}")
+                self.synced_at = time.monotonic()  # nicht bei jedem Aufruf erneut versuchen
+
+    def server_ms(self, local_seconds=None):
+        """Lokale Zeit (time.time()) in geschätzte Börsenzeit (ms) umrechnen"""
+        local_seconds = time.time() if local_seconds is None else local_seconds
+        return local_seconds * 1000 + self.offset_ms
+
+
+class LatencyMonitor:
+    """
+    Erfasst pro Stream die Latenz von der Börse bis zum Empfang (Ereigniszeit E
+    bis Empfang, über den Uhrenversatz korrigiert) und vom Empfang bis zur
+    Verarbeitung als Histogramme in metriken (md_exchange_to_receive,
+    md_receive_to_processed). Zusätzlich wird der aktuelle Rückstand der
+    Verarbeitung verfolgt und gemeldet, wenn er LAG_THRESHOLD_MS übersteigt.
+    """
+
+    def __init__(self, clock=None, lag_threshold_ms=LAG_THRESHOLD_MS, lag_recover_ms=LAG_RECOVER_MS):
+        self.clock = clock or ClockOffset()
+        self.lag_threshold_ms = lag_threshold_ms
+        self.lag_recover_ms = lag_recover_ms
+        self.lag_ms = {}      # Stream -> letzter Rückstand
+        self.behind = set()   # Streams, die aktuell hinterherhängen
+        self._lock = threading.Lock()
+
+    def observe_batch(self, stream, event_times, received, processed=None):
+        """
+        :param event_times: Ereigniszeiten (E) der Nachrichten in ms Börsenzeit
+        :param received: lokale Empfangszeiten (time.time()) derselben Nachrichten
+        :param processed: lokaler Zeitpunkt der Verarbeitung (Standard: jetzt)
+        """
+        if not event_times:
+            return
+        processed = time.time() if processed is None else processed
+        offset_s = self.clock.offset_ms / 1000
+        metriken.REGISTRY.observe_many(
+            "md_exchange_to_receive",
+            [r + offset_s - e / 1000 for e, r in zip(event_times, received)],
+            stream=stream)
+        metriken.REGISTRY.observe_many(
+            "md_receive_to_processed", [processed - r for r in received], stream=stream)
+        self._update_lag(stream, processed * 1000 + self.clock.offset_ms - max(event_times))
+
+    def observe(self, stream, event_time, received, processed=None):
+        """Einzelne Nachricht (z.B. aus dem StreamHub)"""
+        if event_time is not None:
+            self.observe_batch(stream, [event_time], [received], processed)
+
+    def _update_lag(self, stream, lag_ms):
+        with self._lock:
+            self.lag_ms[stream] = lag_ms
+            if stream not in self.behind and lag_ms > self.lag_threshold_ms:
+                self.behind.add(stream)
+                metriken.REGISTRY.inc("md_behind", stream=stream)
+                print(f"WARNUNG: {stream} hängt {lag_ms:.0f} ms hinter der Börse")
+            elif stream in self.behind and lag_ms < self.lag_recover_ms:
+                self.behind.discard(stream)
+                print(f"{stream} wieder aktuell ({lag_ms:.0f} ms)")
+
+    def summary(self, stream):
+        """p50/p99 beider Latenzen (ms, Bucket-Obergrenzen), aktueller Rückstand und Status"""
+        result = {"lag_ms": self.lag_ms.get(stream), "behind": stream in self.behind,
+                  "clock_offset_ms": self.clock.offset_ms, "clock_rtt_ms": self.clock.rtt_ms}
+        for name in ("md_exchange_to_receive", "md_receive_to_processed"):
+            hist = metriken.REGISTRY.histogram(name, stream=stream)
+            for q in (0.5, 0.99):
+                value = hist.quantile(q) if hist is not None else None
+                result[f"{name[3:]}_p{int(q * 100)}_ms"] = None if value is None else value * 1000
+        return result
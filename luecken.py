@@ -0,0 +1,221 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import metriken
+import request_cache
+import scheduler
+from kerzen import KlineSeries, kline_dtype
+
+# Globale Einstellungen
+MAX_WORKERS = 8             # Parallelität beim Nachladen fehlender Bereiche
+FILL_GAPS = True            # nicht nachladbare Lücken mit flachen Kerzen (Volumen 0) auffüllen
+MAX_FILL_CANDLES = 10       # größere Lücken nicht auffüllen, sondern die Historie davor verwerfen
+PATCH_CACHE = 4096          # gemerkte Lücken samt nachgeladener Kerzen (werden nicht erneut angefragt)
+
+_patches = request_cache.LRUCache(PATCH_CACHE)
+
+
+class KlineCheck:
+    """Prüfergebnis der Öffnungszeiten einer Serie"""
+    __slots__ = ("symbol", "step", "duplicates", "out_of_order", "missing")
+
+    def __init__(self, symbol, step, duplicates=0, out_of_order=0, missing=None):
+        self.symbol = symbol
+        self.step = step
+        self.duplicates = duplicates        # Kerzen mit bereits vorhandener Öffnungszeit
+        self.out_of_order = out_of_order    # Rücksprünge in der Öffnungszeit
+        self.missing = missing or []        # fehlende Bereiche (erste, letzte fehlende Öffnungszeit)
+
+    @property
+    def ok(self):
+        return not (self.duplicates or self.out_of_order or self.missing)
+
+    @property
+    def missing_candles(self):
+        return sum((end - start) // self.step + 1 for start, end in self.missing)
+
+    def __repr__(self):
+        return (f"KlineCheck({self.symbol!r}, duplicates={self.duplicates}, "
+                f"out_of_order={self.out_of_order}, missing={self.missing_candles})")
+
+
+def _gaps(open_time, step):
+    """Fehlende Bereiche einer aufsteigend sortierten, duplikatfreien Serie"""
+    diff = np.diff(open_time)
+    at = np.flatnonzero(diff > step)
+    return [(int(open_time[i] + step), int(open_time[i + 1] - step)) for i in at]
+
+
+def check_many(series, interval):
+    """
+    Prüft die Öffnungszeiten aller Serien in einem vektorisierten Durchlauf
+    auf Duplikate, Rücksprünge und fehlende Kerzen.
+
+    :param series: Dictionary Symbol -> KlineSeries
+    :return: Dictionary Symbol -> KlineCheck (nur Serien mit Befund)
+    """
+    step = request_cache.INTERVAL_MS.get(interval)
+    symbols = [symbol for symbol, s in series.items() if len(s) > 1]
+    if step is None or not symbols:
+        return {}
+
+    # Alle Serien als (Symbole, max. Länge); kürzere werden maskiert
+    lengths = np.array([len(series[symbol]) for symbol in symbols])
+    valid = np.arange(lengths.max())[1:] < lengths[:, None]
+    times = np.zeros((len(symbols), lengths.max()), dtype=np.int64)
+    times[np.arange(lengths.max()) < lengths[:, None]] = np.concatenate(
+        [series[symbol].open_time for symbol in symbols])
+    diff = np.diff(times, axis=1)
+    duplicates = ((diff == 0) & valid).sum(axis=1)
+    backwards = ((diff < 0) & valid).sum(axis=1)
+    gap_rows, gap_cols = np.nonzero((diff > step) & valid)
+
+    checks = {}
+    for i in np.flatnonzero(duplicates + backwards):
+        # Ungeordnete Serien einzeln sortiert auswerten (selten)
+        checks[symbols[i]] = KlineCheck(symbols[i], step, int(duplicates[i]), int(backwards[i]),
+                                        _gaps(np.unique(series[symbols[i]].open_time), step))
+    for i, j in zip(gap_rows, gap_cols):
+        check = checks.setdefault(symbols[i], KlineCheck(symbols[i], step))
+        if not (check.duplicates or check.out_of_order):
+            check.missing.append((int(times[i, j] + step), int(times[i, j + 1] - step)))
+
+    metriken.REGISTRY.inc("kline_checks", len(symbols), interval=interval)
+    for name, count in (("duplicate", int(duplicates.sum())), ("out_of_order", int(backwards.sum())),
+                        ("missing", sum(c.missing_candles for c in checks.values()))):
+        if count:
+            metriken.REGISTRY.inc("kline_defects", count, kind=name, interval=interval)
+    return checks
+
+
+def _requests(missing, step):
+    """Fasst benachbarte Lücken zu möglichst wenigen /klines-Requests (je MAX_LIMIT Kerzen) zusammen"""
+    merged = []
+    for start, end in sorted(missing):
+        if merged and (end - merged[-1][0]) // step < request_cache.MAX_LIMIT:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def fetch_missing(symbol, interval, check, priority=scheduler.SCAN):
+    """
+    Lädt die fehlenden Bereiche einer Serie nach. Das Ergebnis jedes Bereichs
+    wird gemerkt (auch wenn die Börse dort keine Kerzen hat, z.B. bei einem
+    Ausfall oder einer Handelspause), spätere Scans fragen ihn nicht erneut an.
+
+    :return: Rohkerzen innerhalb der fehlenden Bereiche
+    """
+    klines, missing = [], []
+    for gap in check.missing:
+        patch = _patches.get((symbol, interval, gap))
+        if patch is None:
+            missing.append(gap)
+        else:
+            klines.extend(patch)
+    fetched = []
+    for start, end in _requests(missing, check.step):
+        fetched.extend(request_cache.get_klines_range(symbol, interval, start, end, priority=priority))
+    for start, end in missing:
+        patch = [k for k in fetched if start <= k[0] <= end]
+        _patches.set((symbol, interval, (start, end)), patch)
+        klines.extend(patch)
+    if fetched:
+        metriken.REGISTRY.inc("kline_refetched", len(fetched), interval=interval)
+    return klines
+
+
+def repair(series, check=None, klines=None, fill=FILL_GAPS):
+    """
+    Sortiert die Kerzen nach Öffnungszeit, entfernt Duplikate (die zuletzt
+    gelieferte Kerze gewinnt) und übernimmt nachgeladene Kerzen. Verbleibende
+    Lücken bis MAX_FILL_CANDLES werden mit flachen Kerzen (OHLC = letzter
+    Schluss, Volumen 0) gefüllt, bei größeren Lücken beginnt die Serie danach.
+
+    :param klines: nachgeladene Rohkerzen (siehe fetch_missing)
+    :return: neue KlineSeries
+    """
+    data = series.data
+    if klines:
+        data = np.concatenate([data, KlineSeries.from_klines(series.symbol, series.interval, klines,
+                                                             series.precision).data])
+    data = data[np.argsort(data["open_time"], kind="stable")]
+    if len(data):
+        data = data[np.r_[np.diff(data["open_time"]) != 0, True]]
+
+    step = check.step if check is not None else request_cache.INTERVAL_MS.get(series.interval)
+    if fill and step and len(data) > 1:
+        missing = np.diff(data["open_time"]) // step - 1
+        too_long = np.flatnonzero(missing > MAX_FILL_CANDLES)
+        if len(too_long):
+            data = data[too_long[-1] + 1:]
+            missing = missing[too_long[-1] + 1:]
+        at = np.flatnonzero(missing > 0)
+        if len(at):
+            counts = missing[at]
+            source = np.repeat(at, counts)
+            offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+            filler = np.zeros(len(source), dtype=data.dtype)
+            filler["open_time"] = data["open_time"][source] + offset * step
+            for name in ("open", "high", "low", "close"):
+                filler[name] = data["close"][source]
+            data = np.concatenate([data, filler])
+            data = data[np.argsort(data["open_time"], kind="stable")]
+            metriken.REGISTRY.inc("kline_filled", len(filler), interval=series.interval)
+    return KlineSeries(series.symbol, series.interval, data)
+
+
+def repair_many(series, interval, refetch=True, fill=FILL_GAPS, priority=scheduler.SCAN):
+    """
+    Prüft alle Serien in einem Durchlauf und repariert nur die auffälligen:
+    fehlende Bereiche werden gesammelt und parallel nachgeladen.
+
+    :param series: Dictionary Symbol -> KlineSeries
+    :return: (Dictionary Symbol -> KlineSeries, Dictionary Symbol -> KlineCheck)
+    """
+    checks = check_many(series, interval)
+    if not checks:
+        return series, checks
+    fetched = {}
+    if refetch:
+        todo = [check for check in checks.values() if check.missing]
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [(check.symbol, executor.submit(fetch_missing, check.symbol, interval, check, priority))
+                       for check in todo]
+            for symbol, future in futures:
+                try:
+                    fetched[symbol] = future.result()
+                except Exception as e:
+                    print(f"Fehler beim Nachladen von {symbol}: {str(e)}")
+    repaired = dict(series)
+    for symbol, check in checks.items():
+        repaired[symbol] = repair(series[symbol], check, fetched.get(symbol), fill)
+    return repaired, checks
+
+
+if __name__ == "__main__":
+    import time
+
+    # Laufzeit der Prüfung für 500 Symbole x 500 Kerzen, davon 5 % mit Lücken bzw. Duplikaten
+    rng = np.random.default_rng(0)
+    step = request_cache.INTERVAL_MS["1h"]
+    series = {}
+    for i in range(500):
+        data = np.zeros(500, dtype=kline_dtype())
+        data["open_time"] = 1_700_000_000_000 + np.arange(500) * step
+        data["close"] = 100 + np.cumsum(rng.normal(0, 1, 500))
+        if i % 40 == 0:
+            data = np.delete(data, rng.integers(1, 499, 3))
+        elif i % 40 == 1:
+            data = np.insert(data, 250, data[250])
+        series[f"S{i}USDT"] = KlineSeries(f"S{i}USDT", "1h", data)
+
+    start = time.perf_counter()
+    checks = check_many(series, "1h")
+    print(f"Prüfung: {(time.perf_counter() - start) * 1000:.2f} ms, {len(checks)} auffällige Serien")
+    start = time.perf_counter()
+    repaired, _ = repair_many(series, "1h", refetch=False)
+    print(f"Reparatur (ohne Nachladen): {(time.perf_counter() - start) * 1000:.2f} ms, "
+          f"danach auffällig: {len(check_many(repaired, '1h'))}")
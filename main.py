@@ -1,11 +1,13 @@
 # Ersetze diese Werte durch deinen eigenen API-Key und Secret!
 from dotenv import load_dotenv
 import os
-import requests
 import pandas as pd
 import numpy as np
-import time
 from concurrent.futures import ThreadPoolExecutor
+import metriken
+import request_cache
+import scheduler
+from kerzen import KlineSeries
 # .env-Datei laden
 load_dotenv()
 
@@ -15,20 +17,16 @@ API_SECRET = os.getenv("API_SECRET")
 
 def get_binance_trading_pairs():
     url = "https://api.binance.com/api/v3/exchangeInfo"
-    response = requests.get(url)
-    data = response.json()
+    data = request_cache.fetch_json(url, ttl=None, priority=scheduler.SCAN)
     return [symbol['symbol'] for symbol in data['symbols'] if symbol['status'] == 'TRADING' and symbol['symbol'].endswith("USDT")]
 
 def get_historical_data(symbol, interval='1h', limit=200):
     try:
-        url = "https://api.binance.com/api/v3/klines"
-        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
-        data = requests.get(url, params=params).json()
-        return pd.DataFrame(data, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades', 
-            'taker_buy_base', 'taker_buy_quote', 'ignore'
-        ]).apply(pd.to_numeric)
+        # Request und JSON-Parsing laufen über den gemeinsamen Kerzen-Cache
+        data = request_cache.get_klines(symbol, interval, limit, priority=scheduler.SCAN)
+        # Kompakter Container statt 12 Spalten als object -> float64
+        with metriken.stage("to_numeric"):
+            return KlineSeries.from_klines(symbol, interval, data).to_frame()
     except Exception as e:
         print(f"Fehler bei {symbol}: {str(e)}")
         return None
@@ -99,12 +97,14 @@ def analyze_symbol(symbol):
     if df is None or len(df) < 200:
         return None
     
-    df = calculate_indicators(df)
+    with metriken.stage("calculate_indicators"):
+        df = calculate_indicators(df)
     if len(df) < 1:
         return None
     
     latest = df.iloc[-1]
-    score = calculate_score(df)
+    with metriken.stage("calculate_score"):
+        score = calculate_score(df)
     
     return {
         'symbol': symbol,
@@ -129,7 +129,7 @@ def main():
             result = future.result()
             if result and result['score'] > 5:
                 results.append(result)
-            time.sleep(0.1)
+            # Rate Limits regelt der Request-Scheduler (Gewichtsbudget statt Pausen)
     
     # Sortiere Ergebnisse nach Score
     sorted_results = sorted(results, key=lambda x: x['score'], reverse=True)
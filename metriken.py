@@ -0,0 +1,281 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Globale Einstellungen
+ENABLED = True          # Instrumentierung global an-/abschalten
+PREFIX = "trading"      # Präfix für alle exportierten Metriknamen
+
+# Bucketgrenzen in Sekunden (von 0,1 ms bis 10 s)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Latenz-Histogramm mit festen Bucketgrenzen (kumulativ wie bei Prometheus)"""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # letzter Bucket = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Schätzt ein Quantil anhand der Bucketgrenzen (obere Grenze des Buckets)"""
+        if self.count == 0:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for bound, n in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += n
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+
+class Registry:
+    """
+    Sammelt Zähler und Histogramme, jeweils mit Labels (z.B. stage, endpoint).
+    Alle Zugriffe sind über ein einzelnes Lock threadsicher, damit die
+    Instrumentierung auch aus dem ThreadPoolExecutor heraus funktioniert.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, labels) -> Wert
+        self._histograms = {}  # (name, labels) -> Histogram
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        if not ENABLED:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        if not ENABLED:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    def observe_many(self, name, values, **labels):
+        """Wie observe() für viele Werte mit nur einer Lock-Aufnahme (z.B. pro Nachrichten-Batch)"""
+        if not ENABLED:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            counts, bounds, find = hist.counts, hist.bounds, bisect.bisect_left
+            values = list(values)
+            for value in values:
+                counts[find(bounds, value)] += 1
+            hist.sum += sum(values)
+            hist.count += len(values)
+
+    def histogram(self, name, **labels):
+        return self._histograms.get(self._key(name, labels))
+
+    def counter(self, name, **labels):
+        return self._counters.get(self._key(name, labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_dict(self):
+        """Momentaufnahme aller Metriken als JSON-taugliches Dictionary"""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": hist.count,
+                    "sum": hist.sum,
+                    "p50": hist.quantile(0.5),
+                    "p99": hist.quantile(0.99),
+                    "buckets": dict(zip([str(b) for b in hist.bounds] + ["+Inf"], hist.counts)),
+                }
+                for (name, labels), hist in sorted(self._histograms.items())
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def merge(self, snapshot, **labels):
+        """
+        Addiert eine Momentaufnahme (to_dict) einer anderen Registry, z.B. eines
+        Worker-Prozesses. labels werden an jede Metrik angehängt (z.B. worker=1).
+        """
+        with self._lock:
+            for item in snapshot.get("counters", ()):
+                key = self._key(item["name"], {**item["labels"], **labels})
+                self._counters[key] = self._counters.get(key, 0) + item["value"]
+            for item in snapshot.get("histograms", ()):
+                key = self._key(item["name"], {**item["labels"], **labels})
+                hist = self._histograms.get(key)
+                if hist is None:
+                    hist = self._histograms[key] = Histogram()
+                for i, n in enumerate(item["buckets"].values()):
+                    hist.counts[i] += n
+                hist.sum += item["sum"]
+                hist.count += item["count"]
+
+    def to_prometheus(self):
+        """Export im Prometheus-Textformat (Version 0.0.4)"""
+        lines = []
+        with self._lock:
+            seen = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = f"{PREFIX}_{name}_total"
+                if metric not in seen:
+                    lines.append(f"# TYPE {metric} counter")
+                    seen.add(metric)
+                lines.append(f"{metric}{_format_labels(labels)} {value}")
+            for (name, labels), hist in sorted(self._histograms.items()):
+                metric = f"{PREFIX}_{name}_seconds"
+                if metric not in seen:
+                    lines.append(f"# TYPE {metric} histogram")
+                    seen.add(metric)
+                cumulative = 0
+                for bound, n in zip(hist.bounds + (float("inf"),), hist.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{metric}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {hist.sum}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+# Globale Registry, die von allen Skripten gemeinsam genutzt wird
+REGISTRY = Registry()
+
+
+@contextmanager
+def stage(name, **labels):
+    """
+    Misst die Dauer eines Verarbeitungsschritts, z.B.:
+
+        with metriken.stage("calculate_indicators"):
+            df = calculate_indicators(df)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe("stage", time.perf_counter() - start, stage=name, **labels)
+
+
+def timed(name):
+    """Dekorator-Variante von stage()"""
+    def decorator(func):
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return decorator
+
+
+def record_response(response):
+    """
+    Zählt Requests, Bytes, HTTP-Status, 429er und urllib3-Retries pro Endpoint.
+
+    :param response: requests.Response eines Binance-Aufrufs
+    """
+    endpoint = urlparse(response.url).path
+    REGISTRY.inc("http_requests", endpoint=endpoint, status=response.status_code)
+    REGISTRY.inc("http_bytes", len(response.content), endpoint=endpoint)
+    REGISTRY.observe("http_request", response.elapsed.total_seconds(), endpoint=endpoint)
+    if response.status_code == 429:
+        REGISTRY.inc("http_429", endpoint=endpoint)
+
+    # Retries der HTTPAdapter-Retry-Logik stehen im urllib3-Response-Objekt
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    history = getattr(retries, "history", None) or ()
+    if history:
+        REGISTRY.inc("http_retries", len(history), endpoint=endpoint)
+        throttled = sum(1 for entry in history if entry.status == 429)
+        if throttled:
+            REGISTRY.inc("http_429", throttled, endpoint=endpoint)
+
+
+def export_prometheus():
+    return REGISTRY.to_prometheus()
+
+
+def export_json():
+    return json.dumps(REGISTRY.to_dict(), indent=2)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = export_prometheus().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = export_json().encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port=9108, host="127.0.0.1"):
+    """
+    Startet einen HTTP-Server im Hintergrund, der /metrics (Prometheus)
+    und /metrics.json ausliefert.
+
+    :return: Server-Objekt (mit server.shutdown() beenden)
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    # Kleine Demonstration des Exportformats
+    for _ in range(100):
+        with stage("demo"):
+            time.sleep(0.001)
+    REGISTRY.inc("http_requests", endpoint="/api/v3/klines", status=200)
+    print(export_prometheus())
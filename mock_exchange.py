@@ -0,0 +1,225 @@
+import hashlib
+import hmac
+import itertools
+import json
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+# Globale Einstellungen
+HOST = "127.0.0.1"
+PORT = 8765
+API_KEY = "mock-key"
+API_SECRET = "mock-secret"
+PROCESSING_DELAY = 0.0      # simulierte Bearbeitungszeit der Börse pro Order (Sekunden)
+
+# Symbole mit Filtern im Format von /exchangeInfo und einem Referenzpreis für Marktorders
+SYMBOLS = {
+    "BTCUSDT": {"tickSize": "0.01", "stepSize": "0.00001", "minQty": "0.00001",
+                "maxQty": "9000", "minNotional": "5", "price": "60000"},
+    "ETHUSDT": {"tickSize": "0.01", "stepSize": "0.0001", "minQty": "0.0001",
+                "maxQty": "9000", "minNotional": "5", "price": "3000"},
+    "DOGEUSDT": {"tickSize": "0.00001", "stepSize": "1", "minQty": "1",
+                 "maxQty": "9000000", "minNotional": "1", "price": "0.15"},
+}
+
+
+def _exchange_info():
+    return {
+        "timezone": "UTC",
+        "serverTime": int(time.time() * 1000),
+        "symbols": [
+            {
+                "symbol": symbol, "status": "TRADING",
+                "baseAsset": symbol[:-4], "quoteAsset": symbol[-4:],
+                "filters": [
+                    {"filterType": "PRICE_FILTER", "minPrice": spec["tickSize"], "maxPrice": "1000000",
+                     "tickSize": spec["tickSize"]},
+                    {"filterType": "LOT_SIZE", "minQty": spec["minQty"], "maxQty": spec["maxQty"],
+                     "stepSize": spec["stepSize"]},
+                    {"filterType": "NOTIONAL", "minNotional": spec["minNotional"]},
+                ],
+            }
+            for symbol, spec in SYMBOLS.items()
+        ],
+    }
+
+
+class _Error(Exception):
+    def __init__(self, status, code, msg):
+        super().__init__(msg)
+        self.status = status
+        self.code = code
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Nachbildung der benötigten Binance-Endpoints mit Keep-Alive (HTTP/1.1):
+    /api/v3/ping, /api/v3/time, /api/v3/exchangeInfo sowie POST /api/v3/order
+    und /api/v3/order/test mit Prüfung von API-Key, Signatur, recvWindow und
+    Filtern (Fehlercodes wie bei Binance).
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/api/v3/ping":
+            self._send(200, {})
+        elif path == "/api/v3/time":
+            self._send(200, {"serverTime": int(time.time() * 1000)})
+        elif path == "/api/v3/exchangeInfo":
+            self._send(200, _exchange_info())
+        else:
+            self._send(404, {"code": -1000, "msg": "Unknown endpoint"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        try:
+            if path not in ("/api/v3/order", "/api/v3/order/test"):
+                raise _Error(404, -1000, "Unknown endpoint")
+            order = self.server.exchange.place(self.headers.get("X-MBX-APIKEY"), body,
+                                               test=path.endswith("/test"))
+            self._send(200, order)
+        except _Error as e:
+            self._send(e.status, {"code": e.code, "msg": str(e)})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-MBX-USED-WEIGHT-1M", str(self.server.exchange.weight()))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockExchange:
+    """Zustand der lokalen Börse: angenommene Orders und verbrauchtes Gewicht"""
+
+    def __init__(self, api_key=API_KEY, api_secret=API_SECRET, delay=PROCESSING_DELAY):
+        self.api_key = api_key
+        self.secret = api_secret.encode()
+        self.delay = delay
+        self.orders = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._minute = None
+        self._weight = 0
+
+    def weight(self):
+        with self._lock:
+            minute = int(time.time() // 60)
+            if minute != self._minute:
+                self._minute, self._weight = minute, 0
+            self._weight += 1
+            return self._weight
+
+    def place(self, api_key, body, test=False):
+        if api_key != self.api_key:
+            raise _Error(401, -2015, "Invalid API-key, IP, or permissions for action.")
+        query, _, signature = body.rpartition("&signature=")
+        expected = hmac.new(self.secret, query.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(signature, expected):
+            raise _Error(400, -1022, "Signature for this request is not valid.")
+        params = dict(parse_qsl(query))
+        now = int(time.time() * 1000)
+        timestamp = int(params.get("timestamp", 0))
+        if timestamp > now + 1000 or now - timestamp > int(params.get("recvWindow", 5000)):
+            raise _Error(400, -1021, "Timestamp for this request is outside of the recvWindow.")
+
+        spec = SYMBOLS.get(params.get("symbol"))
+        if spec is None:
+            raise _Error(400, -1121, "Invalid symbol.")
+        qty = Decimal(params.get("quantity", "0"))
+        if qty < Decimal(spec["minQty"]) or qty > Decimal(spec["maxQty"]) or qty % Decimal(spec["stepSize"]):
+            raise _Error(400, -1013, "Filter failure: LOT_SIZE")
+        if params.get("type") == "LIMIT":
+            price = Decimal(params.get("price", "0"))
+            if price <= 0 or price % Decimal(spec["tickSize"]):
+                raise _Error(400, -1013, "Filter failure: PRICE_FILTER")
+        else:
+            price = Decimal(spec["price"])
+        if qty * price < Decimal(spec["minNotional"]):
+            raise _Error(400, -1013, "Filter failure: NOTIONAL")
+
+        if self.delay:
+            time.sleep(self.delay)
+        if test:
+            return {}
+        order = {"symbol": params["symbol"], "orderId": next(self._ids),
+                 "clientOrderId": params.get("newClientOrderId", f"mock{timestamp}"),
+                 "transactTime": int(time.time() * 1000)}
+        with self._lock:
+            self.orders.append({**params, **order})
+        return order
+
+
+def serve(host=HOST, port=PORT, exchange=None):
+    """
+    Startet die lokale Börse im Hintergrund (Port 0 = frei wählen).
+
+    :return: Server-Objekt mit .url und .exchange (mit server.shutdown() beenden)
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.exchange = exchange or MockExchange()
+    server.url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def benchmark(orders=500):
+    """
+    Signal -> Bestätigung über ExecutionGateway (warme Verbindung) im Vergleich
+    zu einer neuen Verbindung pro Order, gegen die lokale Börse.
+    """
+    import requests
+
+    import execution
+
+    server = serve(port=0)
+    try:
+        gateway = execution.ExecutionGateway(API_KEY, API_SECRET, base_url=server.url, test=False)
+        gateway.warm(["BTCUSDT"])
+        warm = []
+        for i in range(orders):
+            warm.append(gateway.buy("BTCUSDT", 0.001 + i * 1e-5)["latency_ms"]["signal_to_ack"])
+        gateway.close()
+
+        cold = []
+        for i in range(orders // 5):
+            signal = time.time()
+            query = f"symbol=BTCUSDT&side=BUY&type=MARKET&quantity=0.00100&timestamp={int(signal * 1000)}"
+            signature = hmac.new(API_SECRET.encode(), query.encode(), hashlib.sha256).hexdigest()
+            response = requests.post(f"{server.url}/api/v3/order", data=f"{query}&signature={signature}".encode(),
+                                     headers={"X-MBX-APIKEY": API_KEY})
+            response.raise_for_status()
+            cold.append((time.time() - signal) * 1000)
+
+        for name, values in (("warme Session", warm), ("neue Verbindung", cold)):
+            values.sort()
+            print(f"{name:<16} p50 {values[len(values) // 2]:6.3f} ms  p99 {values[int(len(values) * 0.99)]:6.3f} ms")
+        print(f"{len(server.exchange.orders)} Orders angenommen")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        benchmark()
+        sys.exit()
+    server = serve(port=int(sys.argv[1]) if len(sys.argv) > 1 else PORT)
+    print(f"Lokale Börse läuft auf {server.url} (API-Key {API_KEY!r}, Secret {API_SECRET!r})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,229 @@
+import numpy as np
+
+# Globale Einstellungen
+LOOKBACK = 10           # Kerzen pro Symbol, die für die Mustererkennung betrachtet werden
+TREND_BARS = 5          # Vorlauf für den Trendkontext (Hammer, Hanging Man, Sterne ...)
+DOJI_BODY = 0.1         # Körper höchstens 10 % der Spanne
+SHADOW_RATIO = 2.0      # Schatten mindestens doppelt so lang wie der Körper
+SMALL_BODY = 0.3        # "kleiner" Körper relativ zum durchschnittlichen Körper
+LONG_BODY = 1.0         # "langer" Körper relativ zum durchschnittlichen Körper
+
+OHLC = ("open", "high", "low", "close")
+
+
+class Candles:
+    """
+    OHLC-Arrays beliebiger Form (..., Zeit), z.B. (Symbole, Kerzen) für das
+    ganze Universum auf einmal. Abgeleitete Größen (Körper, Schatten,
+    Vorgängerkerzen) werden einmal berechnet und von allen Mustern geteilt.
+    """
+
+    def __init__(self, open, high, low, close):
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.body = self.close - self.open
+        self.abs_body = np.abs(self.body)
+        self.range = self.high - self.low
+        self.top = np.maximum(self.open, self.close)
+        self.bottom = np.minimum(self.open, self.close)
+        self.upper = self.high - self.top
+        self.lower = self.bottom - self.low
+        self.avg_body = np.nanmean(self.abs_body, axis=-1, keepdims=True)
+        self._shifted = {}
+
+    def prev(self, name, k=1):
+        """Wert der k-ten Vorgängerkerze (NaN, wo es keine gibt)"""
+        key = (name, k)
+        if key not in self._shifted:
+            x = getattr(self, name)
+            shifted = np.full_like(x, np.nan)
+            shifted[..., k:] = x[..., :-k]
+            self._shifted[key] = shifted
+        return self._shifted[key]
+
+    @property
+    def downtrend(self):
+        return self.prev("close") < self.prev("close", TREND_BARS)
+
+    @property
+    def uptrend(self):
+        return self.prev("close") > self.prev("close", TREND_BARS)
+
+
+def _signal(bullish, bearish=None):
+    result = bullish.astype(np.int8)
+    if bearish is not None:
+        result -= bearish.astype(np.int8)
+    return result
+
+
+def doji(c):
+    """Körper nahezu null (Unentschlossenheit, immer +1)"""
+    return _signal((c.abs_body <= DOJI_BODY * c.range) & (c.range > 0))
+
+
+def hammer(c):
+    """Hammer (+1, nach Abwärtstrend) bzw. Hanging Man (-1, nach Aufwärtstrend)"""
+    shape = ((c.lower >= SHADOW_RATIO * c.abs_body) & (c.upper <= c.abs_body)
+             & (c.abs_body > DOJI_BODY * c.range))
+    return _signal(shape & c.downtrend, shape & c.uptrend)
+
+
+def shooting_star(c):
+    """Inverted Hammer (+1, nach Abwärtstrend) bzw. Shooting Star (-1, nach Aufwärtstrend)"""
+    shape = ((c.upper >= SHADOW_RATIO * c.abs_body) & (c.lower <= c.abs_body)
+             & (c.abs_body > DOJI_BODY * c.range))
+    return _signal(shape & c.downtrend, shape & c.uptrend)
+
+
+def engulfing(c):
+    """Körper umschließt den entgegengesetzten Körper der Vorkerze"""
+    prev_body = c.prev("body")
+    bigger = c.abs_body > np.abs(prev_body)
+    bullish = (prev_body < 0) & (c.body > 0) & (c.open <= c.prev("close")) & (c.close >= c.prev("open")) & bigger
+    bearish = (prev_body > 0) & (c.body < 0) & (c.open >= c.prev("close")) & (c.close <= c.prev("open")) & bigger
+    return _signal(bullish, bearish)
+
+
+def harami(c):
+    """Kleiner Körper innerhalb des langen, entgegengesetzten Körpers der Vorkerze"""
+    prev_body = c.prev("body")
+    inside = ((c.top < c.prev("top")) & (c.bottom > c.prev("bottom"))
+              & (np.abs(prev_body) >= LONG_BODY * c.avg_body))
+    return _signal(inside & (prev_body < 0) & (c.body > 0), inside & (prev_body > 0) & (c.body < 0))
+
+
+def piercing(c):
+    """Piercing Line (+1) bzw. Dark Cloud Cover (-1): Eröffnung jenseits, Schluss über die Körpermitte"""
+    prev_body = c.prev("body")
+    prev_mid = (c.prev("open") + c.prev("close")) / 2
+    long_prev = np.abs(prev_body) >= LONG_BODY * c.avg_body
+    bullish = (long_prev & (prev_body < 0) & (c.body > 0) & (c.open < c.prev("low"))
+               & (c.close > prev_mid) & (c.close < c.prev("open")))
+    bearish = (long_prev & (prev_body > 0) & (c.body < 0) & (c.open > c.prev("high"))
+               & (c.close < prev_mid) & (c.close > c.prev("open")))
+    return _signal(bullish, bearish)
+
+
+def star(c):
+    """Morning Star (+1) bzw. Evening Star (-1) über drei Kerzen"""
+    first = c.prev("body", 2)
+    first_mid = (c.prev("open", 2) + c.prev("close", 2)) / 2
+    long_first = np.abs(first) >= LONG_BODY * c.avg_body
+    small_middle = c.prev("abs_body") <= SMALL_BODY * c.avg_body
+    bullish = (long_first & (first < 0) & small_middle & (c.prev("top") < c.prev("close", 2))
+               & (c.body > 0) & (c.close > first_mid))
+    bearish = (long_first & (first > 0) & small_middle & (c.prev("bottom") > c.prev("close", 2))
+               & (c.body < 0) & (c.close < first_mid))
+    return _signal(bullish, bearish)
+
+
+def three_soldiers(c):
+    """Three White Soldiers (+1) bzw. Three Black Crows (-1)"""
+    bodies = (c.prev("body", 2), c.prev("body"), c.body)
+    closes = (c.prev("close", 2), c.prev("close"), c.close)
+    opens_inside = ((c.open >= c.prev("bottom")) & (c.open <= c.prev("top"))
+                    & (c.prev("open") >= c.prev("bottom", 2)) & (c.prev("open") <= c.prev("top", 2)))
+    bullish = (bodies[0] > 0) & (bodies[1] > 0) & (bodies[2] > 0) & (closes[1] > closes[0]) & (closes[2] > closes[1])
+    bearish = (bodies[0] < 0) & (bodies[1] < 0) & (bodies[2] < 0) & (closes[1] < closes[0]) & (closes[2] < closes[1])
+    short_shadows_up = c.upper <= SMALL_BODY * c.abs_body
+    short_shadows_down = c.lower <= SMALL_BODY * c.abs_body
+    return _signal(bullish & opens_inside & short_shadows_up, bearish & opens_inside & short_shadows_down)
+
+
+def marubozu(c):
+    """Langer Körper fast ohne Schatten, Vorzeichen = Richtung"""
+    shape = (c.abs_body >= 0.95 * c.range) & (c.abs_body >= LONG_BODY * c.avg_body) & (c.range > 0)
+    return _signal(shape & (c.body > 0), shape & (c.body < 0))
+
+
+# Name -> (Funktion, Gewicht im Score). Signale: +1 bullisch, -1 bärisch, 0 kein Muster.
+PATTERNS = {
+    "doji": (doji, 0),
+    "hammer": (hammer, 1),
+    "shooting_star": (shooting_star, 1),
+    "engulfing": (engulfing, 2),
+    "harami": (harami, 1),
+    "piercing": (piercing, 2),
+    "star": (star, 2),
+    "three_soldiers": (three_soldiers, 2),
+    "marubozu": (marubozu, 1),
+}
+
+
+def detect(open, high, low, close, patterns=None):
+    """
+    Wertet die Muster auf OHLC-Arrays der Form (..., Zeit) aus.
+
+    :param patterns: Namen aus PATTERNS (Standard: alle)
+    :return: Dictionary Name -> int8-Array derselben Form (+1/-1/0)
+    """
+    candles = Candles(open, high, low, close)
+    return {name: PATTERNS[name][0](candles) for name in (patterns or PATTERNS)}
+
+
+def stack_tails(frames, lookback=LOOKBACK):
+    """
+    Letzte `lookback` Kerzen aller Symbole als Arrays (Symbole, lookback);
+    kürzere Historien werden vorne mit NaN aufgefüllt.
+
+    :param frames: Dictionary Symbol -> DataFrame bzw. KlineSeries mit open/high/low/close
+    :return: (Symbolliste, (open, high, low, close))
+    """
+    symbols = list(frames)
+    tails = np.full((4, len(symbols), lookback), np.nan)
+    for i, symbol in enumerate(symbols):
+        frame = frames[symbol]
+        values = np.array([np.asarray(frame[column], dtype=np.float64)[-lookback:] for column in OHLC])
+        tails[:, i, lookback - values.shape[1]:] = values
+    return symbols, tuple(tails)
+
+
+def scan_frames(frames, patterns=None, lookback=LOOKBACK):
+    """
+    Mustererkennung für das ganze Universum in einem Durchlauf.
+
+    :return: Dictionary Symbol -> {Muster: Signal} der letzten Kerze (nur gefundene Muster)
+    """
+    if not frames:
+        return {}
+    symbols, ohlc = stack_tails(frames, lookback)
+    signals = detect(*ohlc, patterns=patterns)
+    names = list(signals)
+    latest = np.stack([signals[name][:, -1] for name in names], axis=1)
+    found = {symbol: {} for symbol in symbols}
+    for i, j in zip(*np.nonzero(latest)):
+        found[symbols[i]][names[j]] = int(latest[i, j])
+    return found
+
+
+def pattern_score(found):
+    """Scorebeitrag der gefundenen Muster (Gewicht * Signal, bärische Muster zählen negativ)"""
+    return sum(PATTERNS[name][1] * signal for name, signal in found.items())
+
+
+if __name__ == "__main__":
+    import time
+
+    # Laufzeit für ein Universum von 500 Symbolen mit je 500 Kerzen (synthetischer Random Walk)
+    rng = np.random.default_rng(0)
+    symbols, bars = 500, 500
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (symbols, bars)), axis=1))
+    open = np.concatenate([close[:, :1], close[:, :-1]], axis=1) * np.exp(rng.normal(0, 0.003, (symbols, bars)))
+    high = np.maximum(open, close) * np.exp(np.abs(rng.normal(0, 0.01, (symbols, bars))))
+    low = np.minimum(open, close) * np.exp(-np.abs(rng.normal(0, 0.01, (symbols, bars))))
+
+    frames = {f"S{i}USDT": {"open": open[i], "high": high[i], "low": low[i], "close": close[i]}
+              for i in range(symbols)}
+    start = time.perf_counter()
+    found = scan_frames(frames)
+    seconds = time.perf_counter() - start
+    print(f"{symbols} Symbole: {seconds * 1000:.2f} ms für alle Muster der letzten Kerze")
+
+    start = time.perf_counter()
+    full = detect(open, high, low, close)
+    print(f"Volle Historie ({symbols}x{bars}): {(time.perf_counter() - start) * 1000:.2f} ms")
+    for name, signal in full.items():
+        print(f"{name:<15} bullisch {np.sum(signal > 0):>6}  bärisch {np.sum(signal < 0):>6}")
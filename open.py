@@ -1,13 +1,14 @@
-import requests
+import request_cache
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from backtesting import Backtest, Strategy
-import  talib  # Wird für die Backtesting-Strategie benötigt
-from ta import momentum, trend, volatility
+from concurrent.futures import ThreadPoolExecutor
+from backtest import run_backtest
+import indikatoren
 
 BINANCE_API_URL = "https://api.binance.com/api/v3"
 FUTURES_API_URL = "https://fapi.binance.com/fapi/v1"
+MAX_WORKERS = 16  # Parallelität für get_binance_data_many
 
 def safe_convert(value):
     """Konvertiert numpy- und Timestamp-Werte in native Python-Typen"""
@@ -15,41 +16,45 @@ def safe_convert(value):
         return float(value) if isinstance(value, np.floating) else str(value)
     return value
 
-def get_binance_data(symbol, interval, limit=100):
-    """Holt OHLCV-Daten, technische Indikatoren und zusätzliche Coin-Infos von Binance"""
+def build_ohlcv_frame(ohlcv):
+    """Wandelt die Rohantwort von /klines in den OHLCV-DataFrame um"""
+    df = pd.DataFrame(ohlcv, columns=[
+        'timestamp', 'open', 'high', 'low', 'close', 'volume',
+        'close_time', 'quote_volume', 'trades',
+        'taker_buy_base', 'taker_buy_quote', 'ignore'
+    ])
+    
+    # "ignore"-Spalte entfernen, da sie immer "0" ist
+    df.drop(columns=["ignore"], inplace=True)
+    
+    # Numerische Spalten konvertieren
+    numeric_cols = ['open', 'high', 'low', 'close', 'volume', 
+                    'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote']
+    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric)
+    
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    
+    # Überprüfe, ob zukünftige Daten vorhanden sind
+    if df['timestamp'].max() > pd.Timestamp.now():
+        raise ValueError("Future dates detected in OHLCV data!")
+    
+    return df
+
+def get_binance_data(symbol, interval, limit=100, cache=None):
+    """
+    Holt OHLCV-Daten, technische Indikatoren und zusätzliche Coin-Infos von Binance
+
+    :param cache: optional ein indikator_cache.IndicatorCache; bereits berechnete
+                  Indikatorspalten werden dann wiederverwendet bzw. nur fortgeschrieben
+    """
     data = {}
     
     # OHLCV-Daten abrufen
     try:
-        response = requests.get(f"{BINANCE_API_URL}/klines", params={
-            "symbol": symbol,
-            "interval": interval,
-            "limit": limit
-        })
-        response.raise_for_status()
-        ohlcv = response.json()
-        
-        df = pd.DataFrame(ohlcv, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades',
-            'taker_buy_base', 'taker_buy_quote', 'ignore'
-        ])
+        # Klines über den gemeinsamen Cache (Single-Flight, geschlossene Kerzen im Speicher)
+        ohlcv = request_cache.get_klines(symbol, interval, limit)
         
-        # "ignore"-Spalte entfernen, da sie immer "0" ist
-        df.drop(columns=["ignore"], inplace=True)
-        
-        # Numerische Spalten konvertieren
-        numeric_cols = ['open', 'high', 'low', 'close', 'volume', 
-                        'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote']
-        df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric)
-        
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        
-        # Überprüfe, ob zukünftige Daten vorhanden sind
-        if df['timestamp'].max() > pd.Timestamp.now():
-            raise ValueError("Future dates detected in OHLCV data!")
-        
-        data['ohlcv'] = df
+        data['ohlcv'] = build_ohlcv_frame(ohlcv)
         
     except Exception as e:
         print(f"OHLCV Fehler: {str(e)}")
@@ -57,36 +62,41 @@ def get_binance_data(symbol, interval, limit=100):
 
     # Technische Indikatoren berechnen
     try:
-        df_indicators = data['ohlcv'].copy()
+        if cache is not None:
+            # Spalten aus dem persistenten Indikator-Cache (gleiche Formeln wie ta)
+            df_indicators = cached_indicators(data['ohlcv'], symbol, interval, cache)
+        else:
+            from ta import momentum, trend, volatility  # erst hier laden (Startzeit)
+            df_indicators = data['ohlcv'].copy()
         
-        # RSI
-        df_indicators['rsi'] = momentum.RSIIndicator(df_indicators['close'], window=14).rsi()
+            # RSI
+            df_indicators['rsi'] = momentum.RSIIndicator(df_indicators['close'], window=14).rsi()
         
-        # MACD
-        macd = trend.MACD(df_indicators['close'])
-        df_indicators['macd'] = macd.macd()
-        df_indicators['signal'] = macd.macd_signal()
+            # MACD
+            macd = trend.MACD(df_indicators['close'])
+            df_indicators['macd'] = macd.macd()
+            df_indicators['signal'] = macd.macd_signal()
         
-        # Moving Averages
-        df_indicators['ma50'] = trend.SMAIndicator(df_indicators['close'], window=50).sma_indicator()
-        if len(df_indicators) >= 200:
-            df_indicators['ma200'] = trend.SMAIndicator(df_indicators['close'], window=200).sma_indicator()
-        else:
-            df_indicators['ma200'] = None
+            # Moving Averages
+            df_indicators['ma50'] = trend.SMAIndicator(df_indicators['close'], window=50).sma_indicator()
+            if len(df_indicators) >= 200:
+                df_indicators['ma200'] = trend.SMAIndicator(df_indicators['close'], window=200).sma_indicator()
+            else:
+                df_indicators['ma200'] = None
         
-        # Bollinger Bands
-        bb = volatility.BollingerBands(df_indicators['close'])
-        df_indicators['upper'] = bb.bollinger_hband()
-        df_indicators['middle'] = bb.bollinger_mavg()
-        df_indicators['lower'] = bb.bollinger_lband()
+            # Bollinger Bands
+            bb = volatility.BollingerBands(df_indicators['close'])
+            df_indicators['upper'] = bb.bollinger_hband()
+            df_indicators['middle'] = bb.bollinger_mavg()
+            df_indicators['lower'] = bb.bollinger_lband()
         
-        # ATR
-        df_indicators['atr'] = volatility.AverageTrueRange(
-            high=df_indicators['high'],
-            low=df_indicators['low'],
-            close=df_indicators['close'],
-            window=14
-        ).average_true_range()
+            # ATR
+            df_indicators['atr'] = volatility.AverageTrueRange(
+                high=df_indicators['high'],
+                low=df_indicators['low'],
+                close=df_indicators['close'],
+                window=14
+            ).average_true_range()
         
         # Speichere die letzten Indikatorwerte (letzte Zeile)
         data['technical_indicators'] = df_indicators.iloc[-1].to_dict()
@@ -96,13 +106,8 @@ def get_binance_data(symbol, interval, limit=100):
     
     # Futures-Daten abrufen
     try:
-        oi_response = requests.get(f"{FUTURES_API_URL}/openInterest", params={"symbol": symbol})
-        oi_response.raise_for_status()
-        oi = oi_response.json()
-        
-        funding_response = requests.get(f"{FUTURES_API_URL}/fundingRate", params={"symbol": symbol})
-        funding_response.raise_for_status()
-        funding = funding_response.json()
+        oi = request_cache.fetch_json(f"{FUTURES_API_URL}/openInterest", {"symbol": symbol})
+        funding = request_cache.fetch_json(f"{FUTURES_API_URL}/fundingRate", {"symbol": symbol})
         
         data['futures'] = {
             'open_interest': oi,
@@ -113,15 +118,122 @@ def get_binance_data(symbol, interval, limit=100):
     
     # Zusätzliche Coin-Informationen (Ticker 24h)
     try:
-        ticker_response = requests.get(f"{BINANCE_API_URL}/ticker/24hr", params={"symbol": symbol})
-        ticker_response.raise_for_status()
-        ticker_data = ticker_response.json()
+        ticker_data = request_cache.fetch_json(f"{BINANCE_API_URL}/ticker/24hr", {"symbol": symbol})
         data['ticker'] = ticker_data
     except Exception as e:
         print(f"Ticker Fehler: {str(e)}")
     
     return data
 
+def cached_indicators(ohlcv, symbol, interval, cache):
+    """Berechnet die Indikatoren von get_binance_data über einen IndicatorCache"""
+    df_indicators = ohlcv.copy()
+    df_indicators['rsi'] = cache.get(ohlcv, symbol, interval, 'rsi', window=14)['rsi']
+    df_indicators[['macd', 'signal']] = cache.get(ohlcv, symbol, interval, 'macd')[['macd', 'signal']]
+    df_indicators['ma50'] = cache.get(ohlcv, symbol, interval, 'sma', window=50)['sma']
+    if len(df_indicators) >= 200:
+        df_indicators['ma200'] = cache.get(ohlcv, symbol, interval, 'sma', window=200)['sma']
+    else:
+        df_indicators['ma200'] = None
+    df_indicators[['upper', 'middle', 'lower']] = cache.get(ohlcv, symbol, interval, 'bollinger')
+    df_indicators['atr'] = cache.get(ohlcv, symbol, interval, 'atr', window=14)['atr']
+    return df_indicators
+
+def get_binance_data_many(symbols, interval, limit=100, max_workers=MAX_WORKERS, cache=None):
+    """
+    Batch-Variante von get_binance_data für eine ganze Watchlist.
+
+    Alle Requests (Klines, Open Interest, Funding, Ticker) aller Symbole laufen
+    parallel; die Indikatoren werden für alle Symbole gemeinsam auf
+    rechtsbündig gestapelten DataFrames berechnet (gleiche Formeln wie ta).
+
+    :param cache: optional ein indikator_cache.IndicatorCache; die Indikatoren
+                  kommen dann je Symbol aus dem Cache (wie in get_binance_data)
+
+    :return: Dictionary Symbol -> Ergebnis von format_output (None bei Fehlern)
+    """
+    requests_by_key = {}
+    for symbol in symbols:
+        requests_by_key[(symbol, 'ohlcv')] = (request_cache.get_klines, (symbol, interval, limit))
+        requests_by_key[(symbol, 'open_interest')] = (
+            request_cache.fetch_json, (f"{FUTURES_API_URL}/openInterest", {"symbol": symbol}))
+        requests_by_key[(symbol, 'funding_rate')] = (
+            request_cache.fetch_json, (f"{FUTURES_API_URL}/fundingRate", {"symbol": symbol}))
+        requests_by_key[(symbol, 'ticker')] = (
+            request_cache.fetch_json, (f"{BINANCE_API_URL}/ticker/24hr", {"symbol": symbol}))
+
+    responses = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {key: executor.submit(func, *args) for key, (func, args) in requests_by_key.items()}
+        for (symbol, kind), future in futures.items():
+            try:
+                responses[(symbol, kind)] = future.result()
+            except Exception as e:
+                print(f"{kind} Fehler bei {symbol}: {str(e)}")
+
+    # OHLCV-Daten aufbereiten
+    frames = {}
+    for symbol in symbols:
+        if (symbol, 'ohlcv') not in responses:
+            continue
+        try:
+            frames[symbol] = build_ohlcv_frame(responses[(symbol, 'ohlcv')])
+        except Exception as e:
+            print(f"OHLCV Fehler bei {symbol}: {str(e)}")
+    frames = {symbol: df for symbol, df in frames.items() if len(df)}
+
+    # Technische Indikatoren für alle Symbole in einem Durchlauf
+    indicators = {}
+    if frames and cache is not None:
+        for symbol, df in frames.items():
+            try:
+                indicators[symbol] = cached_indicators(df, symbol, interval, cache).iloc[-1].to_dict()
+            except Exception as e:
+                print(f"Indikator Fehler bei {symbol}: {str(e)}")
+        frames = {symbol: df for symbol, df in frames.items() if symbol in indicators}
+    elif frames:
+        close = indikatoren.right_aligned(frames, 'close')
+        high = indikatoren.right_aligned(frames, 'high')
+        low = indikatoren.right_aligned(frames, 'low')
+        macd, signal = indikatoren.macd(close)
+        upper, middle, lower = indikatoren.bollinger(close)
+        columns = {
+            'rsi': indikatoren.rsi(close, 14),
+            'macd': macd,
+            'signal': signal,
+            'ma50': indikatoren.sma(close, 50),
+            'ma200': indikatoren.sma(close, 200),
+            'upper': upper,
+            'middle': middle,
+            'lower': lower,
+            'atr': indikatoren.atr(high, low, close, 14),
+        }
+        # Nur die letzte Zeile wird weiterverwendet
+        latest = pd.DataFrame({name: frame.iloc[-1] for name, frame in columns.items()})
+        for symbol, df in frames.items():
+            values = df.iloc[-1].to_dict()
+            values.update(latest.loc[symbol].to_dict())
+            # Wie in get_binance_data: ma200 nur bei ausreichender Historie
+            if len(df) < 200:
+                values['ma200'] = None
+            indicators[symbol] = values
+
+    results = {}
+    for symbol in symbols:
+        if symbol not in frames:
+            results[symbol] = None
+            continue
+        data = {'ohlcv': frames[symbol], 'technical_indicators': indicators[symbol]}
+        if (symbol, 'open_interest') in responses and (symbol, 'funding_rate') in responses:
+            data['futures'] = {
+                'open_interest': responses[(symbol, 'open_interest')],
+                'funding_rate': responses[(symbol, 'funding_rate')]
+            }
+        if (symbol, 'ticker') in responses:
+            data['ticker'] = responses[(symbol, 'ticker')]
+        results[symbol] = format_output(data)
+    return results
+
 def format_output(data):
     """Formatiert die Ausgabe korrekt für JSON"""
     # OHLCV-Daten vorbereiten
@@ -172,33 +284,6 @@ def format_output(data):
         "ticker": ticker
     }
 
-# Backtesting-Strategie
-class MyStrategy(Strategy):
-    def init(self):
-        # RSI-Indikator mit Talib
-        self.rsi = self.I(talib.RSI, self.data.Close, 14)
-        
-    def next(self):
-        # Kaufsignal, wenn RSI unter 30 liegt
-        if self.rsi[-1] < 30:
-            self.buy()
-
-def run_backtest(df):
-    """
-    Führt ein Backtesting auf den OHLCV-Daten durch.
-    Wichtige Anpassungen:
-      - Umbenennung der Spalten für Backtesting (Open, High, Low, Close)
-      - Setzen des Index als DatetimeIndex (falls 'timestamp' vorhanden)
-      - Erhöhung des initialen Cash-Betrags
-    """
-    df_bt = df.rename(columns={'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close'})
-    
-    if 'timestamp' in df_bt.columns:
-        df_bt.index = pd.to_datetime(df_bt['timestamp'])
-    
-    bt = Backtest(df_bt, MyStrategy, cash=50000, commission=0.002)
-    return bt.run()
-
 if __name__ == "__main__":
     coin_symbol = "QTUMUSDT"  # Ersetze dies bei Bedarf z. B. mit "BTCUSDT"
     data = get_binance_data(symbol=coin_symbol, interval="30m", limit=50)
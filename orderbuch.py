@@ -1,11 +1,23 @@
 import requests
+from concurrent.futures import ThreadPoolExecutor
 
-def get_order_book(symbol: str, limit: int = 10) -> dict:
+import scheduler
+
+# numpy/pandas werden nur von den Batch-Funktionen benötigt und dort geladen,
+# damit ein einzelner Orderbuch-Abruf ohne deren Importzeit startet.
+
+MAX_WORKERS = 10  # Parallelität für Batch-Abrufe
+METRIC_COLUMNS = ["mid", "spread", "spread_bps", "microprice", "imbalance",
+                  "bid_depth", "ask_depth", "buy_slippage_bps", "sell_slippage_bps"]
+
+def get_order_book(symbol: str, limit: int = 10, session=None, priority: int = scheduler.INTERACTIVE) -> dict:
     """
     Ruft Orderbuch-Daten von Binance ab.
 
     :param symbol: Handelspaar, z.B. "BTCUSDT"
     :param limit: Anzahl der Orderbuch-Einträge, z.B. 10 (Standard: 10)
+    :param session: optionale requests.Session (Verbindungen wiederverwenden)
+    :param priority: Priorität im Request-Scheduler (Gewichtsbudget)
     :return: Dictionary mit den Orderbuch-Daten (Bids und Asks)
     """
     url = "https://api.binance.com/api/v3/depth"
@@ -13,7 +25,7 @@ def get_order_book(symbol: str, limit: int = 10) -> dict:
         "symbol": symbol,
         "limit": limit
     }
-    response = requests.get(url, params=params)
+    response = scheduler.send(session or requests, url, params, priority=priority)
     response.raise_for_status()  # Bei HTTP-Fehlern wird eine Exception geworfen
     return response.json()
 
@@ -50,6 +62,172 @@ def print_order_book(order_book: dict):
         price, qty = ask
         print(f"Preis: {price}, Menge: {qty}")
 
+def get_order_books(symbols: list, limit: int = 100, max_workers: int = MAX_WORKERS,
+                    priority: int = scheduler.INTERACTIVE) -> dict:
+    """
+    Ruft die Orderbücher mehrerer Symbole parallel ab.
+
+    :return: Dictionary Symbol -> Orderbuch (None bei Fehlern)
+    """
+    session = requests.Session()
+
+    def fetch(symbol):
+        try:
+            return symbol, get_order_book(symbol, limit, session=session, priority=priority)
+        except requests.RequestException as e:
+            print(f"Fehler beim Abruf des Orderbuchs für {symbol}: {e}")
+            return symbol, None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(executor.map(fetch, symbols))
+
+def parse_order_books(order_books: dict, depth: int = None, units: bool = True) -> dict:
+    """
+    Wandelt mehrere Orderbücher in NumPy-Matrizen der Form (Symbole x Level) um.
+    Fehlende Level werden mit Preis NaN und Menge 0 aufgefüllt.
+
+    :param order_books: Dictionary Symbol -> Orderbuch (z.B. aus get_order_books)
+    :param depth: Anzahl Level pro Seite (Standard: tiefstes Buch)
+    :param units: zusätzlich bid_px_units, bid_qty_units, ask_px_units, ask_qty_units als
+                  int64-Festkomma (Stellen je Symbol aus festkomma.for_symbol, Auffüllung 0)
+                  und px_scale; book_metrics vergleicht Preislevel damit exakt
+    :return: Dictionary mit symbols, bid_px, bid_qty, ask_px, ask_qty
+    """
+    import numpy as np
+
+    books = {symbol: book for symbol, book in order_books.items() if book}
+    symbols = list(books)
+    if depth is None:
+        depth = max((max(len(b.get("bids", [])), len(b.get("asks", []))) for b in books.values()), default=0)
+
+    padding = [("nan", "0")] * depth
+    flat = {"bids": [], "asks": []}
+    for book in books.values():
+        for side in ("bids", "asks"):
+            levels = book.get(side, [])[:depth]
+            flat[side].extend(levels)
+            flat[side].extend(padding[:depth - len(levels)])
+
+    # Eine einzige String->Float-Konvertierung pro Seite statt pro Level
+    shape = (len(symbols), depth, 2)
+    bids = np.array(flat["bids"], dtype=np.float64).reshape(shape)
+    asks = np.array(flat["asks"], dtype=np.float64).reshape(shape)
+    arrays = {
+        "symbols": symbols,
+        "bid_px": bids[:, :, 0], "bid_qty": bids[:, :, 1],
+        "ask_px": asks[:, :, 0], "ask_qty": asks[:, :, 1],
+    }
+    if units:
+        # Exakte Preislevel für Vergleiche und Suche (ein vektorisierter Schritt je Matrix)
+        import festkomma
+
+        points = [festkomma.for_symbol(symbol) for symbol in symbols]
+        price_scale = np.array([p.price_scale for p in points], dtype=np.float64)[:, None]
+        qty_scale = np.array([p.qty_scale for p in points], dtype=np.float64)[:, None]
+        for side, levels in (("bid", bids), ("ask", asks)):
+            arrays[f"{side}_px_units"] = _to_units(np.nan_to_num(levels[:, :, 0]), price_scale, symbols)
+            arrays[f"{side}_qty_units"] = _to_units(levels[:, :, 1], qty_scale, symbols)
+        arrays["px_scale"] = price_scale[:, 0]
+    return arrays
+
+def _to_units(values, scale, symbols):
+    """
+    festkomma.to_units für eine Matrix (Symbole x Level); passt ein Symbol nicht
+    in int64, bleibt nur dessen Zeile 0 (wie die Auffüllung), statt den ganzen Batch abzubrechen
+    """
+    import numpy as np
+    import festkomma
+
+    try:
+        return festkomma.to_units(values, scale)
+    except ValueError:
+        pass
+    result = np.zeros(values.shape, dtype=np.int64)
+    for i, symbol in enumerate(symbols):
+        try:
+            result[i] = festkomma.to_units(values[i], scale[i])
+        except ValueError as e:
+            print(f"Festkomma-Umrechnung für {symbol} fehlgeschlagen: {e}")
+    return result
+
+def _walk_book(px, qty, notional):
+    """Durchschnittlicher Ausführungspreis für einen Notional-Betrag (NaN bei zu wenig Tiefe)"""
+    import numpy as np
+
+    level_notional = np.nan_to_num(px * qty)
+    cumulative = np.cumsum(level_notional, axis=1)
+    taken = np.clip(notional - (cumulative - level_notional), 0, level_notional)
+    filled_qty = np.nansum(np.divide(taken, px, out=np.zeros_like(taken), where=taken > 0), axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_price = notional / filled_qty
+    return np.where(cumulative[:, -1] >= notional, avg_price, np.nan)
+
+def book_metrics(arrays: dict, top_n: int = 5, depth_pct: float = 1.0, notional: float = 10_000):
+    """
+    Berechnet Mikrostruktur-Kennzahlen für alle Symbole in einem Durchlauf:
+      - spread / spread_bps, mid, microprice
+      - imbalance: (Bid-Menge - Ask-Menge) / Summe der Top-N-Level
+      - bid_depth / ask_depth: Notional innerhalb von ±depth_pct % um den Mid
+      - buy_slippage_bps / sell_slippage_bps: Slippage ggü. Mid für `notional`
+
+    :param arrays: Ergebnis von parse_order_books
+    :return: pandas.DataFrame mit einer Zeile pro Symbol
+    """
+    import numpy as np
+    import pandas as pd
+
+    bid_px, bid_qty = arrays["bid_px"], arrays["bid_qty"]
+    ask_px, ask_qty = arrays["ask_px"], arrays["ask_qty"]
+    if bid_px.shape[1] == 0:
+        return pd.DataFrame(np.nan, columns=METRIC_COLUMNS,
+                            index=pd.Index(arrays["symbols"], name="symbol"))
+
+    best_bid, best_ask = bid_px[:, 0], ask_px[:, 0]
+    bid_qty0, ask_qty0 = bid_qty[:, 0], ask_qty[:, 0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mid = (best_bid + best_ask) / 2
+        spread = best_ask - best_bid
+        microprice = (best_bid * ask_qty0 + best_ask * bid_qty0) / (bid_qty0 + ask_qty0)
+
+        top_bid = bid_qty[:, :top_n].sum(axis=1)
+        top_ask = ask_qty[:, :top_n].sum(axis=1)
+        imbalance = (top_bid - top_ask) / (top_bid + top_ask)
+
+        band = mid[:, None] * depth_pct / 100
+        in_bid = bid_px >= mid[:, None] - band
+        in_ask = ask_px <= mid[:, None] + band
+        if "bid_px_units" in arrays:
+            # Preislevel als int64-Festkomma: Spread und Grenzen des Tiefenbands ohne
+            # Rundungsfehler der Float-Preise. Zeilen ohne Festkomma-Werte (leere Seite,
+            # Umrechnung fehlgeschlagen) bleiben bei den Float-Werten.
+            bid_u, ask_u = arrays["bid_px_units"], arrays["ask_px_units"]
+            exact = (bid_u[:, 0] > 0) & (ask_u[:, 0] > 0)
+            spread = np.where(exact, (ask_u[:, 0] - bid_u[:, 0]) / arrays["px_scale"], spread)
+            mid_u = (bid_u[:, :1] + ask_u[:, :1]) / 2
+            in_bid = np.where(exact[:, None], bid_u >= mid_u * (1 - depth_pct / 100), in_bid)
+            in_ask = np.where(exact[:, None], (ask_u > 0) & (ask_u <= mid_u * (1 + depth_pct / 100)), in_ask)
+        bid_depth = np.where(in_bid, bid_px * bid_qty, 0).sum(axis=1)
+        ask_depth = np.where(in_ask, ask_px * ask_qty, 0).sum(axis=1)
+
+        buy_slippage = (_walk_book(ask_px, ask_qty, notional) / mid - 1) * 1e4
+        sell_slippage = (1 - _walk_book(bid_px, bid_qty, notional) / mid) * 1e4
+
+    return pd.DataFrame({
+        "mid": mid,
+        "spread": spread,
+        "spread_bps": spread / mid * 1e4,
+        "microprice": microprice,
+        "imbalance": imbalance,
+        "bid_depth": bid_depth,
+        "ask_depth": ask_depth,
+        "buy_slippage_bps": buy_slippage,
+        "sell_slippage_bps": sell_slippage,
+    }, index=pd.Index(arrays["symbols"], name="symbol"))
+
+def get_book_metrics(symbols: list, limit: int = 100, priority: int = scheduler.INTERACTIVE, **kwargs):
+    """Batch-Abruf und Kennzahlen für viele Symbole (kwargs siehe book_metrics)"""
+    return book_metrics(parse_order_books(get_order_books(symbols, limit=limit, priority=priority)), **kwargs)
+
 if __name__ == "__main__":
     symbol = "BTCUSDT"
     try:
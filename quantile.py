@@ -0,0 +1,287 @@
+from collections import deque
+
+import numpy as np
+
+import festkomma
+import metriken
+
+# Globale Einstellungen
+SKETCH_K = 400              # Genauigkeit der KLL-Skizze (Rangfehler etwa 1,7 / K)
+BUCKET_MS = 60_000          # Länge eines Buckets (= Zeile der Verteilungsausgabe)
+WINDOW_BUCKETS = 15         # Anzahl Buckets im gleitenden Fenster für die Walschwelle
+WHALE_PERCENTILE = 0.99     # Trades mit Notional über diesem Fenster-Quantil gelten als Wal
+MIN_TRADES = 1000           # Mindestanzahl Trades im Fenster, bevor Wale gemeldet werden
+REFRESH_TRADES = 5000       # Schwelle spätestens nach so vielen Trades neu berechnen
+REPORT_QUANTILES = (0.5, 0.9, 0.99)
+
+_C = 2 / 3                  # Schrumpffaktor der Levelkapazitäten (KLL)
+
+
+class KLLSketch:
+    """
+    KLL-Quantilskizze (Karnin, Lang, Liberty) mit begrenztem Speicher von etwa
+    3 * k Werten, unabhängig von der Anzahl eingefügter Werte.
+
+    Level h hält Werte mit Gewicht 2^h. Läuft ein Level über, wird es sortiert
+    und jeder zweite Wert (zufälliger Versatz) mit doppeltem Gewicht ins
+    nächste Level übernommen. Skizzen lassen sich verlustarm zusammenführen
+    (merge), daher eignen sie sich für gleitende Fenster aus Buckets.
+    """
+    __slots__ = ("k", "levels", "n", "min", "max", "_rng")
+
+    def __init__(self, k=SKETCH_K, seed=None):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, h):
+        return max(2, int(np.ceil(self.k * _C ** (len(self.levels) - 1 - h))))
+
+    def update(self, values):
+        """Fügt einen Wert oder ein Array von Werten hinzu"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if not len(values):
+            return
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self._compress()
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                level = np.sort(level)
+                # Bei ungerader Länge bleibt ein Wert im Level, der Rest wird halbiert
+                keep = level[:len(level) % 2]
+                promoted = level[len(keep) + self._rng.integers(2)::2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate((self.levels[h + 1], promoted))
+            h += 1
+
+    def merge(self, other):
+        """Übernimmt alle Werte einer anderen Skizze (gleiches k)"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate((self.levels[h], level))
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        """Geschätzte Quantile (q in [0, 1]); exakt für q = 0 und q = 1"""
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        if self.n == 0:
+            return np.full(len(qs), np.nan)
+        values, cumulative = self._weighted()
+        idx = np.searchsorted(cumulative, qs * cumulative[-1], side="left")
+        result = values[np.minimum(idx, len(values) - 1)]
+        result[qs <= 0] = self.min
+        result[qs >= 1] = self.max
+        return result
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def rank(self, value):
+        """Geschätzter Anteil der Werte <= value"""
+        if self.n == 0:
+            return np.nan
+        values, cumulative = self._weighted()
+        i = np.searchsorted(values, value, side="right")
+        return float(cumulative[i - 1] / cumulative[-1]) if i else 0.0
+
+    def size(self):
+        """Anzahl tatsächlich gespeicherter Werte"""
+        return sum(len(level) for level in self.levels)
+
+
+class WindowedSketch:
+    """
+    Gleitendes Fenster aus `buckets` Zeitbuckets mit je einer KLL-Skizze.
+    Abgeschlossene Buckets bleiben bis zum Herausfallen aus dem Fenster
+    erhalten; das Fenster-Quantil ergibt sich durch Zusammenführen.
+    """
+
+    def __init__(self, bucket_ms=BUCKET_MS, buckets=WINDOW_BUCKETS, k=SKETCH_K):
+        self.bucket_ms = bucket_ms
+        self.k = k
+        self.current_start = None
+        self.current = KLLSketch(k)
+        self.history = deque(maxlen=buckets - 1)   # (Bucketbeginn, Skizze) abgeschlossener Buckets
+
+    def rotate(self, bucket_start):
+        """Schließt den laufenden Bucket ab; :return: (Beginn, Skizze) des abgeschlossenen Buckets"""
+        finished = None
+        if self.current_start is not None:
+            finished = (self.current_start, self.current)
+            self.history.append(finished)
+        self.current_start = bucket_start
+        self.current = KLLSketch(self.k)
+        return finished
+
+    def window(self):
+        merged = KLLSketch(self.k)
+        for _, sketch in self.history:
+            merged.merge(sketch)
+        return merged.merge(self.current)
+
+
+class TradeSizeMonitor:
+    """
+    Verteilung von Tradegröße (Menge) und Notional (Preis * Menge) pro Symbol
+    in begrenztem Speicher, ohne einzelne Trades aufzubewahren.
+
+    - Pro Bucket (Standard: Minute der Trade-Zeit) eine Zeile in `completed`
+      mit Anzahl, Quantilen und Maximum von Größe und Notional.
+    - Trades, deren Notional das Quantil WHALE_PERCENTILE des gleitenden
+      Fensters übersteigt, werden sofort als Wal gemeldet (on_whale).
+    """
+
+    def __init__(self, symbol, bucket_ms=BUCKET_MS, buckets=WINDOW_BUCKETS, percentile=WHALE_PERCENTILE,
+                 min_trades=MIN_TRADES, refresh_trades=REFRESH_TRADES, k=SKETCH_K):
+        self.symbol = symbol.upper()
+        self.bucket_ms = bucket_ms
+        self.percentile = percentile
+        self.min_trades = min_trades
+        self.refresh_trades = refresh_trades
+        self.sizes = WindowedSketch(bucket_ms, buckets, k)
+        self.notionals = WindowedSketch(bucket_ms, buckets, k)
+        self.threshold = np.inf      # aktuelle Walschwelle (Notional)
+        self.completed = []          # Verteilungszeilen abgeschlossener Buckets
+        self._since_refresh = 0
+        self._callbacks = []
+
+    def on_whale(self, callback):
+        """Registriert callback(whale), aufgerufen für jeden Wal-Trade"""
+        self._callbacks.append(callback)
+
+    def add_trades(self, trades, fixed=None):
+        """
+        :param trades: Tupel (trade_id, time_ms, price, qty, maker) wie von TradeAggregator.parse_batch,
+                       Preis und Menge als Festkomma-Einheiten
+        :param fixed: Stellen der Einheiten (aggregator.fixed, Standard: festkomma.for_symbol)
+        :return: Liste der erkannten Wale
+        """
+        if not trades:
+            return []
+        fixed = fixed or festkomma.for_symbol(self.symbol)
+        _, times, prices, quantities, makers = zip(*trades)
+        return self.add_arrays(np.array(times, dtype=np.int64), fixed.to_price(np.array(prices, dtype=np.int64)),
+                               fixed.to_qty(np.array(quantities, dtype=np.int64)), np.array(makers, dtype=bool))
+
+    def add_arrays(self, times, prices, quantities, makers=None):
+        """
+        Wie add_trades, aber spaltenweise mit Preis und Menge als float
+        (z.B. aus einem TradeTape nach trade_tape.to_float)
+        """
+        whales = []
+        buckets = times // self.bucket_ms * self.bucket_ms
+        # Batch an Bucketgrenzen aufteilen (im Normalfall genau ein Teil)
+        bounds = np.flatnonzero(np.diff(buckets)) + 1
+        for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(times)]):
+            if buckets[lo] != self.sizes.current_start:
+                self._rotate(int(buckets[lo]))
+            qty = quantities[lo:hi]
+            notional = prices[lo:hi] * qty
+            whales.extend(self._detect(times[lo:hi], prices[lo:hi], qty, notional,
+                                       None if makers is None else makers[lo:hi]))
+            self.sizes.current.update(qty)
+            self.notionals.current.update(notional)
+            self._since_refresh += hi - lo
+            if self._since_refresh >= self.refresh_trades:
+                self._refresh()
+        return whales
+
+    def _detect(self, times, prices, qty, notional, makers):
+        hits = np.flatnonzero(notional > self.threshold)
+        whales = []
+        for i in hits:
+            whale = {
+                "symbol": self.symbol,
+                "time": int(times[i]),
+                "price": float(prices[i]),
+                "qty": float(qty[i]),
+                "notional": float(notional[i]),
+                "side": None if makers is None else ("SELL" if makers[i] else "BUY"),
+                "threshold": self.threshold,
+                "percentile": self.percentile,
+            }
+            whales.append(whale)
+            for callback in self._callbacks:
+                callback(whale)
+        if len(hits):
+            metriken.REGISTRY.inc("whale_trades", len(hits), symbol=self.symbol)
+        return whales
+
+    def _rotate(self, bucket_start):
+        finished = self.sizes.rotate(bucket_start)
+        finished_notional = self.notionals.rotate(bucket_start)
+        if finished is not None and finished[1].n:
+            self.completed.append(self._report(finished[0], finished[1], finished_notional[1]))
+        self._refresh()
+
+    def _refresh(self):
+        """Walschwelle aus dem gleitenden Fenster neu bestimmen"""
+        self._since_refresh = 0
+        window = self.notionals.window()
+        self.threshold = window.quantile(self.percentile) if window.n >= self.min_trades else np.inf
+
+    def _report(self, start, sizes, notionals):
+        row = {"minute": start, "trades": sizes.n}
+        for name, sketch in (("qty", sizes), ("notional", notionals)):
+            for q, value in zip(REPORT_QUANTILES, sketch.quantiles(REPORT_QUANTILES)):
+                row[f"{name}_p{round(q * 100)}"] = float(value)
+            row[f"{name}_max"] = float(sketch.max)
+        row["whale_threshold"] = self.threshold
+        return row
+
+    def current(self):
+        """Verteilungszeile des noch laufenden Buckets"""
+        if self.sizes.current_start is None:
+            return None
+        return self._report(self.sizes.current_start, self.sizes.current, self.notionals.current)
+
+
+if __name__ == "__main__":
+    import time
+
+    # Genauigkeit und Speicher gegenüber exakten Quantilen (lognormale Tradegrößen)
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(-3, 1.5, 2_000_000)
+    sketch = KLLSketch()
+    start = time.perf_counter()
+    for i in range(0, len(values), 512):
+        sketch.update(values[i:i + 512])
+    seconds = time.perf_counter() - start
+    qs = [0.5, 0.9, 0.99, 0.999]
+    exact = np.quantile(values, qs)
+    ranks = [np.mean(values <= v) for v in sketch.quantiles(qs)]
+    print(f"{len(values):,} Werte in {seconds:.2f} s ({len(values) / seconds:,.0f}/s), "
+          f"gespeichert: {sketch.size()} Werte")
+    for q, e, r in zip(qs, exact, ranks):
+        print(f"q={q:<6} exakt {e:10.5f}  Skizze {sketch.quantile(q):10.5f}  Rangfehler {abs(r - q):.4f}")
+
+    monitor = TradeSizeMonitor("BTCUSDT")
+    times = 1_700_000_000_000 + np.arange(len(values)) * 2
+    prices = np.full(len(values), 50_000.0)
+    whales = 0
+    for i in range(0, len(values), 512):
+        whales += len(monitor.add_arrays(times[i:i + 512], prices[i:i + 512], values[i:i + 512]))
+    print(f"{len(monitor.completed)} Minuten, {whales} Wale ({whales / len(values):.3%} der Trades)")
@@ -0,0 +1,243 @@
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+import metriken
+import scheduler
+from scheduler import BACKFILL, INTERACTIVE
+
+# Globale Einstellungen
+BINANCE_API_URL = "https://api.binance.com/api/v3"
+CACHE_SIZE = 2048          # Maximale Anzahl Einträge im LRU-Cache
+DEFAULT_TTL = 5.0          # Gültigkeit allgemeiner JSON-Antworten (Sekunden)
+OPEN_CANDLE_TTL = 2.0      # Gültigkeit der noch offenen letzten Kerze (Sekunden)
+CLOSE_MARGIN_MS = 2000     # Sicherheitsabstand, ab dem eine Kerze als geschlossen gilt
+MAX_CANDLES = 1500         # Maximal gespeicherte geschlossene Kerzen pro Symbol/Intervall
+MAX_LIMIT = 1000           # Maximales limit eines /klines-Requests
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000, "3d": 259_200_000,
+    "1w": 604_800_000,
+}
+
+
+class SingleFlight:
+    """
+    Fasst gleichzeitige identische Aufrufe zusammen: Nur der erste Aufrufer
+    führt die Funktion aus, alle weiteren warten auf dessen Ergebnis.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"event": threading.Event(), "result": None, "error": None}
+        if not leader:
+            metriken.REGISTRY.inc("singleflight_shared")
+            call["event"].wait()
+        else:
+            try:
+                call["result"] = func()
+            except Exception as e:
+                call["error"] = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call["event"].set()
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+
+
+class LRUCache:
+    """Threadsicherer LRU-Cache; Einträge ohne TTL bleiben bis zur Verdrängung gültig"""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # Schlüssel -> (Wert, Ablaufzeit oder None)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def create_session():
+    """Session mit Keep-Alive und Retry-Logik (429/418 behandelt der Scheduler)"""
+    session = requests.Session()
+    retries = Retry(total=5, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504])
+    adapter = HTTPAdapter(max_retries=retries, pool_maxsize=32)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session = create_session()
+_flight = SingleFlight()
+_cache = LRUCache()
+
+
+def _get(url, params, priority=INTERACTIVE):
+    with metriken.stage("klines_request" if url.endswith("/klines") else "http_request"):
+        response = scheduler.send(_session, url, params, priority=priority)
+    metriken.record_response(response)
+    response.raise_for_status()
+    with metriken.stage("json_parse"):
+        return response.json()
+
+
+def fetch_json(url, params=None, ttl=DEFAULT_TTL, priority=INTERACTIVE):
+    """
+    GET mit Single-Flight und LRU-Cache (z.B. für Futures-, Ticker- oder
+    exchangeInfo-Abfragen).
+
+    :param ttl: Gültigkeit der Antwort in Sekunden (None = unbegrenzt)
+    :param priority: Priorität im Scheduler (scheduler.INTERACTIVE/SCAN/BACKFILL)
+    """
+    params = params or {}
+    key = ("json", url, tuple(sorted(params.items())))
+    cached = _cache.get(key)
+    if cached is not None:
+        metriken.REGISTRY.inc("cache_hits", kind="json")
+        return cached
+    metriken.REGISTRY.inc("cache_misses", kind="json")
+
+    def load():
+        data = _get(url, params, priority)
+        _cache.set(key, data, ttl)
+        return data
+
+    return _flight.do(key, load)
+
+
+class _CandleEntry:
+    """Geschlossene Kerzen (dauerhaft) und die noch veränderlichen letzten Kerzen (mit Ablaufzeit)"""
+    __slots__ = ("closed", "tail", "expires", "exhausted")
+
+    def __init__(self):
+        self.closed = []          # geschlossene Kerzen, aufsteigend nach Öffnungszeit
+        self.tail = []            # offene bzw. gerade erst geschlossene Kerzen
+        self.expires = 0.0
+        self.exhausted = False    # True, wenn es keine älteren Kerzen mehr gibt
+
+    def candles(self, limit):
+        return (self.closed + self.tail)[-limit:]
+
+    def serve(self, limit, now_ms):
+        if time.monotonic() > self.expires:
+            return None
+        if self.tail and now_ms > self.tail[-1][6]:
+            return None  # Die letzte Kerze ist inzwischen abgelaufen
+        if len(self.closed) + len(self.tail) >= limit or self.exhausted:
+            return self.candles(limit)
+        return None
+
+    def merge(self, klines, now_ms):
+        final = [k for k in klines if k[6] < now_ms - CLOSE_MARGIN_MS]
+        if final:
+            first = final[0][0]
+            self.closed = ([k for k in self.closed if k[0] < first] + final)[-MAX_CANDLES:]
+        self.tail = klines[len(final):]
+        self.expires = time.monotonic() + OPEN_CANDLE_TTL
+
+
+def get_klines(symbol, interval, limit=500, base_url=BINANCE_API_URL, priority=INTERACTIVE):
+    """
+    Liefert Klines im Rohformat von /klines (Liste von 12-Feld-Listen).
+
+    Geschlossene Kerzen werden dauerhaft im Speicher gehalten, nur die offene
+    letzte Kerze läuft nach OPEN_CANDLE_TTL ab. Bei einer Aktualisierung
+    werden nur die seit dem letzten Abruf neuen Kerzen geladen. Gleichzeitige
+    identische Anfragen teilen sich einen einzigen HTTP-Request.
+    """
+    key = ("klines", base_url, symbol, interval)
+    entry = _cache.get(key)
+    if entry is not None:
+        candles = entry.serve(limit, int(time.time() * 1000))
+        if candles is not None:
+            metriken.REGISTRY.inc("cache_hits", kind="klines")
+            return candles
+    metriken.REGISTRY.inc("cache_misses", kind="klines")
+
+    def fetch(fetch_limit):
+        return _get(f"{base_url}/klines", {"symbol": symbol, "interval": interval, "limit": fetch_limit},
+                    priority)
+
+    def load():
+        now_ms = int(time.time() * 1000)
+        current = _cache.get(key) or _CandleEntry()
+        step = INTERVAL_MS.get(interval)
+        klines = None
+        if step and current.closed and (len(current.closed) + 1 >= limit or current.exhausted):
+            # Nur die Kerzen ab der letzten geschlossenen nachladen
+            missing = (now_ms - current.closed[-1][0]) // step + 1
+            if missing <= MAX_LIMIT:
+                klines = fetch(missing)
+                if klines and klines[0][0] > current.closed[-1][0]:
+                    klines = None  # Lücke zur gespeicherten Historie – vollständig neu laden
+        if klines is None:
+            fetch_limit = min(limit, MAX_LIMIT)
+            klines = fetch(fetch_limit)
+            current = _CandleEntry()
+            current.exhausted = len(klines) < fetch_limit
+        current.merge(klines, now_ms)
+        _cache.set(key, current)
+        return current
+
+    return _flight.do(key + (limit,), load).candles(limit)
+
+
+def get_klines_range(symbol, interval, start_ms, end_ms=None, base_url=BINANCE_API_URL,
+                     priority=BACKFILL):
+    """
+    Lädt alle Klines zwischen start_ms und end_ms seitenweise (je MAX_LIMIT
+    Kerzen) für Backfills. Diese Massenabrufe laufen am Cache vorbei.
+    """
+    klines = []
+    while True:
+        params = {"symbol": symbol, "interval": interval, "startTime": start_ms, "limit": MAX_LIMIT}
+        if end_ms is not None:
+            params["endTime"] = end_ms
+        batch = _get(f"{base_url}/klines", params, priority)
+        klines.extend(batch)
+        if len(batch) < MAX_LIMIT:
+            return klines
+        start_ms = batch[-1][0] + 1
+
+
+def clear():
+    _cache.clear()
@@ -0,0 +1,194 @@
+import heapq
+import itertools
+import threading
+import time
+from urllib.parse import urlparse
+
+import metriken
+
+# Prioritäten (kleiner = wichtiger)
+INTERACTIVE = 0   # Einzelanalyse, Orderbuch, CLI
+SCAN = 1          # Marktscanner über viele Symbole
+BACKFILL = 2      # Historische Massenabrufe
+
+# Gewichtslimits pro Minute und Host (Binance REQUEST_WEIGHT, siehe /exchangeInfo rateLimits)
+WEIGHT_LIMITS = {
+    "api.binance.com": 6000,
+    "fapi.binance.com": 2400,
+}
+DEFAULT_WEIGHT_LIMIT = 1200
+SAFETY = 0.9              # Anteil des Limits, der höchstens genutzt wird
+RESERVE = {               # Budgetanteil, der für wichtigere Prioritäten frei bleibt
+    INTERACTIVE: 0.0,
+    SCAN: 0.1,
+    BACKFILL: 0.25,
+}
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 32
+START_CONCURRENCY = 8
+MAX_RETRIES = 3           # Wiederholungen nach 429/418 (nach Retry-After)
+DEFAULT_RETRY_AFTER = 10  # Sekunden, falls kein Retry-After-Header gesendet wird
+
+
+def endpoint_weight(url, params=None):
+    """Request-Gewicht der verwendeten Binance-Endpoints (Stand der API-Dokumentation)"""
+    path = urlparse(url).path
+    params = params or {}
+    limit = int(params.get("limit", 0) or 0)
+    if path.endswith("/klines"):
+        limit = limit or 500
+        if path.startswith("/fapi"):
+            return 1 if limit < 100 else 2 if limit < 500 else 5 if limit <= 1000 else 10
+        return 2
+    if path.endswith("/depth"):
+        limit = limit or 100
+        if path.startswith("/fapi"):
+            return 2 if limit <= 50 else 5 if limit <= 100 else 10 if limit <= 500 else 20
+        return 5 if limit <= 100 else 25 if limit <= 500 else 50 if limit <= 1000 else 250
+    if path.endswith("/ticker/24hr"):
+        return 2 if "symbol" in params else 80
+    if path.endswith("/exchangeInfo"):
+        return 20
+    if path.endswith("/fundingRate"):
+        return 1
+    return 1
+
+
+class WeightScheduler:
+    """
+    Vergibt Requests eines Hosts nach Gewichtsbudget und Priorität.
+
+    - Das verbrauchte Gewicht der laufenden Minute wird lokal mitgezählt und mit
+      dem Header X-MBX-USED-WEIGHT-1M abgeglichen (erfasst auch andere Prozesse
+      mit derselben IP).
+    - Wartende Requests werden nach (Priorität, Ankunft) bedient; niedrigere
+      Prioritäten lassen RESERVE des Budgets für wichtigere Requests frei.
+    - Die Parallelität passt sich an (AIMD): +1/n pro erfolgreichem Request,
+      Halbierung bei 429/418. Nach 429/418 wird bis Retry-After pausiert.
+    """
+
+    def __init__(self, limit=DEFAULT_WEIGHT_LIMIT, name=""):
+        self.limit = limit
+        self.name = name
+        self.concurrency = float(START_CONCURRENCY)
+        self._cond = threading.Condition()
+        self._queue = []                 # Heap von (Priorität, Nummer)
+        self._seq = itertools.count()
+        self._minute = self._current_minute()
+        self._used = 0
+        self._inflight = 0
+        self._paused_until = 0.0
+
+    @staticmethod
+    def _current_minute():
+        return int(time.time() // 60)
+
+    def _roll(self):
+        minute = self._current_minute()
+        if minute != self._minute:
+            self._minute = minute
+            self._used = 0
+
+    def _admissible(self, weight, priority):
+        if self._inflight >= int(self.concurrency):
+            return False
+        budget = self.limit * (SAFETY - RESERVE.get(priority, 0.0))
+        return self._used + weight <= budget or (self._used == 0 and self._inflight == 0)
+
+    def _wait_time(self):
+        now = time.time()
+        if self._paused_until > now:
+            return self._paused_until - now
+        return (self._minute + 1) * 60 - now + 0.05
+
+    def acquire(self, weight, priority=SCAN):
+        """Blockiert, bis der Request gesendet werden darf"""
+        ticket = (priority, next(self._seq))
+        start = time.perf_counter()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            while True:
+                self._roll()
+                if (self._queue[0] == ticket and time.time() >= self._paused_until
+                        and self._admissible(weight, priority)):
+                    break
+                # Erwachen spätestens zum Minutenwechsel bzw. Ende der Pause
+                self._cond.wait(timeout=min(self._wait_time(), 1.0))
+            heapq.heappop(self._queue)
+            self._used += weight
+            self._inflight += 1
+            # Der nächste in der Warteschlange kann evtl. sofort folgen
+            self._cond.notify_all()
+        metriken.REGISTRY.observe("scheduler_wait", time.perf_counter() - start,
+                                  host=self.name, priority=priority)
+
+    def release(self, response=None):
+        """Gibt den Platz frei und übernimmt Gewicht, Status und Retry-After der Antwort"""
+        with self._cond:
+            self._inflight -= 1
+            if response is not None:
+                self._update(response)
+            self._cond.notify_all()
+
+    def _update(self, response):
+        used = response.headers.get("X-MBX-USED-WEIGHT-1M") or response.headers.get("X-MBX-USED-WEIGHT")
+        if used is not None:
+            self._roll()
+            self._used = max(self._used, int(used))
+        if response.status_code in (418, 429):
+            retry_after = response.headers.get("Retry-After")
+            pause = float(retry_after) if retry_after else DEFAULT_RETRY_AFTER
+            self._paused_until = max(self._paused_until, time.time() + pause)
+            self.concurrency = max(MIN_CONCURRENCY, self.concurrency / 2)
+            metriken.REGISTRY.inc("scheduler_throttled", host=self.name, status=response.status_code)
+        elif response.status_code < 500 and self._used < self.limit * SAFETY / 2:
+            # Nur bei reichlich Budget erhöhen; nahe am Limit bremst das Budget ohnehin
+            self.concurrency = min(MAX_CONCURRENCY, self.concurrency + 1 / self.concurrency)
+
+    def stats(self):
+        with self._cond:
+            self._roll()
+            return {"used": self._used, "limit": self.limit, "inflight": self._inflight,
+                    "waiting": len(self._queue), "concurrency": int(self.concurrency),
+                    "paused": max(0.0, self._paused_until - time.time())}
+
+
+_schedulers = {}
+_lock = threading.Lock()
+
+
+def for_url(url):
+    """Gemeinsamer Scheduler des Hosts einer URL"""
+    host = urlparse(url).hostname or ""
+    with _lock:
+        scheduler = _schedulers.get(host)
+        if scheduler is None:
+            scheduler = _schedulers[host] = WeightScheduler(
+                WEIGHT_LIMITS.get(host, DEFAULT_WEIGHT_LIMIT), name=host)
+        return scheduler
+
+
+def send(session, url, params=None, priority=INTERACTIVE, weight=None):
+    """
+    GET über den Scheduler des Hosts. Bei 429/418 wird nach Retry-After bis zu
+    MAX_RETRIES-mal erneut eingereiht; die letzte Antwort wird zurückgegeben.
+
+    :param session: requests.Session (oder das Modul requests)
+    """
+    scheduler = for_url(url)
+    weight = endpoint_weight(url, params) if weight is None else weight
+    for attempt in range(MAX_RETRIES + 1):
+        scheduler.acquire(weight, priority)
+        response = None
+        try:
+            response = session.get(url, params=params)
+        finally:
+            scheduler.release(response)
+        if response.status_code not in (418, 429) or attempt == MAX_RETRIES:
+            return response
+        metriken.record_response(response)
+
+
+def stats():
+    with _lock:
+        return {host: scheduler.stats() for host, scheduler in _schedulers.items()}
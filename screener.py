@@ -0,0 +1,450 @@
+import gzip
+import json
+import math
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+
+import histori
+import metriken
+import orderbuch
+import request_cache
+import scheduler
+
+# Globale Einstellungen
+HOST = "127.0.0.1"
+PORT = 8088
+REFRESH_INTERVAL = 300      # Sekunden zwischen zwei Scans (ein Upstream-Feed für alle Clients)
+BOOK_TOP = 50               # Orderbuch-Kennzahlen für die besten N Coins nach Score
+BOOK_LIMIT = 100            # Orderbuch-Level pro Seite für die Kennzahlen
+SERIES_LIMIT = 200          # Standardanzahl Kerzen pro /klines-Antwort
+RESPONSE_CACHE = 512        # fertig kodierte Antworten pro Snapshot (LRU)
+GZIP_MIN_BYTES = 1024       # kleinere Antworten werden unkomprimiert gesendet
+GZIP_LEVEL = 5              # Kompromiss aus Kompressionsrate und CPU-Zeit pro Antwort
+
+KLINE_FIELDS = ("timestamp", "open", "high", "low", "close", "volume")
+BOOK_FIELDS = ("spread_bps", "imbalance", "bid_depth", "ask_depth", "buy_slippage_bps", "sell_slippage_bps")
+
+
+class QueryError(ValueError):
+    """Ungültiger Filter-, Sortier- oder Feldparameter (HTTP 400)"""
+
+
+class NotReady(Exception):
+    """Noch kein Snapshot vorhanden, der erste Scan läuft noch (HTTP 503)"""
+
+
+def _clean(value):
+    """numpy-Skalare in Python-Typen, NaN/inf in None (gültiges JSON)"""
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return value if math.isfinite(value) else None
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return value
+
+
+def _encode(payload):
+    return json.dumps(payload, separators=(",", ":"), allow_nan=False).encode()
+
+
+class Snapshot:
+    """
+    Unveränderlicher Stand eines Scans: Ergebniszeilen aller bewerteten Coins
+    (inkl. Orderbuch-Kennzahlen der besten BOOK_TOP), Kerzen und Indikatoren
+    je Symbol. Anfragen lesen immer einen vollständigen Snapshot; ein neuer
+    Scan ersetzt ihn als Ganzes.
+    """
+
+    def __init__(self, version, rows, frames, books=None, seconds=0.0):
+        self.version = version
+        self.generated = int(time.time() * 1000)
+        self.seconds = seconds
+        self.rows = [{key: _clean(value) for key, value in row.items()} for row in rows]
+        self.by_symbol = {row["symbol"]: row for row in self.rows}
+        self.frames = frames
+        self.books = {symbol: {key: _clean(value) for key, value in book.items()}
+                      for symbol, book in (books or {}).items()}
+        for symbol, book in self.books.items():
+            row = self.by_symbol.get(symbol)
+            if row is not None:
+                row.update({field: book.get(field) for field in BOOK_FIELDS})
+        self.fields = sorted({key for row in self.rows for key in row})
+        # Felder, deren Werte ausschließlich Zahlen sind (für _min/_max-Filter)
+        self.numeric = {
+            field for field in self.fields
+            if all(isinstance(row.get(field), (int, float)) and not isinstance(row.get(field), bool)
+                   for row in self.rows if row.get(field) is not None)
+        }
+
+    def series(self, symbol, fields=KLINE_FIELDS, limit=SERIES_LIMIT):
+        """Spaltenweise letzte `limit` Kerzen/Indikatoren eines Symbols"""
+        df = self.frames.get(symbol)
+        if df is None:
+            return None
+        unknown = [field for field in fields if field not in df.columns]
+        if unknown:
+            raise QueryError(f"Unbekannte Spalten: {', '.join(unknown)}")
+        tail = df.iloc[-limit:] if limit else df
+        columns = {}
+        for field in fields:
+            if field == "timestamp":
+                columns[field] = tail[field].to_numpy().astype("datetime64[ms]").astype(np.int64).tolist()
+            else:
+                values = tail[field].to_numpy(dtype=np.float64).tolist()
+                columns[field] = [v if math.isfinite(v) else None for v in values]
+        return columns
+
+
+def _number(text):
+    try:
+        return float(text)
+    except ValueError:
+        raise QueryError(f"Keine Zahl: {text!r}") from None
+
+
+def _count(name, text):
+    """Nicht-negative ganze Zahl für offset/limit (inf, nan, -1 und 1.5 -> QueryError)"""
+    value = _number(text)
+    if not math.isfinite(value) or value < 0 or value != int(value):
+        raise QueryError(f"{name} muss eine nicht-negative ganze Zahl sein: {text!r}")
+    return int(value)
+
+
+def _sort(rows, field, descending):
+    """Stabile Sortierung nach einem Feld; fehlende Werte immer am Ende"""
+    present = [row for row in rows if row.get(field) is not None]
+    missing = [row for row in rows if row.get(field) is None]
+    return sorted(present, key=lambda row: row[field], reverse=descending) + missing
+
+
+def query_rows(snapshot, params):
+    """
+    Filtert und sortiert die Ergebniszeilen eines Snapshots.
+
+    Parameter (alle optional):
+      - <feld>=wert          Gleichheit (z.B. trend=Up)
+      - <feld>_min / _max    numerische Grenzen (z.B. score_min=7&rsi_max=70)
+      - pattern=name         Kerzenmuster vorhanden (engulfing, engulfing+ oder engulfing-)
+      - sort=-score,rsi      Sortierung, "-" = absteigend (Standard: -score)
+      - offset, limit        Ausschnitt (Standard: alle)
+      - fields=a,b           nur diese Spalten
+
+    :return: (Zeilen, Spaltennamen, Gesamtzahl vor offset/limit)
+    :raise QueryError: bei unbekannten Feldern oder ungültigen Werten
+    """
+    known = set(snapshot.fields)
+    rows = snapshot.rows
+    sort, fields, offset, limit = "-score", None, 0, None
+    for name, value in params:
+        if name == "sort":
+            sort = value
+        elif name == "fields":
+            fields = [f for f in value.split(",") if f]
+        elif name == "offset":
+            offset = _count("offset", value)
+        elif name == "limit":
+            limit = _count("limit", value)
+        elif name == "format":
+            continue
+        elif name == "pattern":
+            rows = [row for row in rows if value in _pattern_tokens(row.get("patterns"))]
+        elif name.endswith("_min") and name[:-4] in known:
+            _require_numeric(snapshot, name[:-4])
+            bound = _number(value)
+            rows = [row for row in rows if row.get(name[:-4]) is not None and row[name[:-4]] >= bound]
+        elif name.endswith("_max") and name[:-4] in known:
+            _require_numeric(snapshot, name[:-4])
+            bound = _number(value)
+            rows = [row for row in rows if row.get(name[:-4]) is not None and row[name[:-4]] <= bound]
+        elif name in known:
+            rows = [row for row in rows if _matches(row.get(name), value)]
+        else:
+            raise QueryError(f"Unbekannter Parameter: {name}")
+
+    for part in reversed([p for p in sort.split(",") if p]):
+        field = part.lstrip("-+")
+        if field not in known:
+            raise QueryError(f"Unbekanntes Sortierfeld: {field}")
+        rows = _sort(rows, field, part.startswith("-"))
+
+    if fields is None:
+        fields = snapshot.fields
+    else:
+        unknown = [f for f in fields if f not in known]
+        if unknown:
+            raise QueryError(f"Unbekannte Spalten: {', '.join(unknown)}")
+    total = len(rows)
+    rows = rows[offset:offset + limit if limit is not None else None]
+    return rows, fields, total
+
+
+def _require_numeric(snapshot, field):
+    if field not in snapshot.numeric:
+        raise QueryError(f"Kein numerisches Feld: {field}")
+
+
+def _pattern_tokens(patterns):
+    tokens = set()
+    for token in (patterns or "").split(","):
+        if token:
+            tokens.add(token)
+            tokens.add(token[:-1])
+    return tokens
+
+
+def _matches(actual, expected):
+    if isinstance(actual, (int, float)) and not isinstance(actual, bool):
+        return actual == _number(expected)
+    return str(actual).lower() == expected.lower()
+
+
+class ScreenerState:
+    """
+    Hält den jeweils letzten Snapshot im Speicher und aktualisiert ihn in einem
+    Hintergrund-Thread. Alle Clients lesen denselben Snapshot: die Anzahl der
+    Anfragen an Binance hängt nur von REFRESH_INTERVAL ab, nicht von der
+    Anzahl der Clients.
+    """
+
+    def __init__(self, symbols=None, book_top=BOOK_TOP):
+        self.symbols = symbols
+        self.book_top = book_top
+        self.snapshot = Snapshot(0, [], {})
+        self.responses = request_cache.LRUCache(RESPONSE_CACHE)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish(self, rows, frames, books=None, seconds=0.0):
+        """Ersetzt den aktuellen Snapshot (z.B. mit extern berechneten Ergebnissen)"""
+        with self._lock:
+            self.snapshot = Snapshot(self.snapshot.version + 1, rows, frames, books, seconds)
+        metriken.REGISTRY.inc("screener_snapshots")
+        return self.snapshot
+
+    def refresh(self):
+        """Ein vollständiger Scan: Kerzen, Indikatoren, Muster, Score, Orderbücher"""
+        start = time.perf_counter()
+        symbols = self.symbols or histori.get_binance_trading_pairs()[:histori.MAX_SYMBOLS]
+        frames = histori.prepare_frames(symbols)
+        rows = histori.score_frames(frames)
+        books = {}
+        top = [row["symbol"] for row in sorted(rows, key=lambda r: r["score"], reverse=True)[:self.book_top]]
+        if top:
+            try:
+                with metriken.stage("book_metrics"):
+                    metrics = orderbuch.get_book_metrics(top, limit=BOOK_LIMIT, priority=scheduler.SCAN,
+                                                         notional=histori.LIQUIDITY_NOTIONAL)
+                books = metrics.to_dict(orient="index")
+            except OSError as e:
+                print(f"Fehler beim Abruf der Orderbücher: {e}")
+        return self.publish(rows, frames, books, time.perf_counter() - start)
+
+    def start(self, interval=REFRESH_INTERVAL):
+        """Startet die periodische Aktualisierung (erster Scan sofort)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, args=(interval,), daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self, interval):
+        while not self._stop.is_set():
+            try:
+                snapshot = self.refresh()
+                print(f"Snapshot {snapshot.version}: {len(snapshot.rows)} Coins in {snapshot.seconds:.1f} s")
+            except Exception as e:
+                print(f"Fehler bei der Aktualisierung: {e}")
+            self._stop.wait(interval)
+
+    def stop(self):
+        self._stop.set()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Read-only JSON-API (HTTP/1.1 mit Keep-Alive):
+
+      /health                 Version und Alter des Snapshots
+      /scan?...               gefilterte/sortierte Ergebniszeilen (siehe query_rows),
+                              format=columns liefert {"columns": [...], "rows": [[...]]}
+      /symbol/<SYMBOL>        Ergebniszeile inkl. Orderbuch-Kennzahlen
+      /klines/<SYMBOL>?limit=&fields=   Kerzen und Indikatoren spaltenweise
+      /book                   Orderbuch-Kennzahlen der besten BOOK_TOP Coins
+
+    Antworten werden je Snapshot, Pfad und Kodierung einmal erzeugt und aus
+    dem Speicher wiederholt (ETag/If-None-Match, gzip ab GZIP_MIN_BYTES).
+    Vor dem ersten Snapshot antworten alle Endpunkte außer /health mit 503.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        start = time.perf_counter()
+        state = self.server.state
+        snapshot = state.snapshot
+        accepts_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+        key = (snapshot.version, self.path, accepts_gzip)
+        cached = state.responses.get(key)
+        if cached is None:
+            metriken.REGISTRY.inc("screener_cache_misses")
+            cached = self._render(snapshot, accepts_gzip)
+            if cached[0] < 500:
+                state.responses.set(key, cached)
+        else:
+            metriken.REGISTRY.inc("screener_cache_hits")
+        status, body, etag, encoding = cached
+
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("X-Snapshot-Version", str(snapshot.version))
+        if encoding and body:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.wfile.write(body)
+        endpoint = "/" + urlparse(self.path).path.strip("/").split("/")[0]
+        metriken.REGISTRY.observe("screener_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+
+    def _render(self, snapshot, accepts_gzip):
+        url = urlparse(self.path)
+        params = parse_qsl(url.query)
+        parts = [p for p in url.path.split("/") if p]
+        try:
+            status, payload = 200, self._route(snapshot, parts, params)
+            if payload is None:
+                status, payload = 404, {"error": f"Nicht gefunden: {url.path}"}
+        except (QueryError, ValueError) as e:
+            status, payload = 400, {"error": str(e)}
+        except NotReady as e:
+            status, payload = 503, {"error": str(e)}
+        except Exception as e:
+            # Jede Anfrage bekommt eine Antwort, statt dass die Verbindung ohne Antwort endet
+            print(f"Fehler bei {self.path}: {type(e).__name__}: {e}")
+            status, payload = 500, {"error": f"Interner Fehler: {type(e).__name__}"}
+        body = _encode(payload)
+        etag = f'"{snapshot.version}-{zlib.crc32(body):08x}"'
+        encoding = None
+        if accepts_gzip and len(body) >= GZIP_MIN_BYTES:
+            body, encoding = gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+        return status, body, etag, encoding
+
+    def _route(self, snapshot, parts, params):
+        if parts == ["health"]:
+            return {"version": snapshot.version, "generated": snapshot.generated,
+                    "age_seconds": round(time.time() - snapshot.generated / 1000, 3),
+                    "scan_seconds": round(snapshot.seconds, 3), "symbols": len(snapshot.rows)}
+        if snapshot.version == 0:
+            raise NotReady("Noch kein Snapshot, der erste Scan läuft noch")
+        if parts == ["scan"]:
+            rows, fields, total = query_rows(snapshot, params)
+            meta = {"version": snapshot.version, "generated": snapshot.generated, "total": total}
+            if dict(params).get("format") == "columns":
+                return {**meta, "columns": fields, "rows": [[row.get(f) for f in fields] for row in rows]}
+            return {**meta, "results": [{f: row.get(f) for f in fields} for row in rows]}
+        if len(parts) == 2 and parts[0] == "symbol":
+            return snapshot.by_symbol.get(parts[1].upper())
+        if len(parts) == 2 and parts[0] == "klines":
+            options = dict(params)
+            fields = tuple(f for f in options.get("fields", "").split(",") if f) or KLINE_FIELDS
+            limit = _count("limit", options.get("limit", SERIES_LIMIT))
+            columns = snapshot.series(parts[1].upper(), fields, limit)
+            if columns is None:
+                return None
+            return {"symbol": parts[1].upper(), "interval": histori.INTERVAL, **columns}
+        if parts == ["book"]:
+            return {"version": snapshot.version, "books": snapshot.books}
+        return None
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host=HOST, port=PORT, state=None):
+    """
+    Startet die Screener-API im Hintergrund (Port 0 = frei wählen). Die
+    Aktualisierung startet separat über state.start().
+
+    :return: Server-Objekt mit .url und .state (mit server.shutdown() beenden)
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.state = state or ScreenerState()
+    server.url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _synthetic_frames(symbols, bars=500, seed=0):
+    """Random-Walk-Kerzen mit Indikatoren wie im Scan (für den Benchmark)"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    frames = {}
+    for i in range(symbols):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+        open = np.r_[close[0], close[:-1]]
+        volume = rng.uniform(1e3, 1e5, bars)
+        df = pd.DataFrame({"timestamp": 1_700_000_000_000 + np.arange(bars) * 86_400_000, "open": open,
+                           "high": np.maximum(open, close) * 1.01, "low": np.minimum(open, close) * 0.99,
+                           "close": close, "volume": volume, "quote_volume": volume * close})
+        frames[f"S{i}USDT"] = histori.calculate_indicators(df)
+    return frames
+
+
+def benchmark(symbols=500, requests_per_query=200):
+    """Latenz und Antwortgröße typischer Abfragen gegen einen synthetischen Snapshot"""
+    import requests
+
+    frames = _synthetic_frames(symbols)
+    state = ScreenerState()
+    state.publish(histori.score_frames(frames), frames)
+    server = serve(port=0, state=state)
+    session = requests.Session()
+    queries = ["/scan?sort=-score&limit=20", "/scan?trend=Up&rsi_max=70&sort=-volume_pct&format=columns",
+               "/scan", "/klines/S1USDT?limit=500&fields=timestamp,close,rsi,macd_hist"]
+    try:
+        for query in queries:
+            times = []
+            for _ in range(requests_per_query):
+                start = time.perf_counter()
+                response = session.get(server.url + query)
+                times.append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+            raw = len(session.get(server.url + query, headers={"Accept-Encoding": "identity"}).content)
+            wire = int(response.headers["Content-Length"])
+            times.sort()
+            print(f"{query:<62} p50 {times[len(times) // 2]:6.3f} ms  p99 {times[int(len(times) * 0.99)]:6.3f} ms"
+                  f"  {raw / 1024:7.1f} KiB -> {wire / 1024:6.1f} KiB")
+        # Erste Anfrage nach einem neuen Snapshot (ohne Antwort-Cache)
+        start = time.perf_counter()
+        state.publish(state.snapshot.rows, frames)
+        session.get(server.url + queries[1]).raise_for_status()
+        print(f"Neuer Snapshot, erste gefilterte Abfrage: {(time.perf_counter() - start) * 1000:.2f} ms")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        benchmark()
+        sys.exit()
+    server = serve(port=int(sys.argv[1]) if len(sys.argv) > 1 else PORT)
+    server.state.start()
+    print(f"Screener-API läuft auf {server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
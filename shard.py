@@ -0,0 +1,319 @@
+import heapq
+import json
+import multiprocessing
+import os
+import secrets
+import socket
+import threading
+import time
+import zlib
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+
+import metriken
+
+# Globale Einstellungen
+ADDRESS = ("127.0.0.1", 0)    # Adresse des Koordinators (Port 0 = frei wählen)
+AUTHKEY = os.environ.get("SHARD_AUTHKEY", "").encode()  # gemeinsamer Schlüssel für entfernte Worker (Pflicht)
+CHUNK_SIZE = 25               # Symbole pro Fortschrittsmeldung eines Workers
+PARTIAL_K = 50                # Kandidaten pro Worker-Meldung bzw. im Gesamtergebnis (Top-K)
+JOIN_TIMEOUT = 30             # Sekunden, die auf alle Worker gewartet wird
+WORKER_TIMEOUT = 300          # Sekunden ohne Meldung, nach denen ein Worker als ausgefallen gilt
+HANDSHAKE_TIMEOUT = 10        # Sekunden für Authentifizierung und Anmeldung einer neuen Verbindung
+
+# Einstellungen von histori, die der Koordinator an alle Worker weitergibt
+SETTINGS = ("INTERVAL", "DATA_LIMIT", "MIN_SCORE", "MAX_WORKERS", "EXPORT_DIR", "PATTERNS",
+            "VALIDATE_KLINES")
+
+
+def shard_of(symbol, shards):
+    """Stabile Zuordnung Symbol -> Shard (unabhängig von PYTHONHASHSEED)"""
+    return zlib.crc32(symbol.encode()) % shards
+
+
+def partition(symbols, shards):
+    parts = [[] for _ in range(shards)]
+    for symbol in symbols:
+        parts[shard_of(symbol, shards)].append(symbol)
+    return parts
+
+
+def _top(results, k=PARTIAL_K):
+    return heapq.nlargest(k, results, key=lambda r: r['score'])
+
+
+def _send(conn, message):
+    """Nachrichten als JSON statt Pickle: empfangene Daten führen keinen Code aus"""
+    conn.send_bytes(json.dumps(message, default=lambda value: value.item()).encode())
+
+
+def _recv(conn):
+    return json.loads(conn.recv_bytes())
+
+
+class _Deadline:
+    """Verbindung für den Handshake: recv_bytes bricht nach `timeout` Sekunden ohne Daten ab"""
+
+    def __init__(self, conn, timeout):
+        self.conn = conn
+        self.timeout = timeout
+
+    def send_bytes(self, data):
+        self.conn.send_bytes(data)
+
+    def recv_bytes(self, maxlength=None):
+        if not self.conn.poll(self.timeout):
+            raise TimeoutError
+        return self.conn.recv_bytes(maxlength)
+
+
+def _require_authkey(authkey):
+    if not authkey:
+        raise ValueError("SHARD_AUTHKEY ist nicht gesetzt – ohne gemeinsamen Schlüssel "
+                         "werden keine entfernten Worker angenommen")
+    return authkey
+
+
+def run_worker(address, authkey=AUTHKEY, name=None):
+    """
+    Worker-Prozess: meldet sich beim Koordinator, analysiert die zugeteilten
+    Symbole in Blöcken von CHUNK_SIZE und meldet nach jedem Block die erledigten
+    Symbole und seine besten Kandidaten (partielles Top-K). Alle bewerteten
+    Coins exportiert der Worker selbst (histori.EXPORT_DIR).
+    """
+    import histori
+
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    conn = Client(address, authkey=_require_authkey(authkey))
+    _send(conn, {"type": "hello", "worker": name})
+    try:
+        while True:
+            message = _recv(conn)
+            if message["type"] == "config":
+                for key, value in message["settings"].items():
+                    if key not in SETTINGS:
+                        continue
+                    if isinstance(value, list) and isinstance(getattr(histori, key), tuple):
+                        value = tuple(value)
+                    setattr(histori, key, value)
+            elif message["type"] == "assign":
+                scanned = []
+                symbols = message["symbols"]
+                for i in range(0, len(symbols), CHUNK_SIZE):
+                    chunk = symbols[i:i + CHUNK_SIZE]
+                    results, chunk_scanned = histori.scan_symbols(chunk)
+                    scanned.extend(chunk_scanned)
+                    _send(conn, {"type": "progress", "done": chunk, "results": _top(results)})
+                histori.export_scan(scanned)
+            elif message["type"] == "stop":
+                _send(conn, {"type": "metrics", "metrics": metriken.REGISTRY.to_dict()})
+                return
+    except EOFError:
+        print(f"Worker {name}: Verbindung zum Koordinator verloren")
+    finally:
+        conn.close()
+
+
+class _Worker:
+    __slots__ = ("name", "conn", "assigned", "alive", "send_lock", "finished")
+
+    def __init__(self, name, conn):
+        self.name = name
+        self.conn = conn
+        self.assigned = set()
+        self.alive = True
+        self.send_lock = threading.Lock()
+        self.finished = threading.Event()
+
+    def send(self, message):
+        with self.send_lock:
+            _send(self.conn, message)
+
+
+class Coordinator:
+    """
+    Verteilt ein Symboluniversum per Hash-Partitionierung auf Worker und führt
+    deren partielle Top-K-Ergebnisse zusammen.
+
+    Fällt ein Worker aus (Verbindungsabbruch oder WORKER_TIMEOUT ohne Meldung),
+    werden seine noch offenen Symbole auf die übrigen Worker verteilt. Ohne
+    lebende Worker analysiert der Koordinator den Rest selbst.
+    """
+
+    def __init__(self, symbols, shards, address=ADDRESS, authkey=AUTHKEY, settings=None):
+        # Authentifizierung erst im Thread der Verbindung (_handle), damit ein
+        # hängender oder falscher Client die Annahme weiterer Worker nicht blockiert
+        self.authkey = _require_authkey(authkey)
+        self.listener = Listener(address)
+        self.address = self.listener.address
+        self.shards = shards
+        self.settings = settings or {}
+        self.remaining = set(symbols)
+        self.unassigned = [set(part) for part in partition(symbols, shards)]
+        self.results = []
+        self.workers = []
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                if self._closed:
+                    return  # Listener geschlossen
+                continue    # z.B. Verbindung vor der Annahme abgebrochen
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handshake(self, conn):
+        """Gegenseitige Authentifizierung wie Listener(authkey=...) und Anmeldung, mit Timeout"""
+        deadline = _Deadline(conn, HANDSHAKE_TIMEOUT)
+        deliver_challenge(deadline, self.authkey)
+        answer_challenge(deadline, self.authkey)
+        return json.loads(deadline.recv_bytes())
+
+    def _handle(self, conn):
+        try:
+            hello = self._handshake(conn)
+        except (AuthenticationError, EOFError, OSError, TimeoutError, ValueError) as e:
+            print(f"Verbindung abgelehnt: {type(e).__name__} {e}".rstrip())
+            conn.close()
+            return
+        worker = _Worker(hello["worker"], conn)
+        worker.send({"type": "config", "settings": self.settings})
+        with self._cond:
+            self.workers.append(worker)
+            shard = None
+            while self.unassigned and not shard:
+                shard = self.unassigned.pop(0) & self.remaining
+            if shard:
+                worker.assigned |= shard
+        if shard:
+            worker.send({"type": "assign", "symbols": sorted(shard)})
+        print(f"Worker {worker.name} verbunden ({len(shard or ())} Symbole)")
+
+        try:
+            while True:
+                if not conn.poll(WORKER_TIMEOUT):
+                    if worker.assigned:
+                        raise TimeoutError
+                    continue
+                message = _recv(conn)
+                if message["type"] == "progress":
+                    with self._cond:
+                        done = set(message["done"])
+                        worker.assigned -= done
+                        self.remaining -= done
+                        self.results = _top(self.results + message["results"])
+                        self._cond.notify_all()
+                elif message["type"] == "metrics":
+                    metriken.REGISTRY.merge(message["metrics"], worker=worker.name)
+                    worker.finished.set()
+                    return
+        except (EOFError, OSError, TimeoutError, ValueError, KeyError):
+            print(f"Worker {worker.name} ausgefallen, {len(worker.assigned)} Symbole werden neu verteilt")
+            metriken.REGISTRY.inc("shard_worker_lost")
+            self._lost(worker)
+        finally:
+            conn.close()
+            worker.finished.set()
+
+    def _lost(self, worker):
+        with self._cond:
+            worker.alive = False
+            orphans, worker.assigned = worker.assigned & self.remaining, set()
+            self._distribute(orphans)
+            self._cond.notify_all()
+
+    def _distribute(self, symbols):
+        """Verteilt Symbole per Hash auf die lebenden Worker (Aufruf mit gehaltenem Lock)"""
+        live = [w for w in self.workers if w.alive]
+        if not symbols or not live:
+            return
+        for worker, part in zip(live, partition(sorted(symbols), len(live))):
+            if part:
+                worker.assigned.update(part)
+                try:
+                    worker.send({"type": "assign", "symbols": part})
+                except OSError:
+                    pass  # Ausfall wird vom Empfangsthread des Workers erkannt
+
+    def run(self, join_timeout=JOIN_TIMEOUT):
+        """Wartet, bis alle Symbole erledigt sind; :return: Top-K-Kandidaten"""
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        deadline = time.monotonic() + join_timeout
+        try:
+            with self._cond:
+                while self.remaining:
+                    live = [w for w in self.workers if w.alive]
+                    if not live and len(self.workers) >= self.shards:
+                        break  # alle erwarteten Worker sind angemeldet und ausgefallen
+                    if time.monotonic() >= deadline:
+                        # Shards nicht erschienener Worker bzw. verwaiste Symbole übernehmen
+                        orphans = set().union(*self.unassigned) if self.unassigned else set()
+                        orphans |= self.remaining - set().union(*(w.assigned for w in live))
+                        self.unassigned = []
+                        if orphans and live:
+                            self._distribute(orphans & self.remaining)
+                        elif orphans:
+                            break
+                    self._cond.wait(timeout=1.0)
+                local = sorted(self.remaining)
+            if local:
+                import histori
+                print(f"Keine Worker verfügbar, analysiere {len(local)} Symbole lokal")
+                results, scanned = histori.scan_symbols(local)
+                histori.export_scan(scanned)
+                self.results = _top(self.results + results)
+                self.remaining.clear()
+            return sorted(self.results, key=lambda r: r['score'], reverse=True)
+        finally:
+            self.stop()
+
+    def stop(self, timeout=10):
+        """Beendet die Worker und übernimmt deren Metriken"""
+        for worker in list(self.workers):
+            if worker.alive:
+                try:
+                    worker.send({"type": "stop"})
+                except OSError:
+                    pass
+        for worker in list(self.workers):
+            worker.finished.wait(timeout)
+        self._closed = True
+        self.listener.close()
+
+
+def scan_sharded(symbols, shards=4, local_workers=None, address=ADDRESS, authkey=AUTHKEY):
+    """
+    Sharded-Variante von histori.scan_symbols.
+
+    :param shards: Anzahl der Partitionen (= erwartete Worker)
+    :param local_workers: Anzahl lokal gestarteter Worker-Prozesse (Standard: shards);
+                          weitere Worker können sich über `cli.py shard-worker HOST:PORT` anmelden
+    :param authkey: für entfernte Worker Pflicht (SHARD_AUTHKEY); bei einem rein lokalen
+                    Scan auf der Standardadresse wird ohne Schlüssel ein zufälliger erzeugt
+    :return: Kandidaten (Top-K nach Score)
+    """
+    import histori
+
+    if not authkey and address == ADDRESS and local_workers != 0:
+        authkey = secrets.token_bytes(32)
+
+    settings = {key: getattr(histori, key) for key in SETTINGS}
+    coordinator = Coordinator(symbols, shards, address, authkey, settings)
+    print(f"Koordinator lauscht auf {coordinator.address[0]}:{coordinator.address[1]}")
+    local_workers = shards if local_workers is None else local_workers
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(coordinator.address, authkey, f"local-{i}"),
+                                daemon=True)
+        for i in range(local_workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        with metriken.stage("sharded_scan", shards=shards):
+            return coordinator.run()
+    finally:
+        for process in processes:
+            process.join(timeout=5)
@@ -0,0 +1,321 @@
+import asyncio
+import collections
+import itertools
+import json
+import time
+
+import websockets
+
+import metriken
+
+# Globale Einstellungen
+STREAM_URL = "wss://stream.binance.com:9443/stream?streams="
+MAX_STREAMS_PER_CONNECTION = 200   # Binance erlaubt bis zu 1024 Streams pro Verbindung
+RECONNECT_DELAY = 1.0              # Start-Wartezeit vor einem Reconnect (Sekunden)
+MAX_RECONNECT_DELAY = 60.0         # Obergrenze für den exponentiellen Backoff
+
+# Verhalten bei voller Queue eines Konsumenten
+BLOCK = "block"              # Backpressure: Verbindung wartet, bis Platz frei ist
+DROP_NEWEST = "drop_newest"  # neue Nachricht verwerfen
+DROP_OLDEST = "drop_oldest"  # älteste Nachricht verwerfen (immer die aktuellsten Daten)
+
+
+class Consumer:
+    """
+    Empfänger eines oder mehrerer Streams mit begrenzter Queue.
+
+        async for stream, data in consumer:
+            ...
+
+    Mit raw=True werden die Nachrichten nicht dekodiert: Einträge sind
+    (stream, payload, received) mit dem JSON-Text des "data"-Objekts und der
+    Empfangszeit des Frames (time.time()). Für Streams mit hoher Rate, deren
+    Konsument selbst stapelweise parst (siehe get_batch).
+    """
+
+    def __init__(self, streams, maxsize=1000, policy=BLOCK, raw=False):
+        if policy not in (BLOCK, DROP_NEWEST, DROP_OLDEST):
+            raise ValueError(f"Unbekannte Policy: {policy}")
+        self.streams = list(streams)
+        self.policy = policy
+        self.raw = raw
+        self.maxsize = maxsize
+        self.dropped = 0
+        # deque mit zwei Events statt asyncio.Queue: Einfügen ohne Warten ist ein
+        # einfacher Funktionsaufruf, get_batch entnimmt alle wartenden Einträge auf einmal
+        self._items = collections.deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+    def offer(self, item):
+        """Fügt ohne zu warten ein; False nur bei Policy BLOCK und voller Queue"""
+        items = self._items
+        if len(items) >= self.maxsize:
+            if self.policy == BLOCK:
+                self._not_full.clear()
+                return False
+            self.dropped += 1
+            if self.policy == DROP_NEWEST:
+                return True
+            items.popleft()
+        items.append(item)
+        if len(items) == 1:
+            self._not_empty.set()
+        return True
+
+    async def put(self, item):
+        while not self.offer(item):
+            await self._not_full.wait()
+
+    async def get(self):
+        return (await self.get_batch(1))[0]
+
+    async def get_batch(self, max_items=1000):
+        """Wartet auf mindestens einen Eintrag und liefert alle bereits wartenden (höchstens max_items)"""
+        items = self._items
+        while not items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        if len(items) <= max_items:
+            batch = list(items)
+            items.clear()
+        else:
+            batch = [items.popleft() for _ in range(max_items)]
+        self._not_full.set()
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.get()
+
+
+class _Connection:
+    """Eine Combined-Stream-Verbindung mit automatischem Reconnect"""
+
+    def __init__(self, hub, streams):
+        self.hub = hub
+        self.streams = list(streams)
+        self.websocket = None
+        self.task = None
+        self.reconnects = 0
+        self.errors = 0
+
+    async def subscribe(self, streams):
+        self.streams.extend(streams)
+        if self.websocket is not None:
+            try:
+                await self.websocket.send(json.dumps({
+                    "method": "SUBSCRIBE", "params": list(streams), "id": next(self.hub._ids),
+                }))
+            except websockets.ConnectionClosed:
+                pass  # Beim Reconnect wird die vollständige Streamliste ohnehin neu abonniert
+
+    async def unsubscribe(self, streams):
+        self.streams = [stream for stream in self.streams if stream not in streams]
+        if self.websocket is not None:
+            try:
+                await self.websocket.send(json.dumps({
+                    "method": "UNSUBSCRIBE", "params": list(streams), "id": next(self.hub._ids),
+                }))
+            except websockets.ConnectionClosed:
+                pass  # Beim Reconnect wird nur noch die verbleibende Streamliste abonniert
+
+    async def run(self):
+        delay = RECONNECT_DELAY
+        while True:
+            uri = self.hub.url + "/".join(self.streams)
+            try:
+                async with websockets.connect(uri) as websocket:
+                    self.websocket = websocket
+                    delay = RECONNECT_DELAY
+                    print(f"Stream-Hub verbunden ({len(self.streams)} Streams)")
+                    async for frame in websocket:
+                        blocked = self.hub._on_frame(frame, time.time())
+                        if blocked:
+                            await _wait_for_space(blocked)
+            except asyncio.CancelledError:
+                raise
+            except (websockets.WebSocketException, OSError) as e:
+                print(f"Stream-Hub Verbindung getrennt: {e} – neuer Versuch in {delay:.0f}s")
+                metriken.REGISTRY.inc("stream_disconnects", kind="connection")
+            except Exception as e:
+                # Unerwartete Nachricht oder Fehler in einem Konsumenten: nicht die Verbindung verlieren
+                self.errors += 1
+                print(f"Stream-Hub Fehler ({type(e).__name__}: {e}) – neuer Versuch in {delay:.0f}s")
+                metriken.REGISTRY.inc("stream_disconnects", kind=type(e).__name__)
+            finally:
+                self.websocket = None
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+async def _wait_for_space(blocked):
+    """Backpressure: wartet, bis die Konsumenten Platz für ihre Einträge haben"""
+    for consumer, item in blocked:
+        await consumer.put(item)
+
+
+class StreamHub:
+    """
+    Bündelt viele Binance-Streams auf wenige Combined-Stream-Verbindungen und
+    verteilt jede Nachricht an alle Konsumenten des Streams:
+
+        hub = StreamHub()
+        trades = hub.subscribe(["btcusdt@trade", "ethusdt@trade"], policy=DROP_OLDEST)
+        depth = hub.subscribe(["btcusdt@depth20@100ms"], maxsize=10)
+        async with hub:
+            async for stream, data in trades:
+                ...
+    """
+
+    def __init__(self, url=STREAM_URL, max_streams_per_connection=MAX_STREAMS_PER_CONNECTION):
+        self.url = url
+        self.max_streams = max_streams_per_connection
+        self._consumers = {}     # Stream -> Liste von Consumer
+        self._connections = []
+        self._pending = []       # Streams, die noch keiner Verbindung zugeordnet sind
+        self._ids = itertools.count(1)
+        self._running = False
+
+    def subscribe(self, streams, maxsize=1000, policy=BLOCK, raw=False):
+        """
+        Registriert einen Konsumenten für die angegebenen Streams
+        (z.B. "btcusdt@trade", "btcusdt@kline_1m", "btcusdt@depth20@100ms").
+
+        :param raw: Nachrichten undekodiert mit Empfangszeit liefern (siehe Consumer)
+        """
+        if isinstance(streams, str):
+            streams = [streams]
+        consumer = Consumer(streams, maxsize=maxsize, policy=policy, raw=raw)
+        for stream in consumer.streams:
+            if stream not in self._consumers:
+                self._consumers[stream] = []
+                self._pending.append(stream)
+            self._consumers[stream].append(consumer)
+        if self._running:
+            asyncio.get_running_loop().create_task(self._assign_pending())
+        return consumer
+
+    def unsubscribe(self, consumer):
+        """Meldet einen Konsumenten ab; Streams ohne Konsumenten werden auch bei Binance abbestellt"""
+        unused = []
+        for stream in consumer.streams:
+            consumers = self._consumers.get(stream, [])
+            if consumer in consumers:
+                consumers.remove(consumer)
+            if not consumers and stream in self._consumers:
+                del self._consumers[stream]
+                unused.append(stream)
+        if not unused:
+            return
+        self._pending = [stream for stream in self._pending if stream not in unused]
+        for connection in self._connections:
+            streams = [stream for stream in unused if stream in connection.streams]
+            if streams and self._running:
+                asyncio.get_running_loop().create_task(connection.unsubscribe(streams))
+            elif streams:
+                connection.streams = [stream for stream in connection.streams if stream not in streams]
+
+    def _on_frame(self, frame, received):
+        """
+        Verteilt einen Combined-Stream-Frame. Der Streamname wird ohne JSON-Parsing
+        abgetrennt; dekodiert wird nur, wenn ein Konsument ohne raw=True ihn braucht.
+
+        :return: (Konsument, Eintrag) für volle Queues mit Policy BLOCK (siehe _wait_for_space)
+        """
+        if frame.startswith('{"stream":"'):
+            end = frame.find('"', 11)
+            start = frame.find('"data":', end) + 7
+            stream, payload = frame[11:end], frame[start:-1]
+        else:
+            message = json.loads(frame)
+            stream = message.get("stream")
+            if stream is None:
+                return None  # Antwort auf SUBSCRIBE/UNSUBSCRIBE
+            payload = json.dumps(message["data"], separators=(",", ":"))
+        return self._dispatch(stream, payload, received)
+
+    def _dispatch(self, stream, payload, received):
+        data = None
+        blocked = None
+        for consumer in self._consumers.get(stream, ()):
+            if consumer.raw:
+                item = (stream, payload, received)
+            else:
+                if data is None:
+                    data = json.loads(payload)
+                item = (stream, data)
+            if not consumer.offer(item):
+                blocked = blocked or []
+                blocked.append((consumer, item))
+        return blocked
+
+    async def _assign_pending(self):
+        """Verteilt neue Streams auf bestehende Verbindungen mit freier Kapazität oder neue"""
+        pending, self._pending = self._pending, []
+        for connection in self._connections:
+            free = self.max_streams - len(connection.streams)
+            if free > 0 and pending:
+                batch, pending = pending[:free], pending[free:]
+                await connection.subscribe(batch)
+        while pending:
+            batch, pending = pending[:self.max_streams], pending[self.max_streams:]
+            connection = _Connection(self, batch)
+            connection.task = asyncio.get_running_loop().create_task(connection.run())
+            self._connections.append(connection)
+
+    async def start(self):
+        self._running = True
+        await self._assign_pending()
+
+    async def stop(self):
+        self._running = False
+        for connection in self._connections:
+            connection.task.cancel()
+        await asyncio.gather(*(c.task for c in self._connections), return_exceptions=True)
+        self._connections = []
+        self._pending = list(self._consumers)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def stats(self):
+        """Verbindungen, Reconnects, Fehler und verworfene Nachrichten pro Stream"""
+        return {
+            "connections": len(self._connections),
+            "reconnects": sum(c.reconnects for c in self._connections),
+            "errors": sum(c.errors for c in self._connections),
+            "dropped": {
+                stream: sum(c.dropped for c in consumers)
+                for stream, consumers in self._consumers.items()
+            },
+        }
+
+
+async def _demo(symbols):
+    from bars import BarHub
+
+    hub = StreamHub()
+    bars = BarHub()
+    for symbol in symbols:
+        bars.add(symbol, "tick_100", "tick", 100)
+    trades = hub.subscribe([f"{s.lower()}@trade" for s in symbols], policy=DROP_OLDEST)
+    async with hub:
+        async for stream, trade in trades:
+            for name, bar in bars.on_message(trade) or ():
+                print(f"{trade['s']} {name}: close={bar[4]:.4f} volume={bar[5]:.4f}")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_demo(["BTCUSDT", "ETHUSDT", "BNBUSDT"]))
+    except KeyboardInterrupt:
+        print("Streaming beendet.")
@@ -0,0 +1,457 @@
+import heapq
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+
+import festkomma
+from trade_tape import FLOAT_DTYPE, TradeTape, to_float
+
+# Globale Einstellungen
+INITIAL_CASH = 50_000     # wie bei run_backtest
+TAKER_FEE = 0.001         # Gebühr für Orders, die Liquidität nehmen (0,1 %)
+MAKER_FEE = 0.001         # Gebühr für ruhende Limit-Orders, die gefüllt werden
+LATENCY_MS = 50           # feste Latenz Entscheidung -> Börse
+JITTER_MS = 20            # Mittelwert des exponentiell verteilten Zusatzanteils
+
+BUY = 1
+SELL = -1
+
+INF = float("inf")
+
+
+class LatencyModel:
+    """
+    Verzögerung zwischen der Entscheidung der Strategie und dem Eintreffen
+    der Order (bzw. Stornierung) an der Börse: feste Grundlatenz plus
+    exponentiell verteilter Jitter. Mit seed reproduzierbar.
+    """
+
+    def __init__(self, base_ms=LATENCY_MS, jitter_ms=JITTER_MS, seed=0):
+        self.base_ms = base_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+
+    def sample(self):
+        if not self.jitter_ms:
+            return self.base_ms
+        return self.base_ms + self._random.expovariate(1 / self.jitter_ms)
+
+    @classmethod
+    def from_monitor(cls, monitor, stream, seed=0):
+        """
+        Übernimmt die gemessene Marktdaten-Latenz eines latenz.LatencyMonitor
+        (p50 als Grundlatenz, p99 - p50 als Jitter) als Näherung für den Orderweg.
+        """
+        stats = monitor.summary(stream)
+        p50 = stats["exchange_to_receive_p50_ms"] or LATENCY_MS
+        p99 = stats["exchange_to_receive_p99_ms"] or p50
+        return cls(p50, max(0.0, p99 - p50), seed)
+
+
+class Order:
+    __slots__ = ("id", "side", "qty", "limit", "submitted", "arrival", "filled", "status")
+
+    def __init__(self, order_id, side, qty, limit, submitted, arrival):
+        self.id = order_id
+        self.side = side
+        self.qty = qty
+        self.limit = limit
+        self.submitted = submitted
+        self.arrival = arrival
+        self.filled = 0.0
+        self.status = "pending"   # pending, open, filled, partial, cancelled
+
+    @property
+    def remaining(self):
+        return self.qty - self.filled
+
+
+class TickStrategy:
+    """
+    Basisklasse für Strategien des Tick-Backtests. Nicht überschriebene
+    Methoden werden in der Ereignisschleife gar nicht erst aufgerufen.
+    """
+
+    def on_start(self, bt):
+        pass
+
+    def on_trade(self, bt, time_ms, price, qty, maker):
+        pass
+
+    def on_book(self, bt, time_ms, bids, asks):
+        """bids/asks als Arrays (Level, 2) mit Preis und Menge wie von BookTape.replay"""
+        pass
+
+    def on_fill(self, bt, fill):
+        pass
+
+
+class TickBacktest:
+    """
+    Ereignisgesteuerter Backtest auf aufgezeichneten Trades (TradeTape) und
+    Orderbüchern (BookTape).
+
+    Trades und Orderbuch-Stände werden zeitlich gemischt abgearbeitet. Orders
+    der Strategie erreichen die Börse erst nach der Latenz des LatencyModel und
+    werden dann gegen das zu diesem Zeitpunkt gültige Orderbuch ausgeführt:
+    Marktorders laufen das Buch Level für Level ab (nicht ausführbarer Rest
+    verfällt), Limit-Orders nehmen zunächst alle Level bis zum Limit und ruhen
+    danach. Ruhende Orders gelten als gefüllt, sobald ein Trade den Limitpreis
+    durchschreitet (konservativ ohne Warteschlangenposition). Verbrauchte
+    Liquidität bleibt bis zum nächsten Orderbuch-Stand entfernt. Ohne
+    Orderbuch wird zum letzten Tradepreis ausgeführt.
+    """
+
+    def __init__(self, strategy, latency=None, cash=INITIAL_CASH, taker_fee=TAKER_FEE,
+                 maker_fee=MAKER_FEE):
+        self.strategy = strategy
+        self.latency = latency or LatencyModel()
+        self.initial_cash = cash
+        self.cash = cash
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+        self.position = 0.0
+        self.fees = 0.0
+        self.time = None
+        self.last_price = None
+        self.bids = self.asks = None
+        self.fills = []           # (Zeit, Order-ID, Seite, Preis, Menge, Gebühr, "taker"/"maker")
+        self.orders = {}          # Order-ID -> Order
+        self._queue = []          # Heap (Ankunft, laufende Nummer, Aktion, Order)
+        self._resting = []        # ruhende Limit-Orders
+        self._bid_limit = -INF    # höchster ruhender Kauf-Limitpreis
+        self._ask_limit = INF     # niedrigster ruhender Verkaufs-Limitpreis
+        self._seq = 0
+        self._peak = cash
+        self._max_drawdown = 0.0
+        self._books = iter(())
+        self._next_book = None
+        self._book_time = INF
+        self.book_count = 0
+
+    # --- Schnittstelle für Strategien ---
+
+    def buy(self, qty, limit=None):
+        return self._submit(BUY, qty, limit)
+
+    def sell(self, qty, limit=None):
+        return self._submit(SELL, qty, limit)
+
+    def cancel(self, order_id):
+        """Storniert eine Order; die Stornierung unterliegt derselben Latenz"""
+        order = self.orders.get(order_id)
+        if order is not None and order.status in ("pending", "open"):
+            self._seq += 1
+            heapq.heappush(self._queue, (self.time + self.latency.sample(), self._seq, "cancel", order))
+
+    @property
+    def in_flight(self):
+        """Anzahl noch nicht erledigter Orders (unterwegs oder ruhend)"""
+        return len(self._queue) + len(self._resting)
+
+    @property
+    def mark(self):
+        """Bewertungskurs: Mid des Orderbuchs, sonst letzter Tradepreis"""
+        if self.bids is not None and len(self.bids) and len(self.asks):
+            return (self.bids[0, 0] + self.asks[0, 0]) / 2
+        return self.last_price
+
+    @property
+    def equity(self):
+        mark = self.mark
+        return self.cash + (self.position * mark if mark is not None else 0.0)
+
+    def _submit(self, side, qty, limit):
+        self._seq += 1
+        arrival = self.time + self.latency.sample()
+        order = Order(self._seq, side, float(qty), limit, self.time, arrival)
+        self.orders[order.id] = order
+        heapq.heappush(self._queue, (arrival, self._seq, "new", order))
+        return order.id
+
+    # --- Ereignisschleife ---
+
+    def run(self, trade_chunks, books=()):
+        """
+        :param trade_chunks: Iterable von Arrays im Format trade_tape.FLOAT_DTYPE (zeitlich sortiert)
+        :param books: Iterable von (time_ms, bids, asks), z.B. BookTape.replay
+        :return: Ergebnis-Dictionary (siehe results)
+        """
+        strategy = self.strategy
+        on_trade = strategy.on_trade if type(strategy).on_trade is not TickStrategy.on_trade else None
+        self._books = iter(books)
+        self._next_book = next(self._books, None)
+        self._book_time = self._next_book[0] if self._next_book is not None else INF
+        queue = self._queue
+        trade_count = 0
+        started = time.perf_counter()
+        strategy.on_start(self)
+
+        for chunk in trade_chunks:
+            times = chunk["time"].tolist()
+            prices = chunk["price"].tolist()
+            quantities = chunk["qty"].tolist()
+            makers = chunk["maker"].tolist()
+            trade_count += len(times)
+            for t, price, qty, maker in zip(times, prices, quantities, makers):
+                if self._book_time <= t or (queue and queue[0][0] <= t):
+                    self._advance(t)
+                self.time = t
+                self.last_price = price
+                if price < self._bid_limit or price > self._ask_limit:
+                    self._match_resting(t, price, qty)
+                if on_trade is not None:
+                    on_trade(self, t, price, qty, maker)
+
+        # Restliche Orderbuch-Stände und Orders nach dem letzten Trade
+        self._advance(INF)
+        return self.results(trade_count, time.perf_counter() - started)
+
+    def _advance(self, until):
+        """Arbeitet Orderbuch-Stände und eintreffende Orders bis einschließlich `until` ab"""
+        queue = self._queue
+        on_book = self.strategy.on_book if type(self.strategy).on_book is not TickStrategy.on_book else None
+        while True:
+            order_time = queue[0][0] if queue else INF
+            if self._book_time <= order_time and self._book_time <= until and self._book_time < INF:
+                # Bei gleicher Zeit zuerst das Orderbuch, dann die Order
+                t, bids, asks = self._next_book
+                self.time = t
+                self.bids, self.asks = bids, asks
+                self.book_count += 1
+                self._next_book = next(self._books, None)
+                self._book_time = self._next_book[0] if self._next_book is not None else INF
+                self._update_drawdown()
+                if on_book is not None:
+                    on_book(self, t, bids, asks)
+            elif order_time <= until and order_time < INF:
+                arrival, _, action, order = heapq.heappop(queue)
+                if self.time is None or arrival > self.time:
+                    self.time = arrival
+                if action == "cancel":
+                    self._cancel(order)
+                else:
+                    self._execute(order)
+            else:
+                return
+
+    def _execute(self, order):
+        buy = order.side == BUY
+        levels = self.asks if buy else self.bids
+        if levels is None:
+            # Kein Orderbuch aufgezeichnet: zum letzten Tradepreis
+            price = self.last_price
+            if price is not None and (order.limit is None or (price <= order.limit if buy else price >= order.limit)):
+                self._fill(order, price, order.qty, "taker")
+        elif len(levels):
+            levels = levels.copy()   # verbrauchte Liquidität nur lokal entfernen
+            for i in range(len(levels)):
+                price, available = levels[i]
+                if available <= 0:
+                    continue
+                if order.limit is not None and (price > order.limit if buy else price < order.limit):
+                    break
+                take = min(order.remaining, available)
+                levels[i, 1] = available - take
+                self._fill(order, float(price), float(take), "taker")
+                if order.remaining <= 1e-12:
+                    break
+            if buy:
+                self.asks = levels
+            else:
+                self.bids = levels
+
+        if order.remaining <= 1e-12:
+            order.status = "filled"
+        elif order.limit is not None:
+            order.status = "open"
+            self._resting.append(order)
+            self._update_limits()
+        else:
+            order.status = "partial" if order.filled else "cancelled"
+
+    def _match_resting(self, t, price, qty):
+        """Ein Trade durch den Limitpreis füllt ruhende Orders (höchstens bis zur Trademenge)"""
+        for order in list(self._resting):
+            if qty <= 0:
+                break
+            if (order.side == BUY and price < order.limit) or (order.side == SELL and price > order.limit):
+                take = min(order.remaining, qty)
+                qty -= take
+                self._fill(order, order.limit, take, "maker")
+                if order.remaining <= 1e-12:
+                    order.status = "filled"
+                    self._resting.remove(order)
+        self._update_limits()
+
+    def _cancel(self, order):
+        if order.status == "open":
+            self._resting.remove(order)
+            self._update_limits()
+        if order.status in ("pending", "open"):
+            order.status = "cancelled"
+
+    def _update_limits(self):
+        self._bid_limit = max((o.limit for o in self._resting if o.side == BUY), default=-INF)
+        self._ask_limit = min((o.limit for o in self._resting if o.side == SELL), default=INF)
+
+    def _fill(self, order, price, qty, liquidity):
+        notional = price * qty
+        fee = notional * (self.taker_fee if liquidity == "taker" else self.maker_fee)
+        order.filled += qty
+        self.cash -= order.side * notional + fee
+        self.position += order.side * qty
+        self.fees += fee
+        fill = (self.time, order.id, order.side, price, qty, fee, liquidity)
+        self.fills.append(fill)
+        self._update_drawdown()
+        self.strategy.on_fill(self, fill)
+
+    def _update_drawdown(self):
+        equity = self.equity
+        if equity > self._peak:
+            self._peak = equity
+        elif self._peak > 0:
+            self._max_drawdown = max(self._max_drawdown, 1 - equity / self._peak)
+
+    def results(self, trade_count=0, seconds=0.0):
+        equity = self.equity
+        events = trade_count + self.book_count
+        return {
+            "events": events,
+            "trades": trade_count,
+            "books": self.book_count,
+            "orders": len(self.orders),
+            "fills": len(self.fills),
+            "position": self.position,
+            "cash": self.cash,
+            "equity": equity,
+            "pnl": equity - self.initial_cash,
+            "return_pct": (equity / self.initial_cash - 1) * 100,
+            "fees": self.fees,
+            "max_drawdown_pct": self._max_drawdown * 100,
+            "seconds": seconds,
+            "events_per_second": events / seconds if seconds else None,
+        }
+
+
+class BookImbalanceStrategy(TickStrategy):
+    """
+    Beispielstrategie auf Orderbuch-Ständen: kauft bei deutlichem Übergewicht
+    der Bid-Mengen in den obersten Leveln, verkauft (bzw. geht short) bei
+    Übergewicht der Asks.
+    """
+
+    def __init__(self, threshold=0.3, qty=0.01, levels=5):
+        self.threshold = threshold
+        self.qty = qty
+        self.levels = levels
+
+    def on_book(self, bt, time_ms, bids, asks):
+        if bt.in_flight or not len(bids) or not len(asks):
+            return
+        bid_qty = bids[:self.levels, 1].sum()
+        ask_qty = asks[:self.levels, 1].sum()
+        imbalance = (bid_qty - ask_qty) / (bid_qty + ask_qty)
+        if imbalance > self.threshold and bt.position <= 0:
+            bt.buy(self.qty - bt.position)
+        elif imbalance < -self.threshold and bt.position >= 0:
+            bt.sell(self.qty + bt.position)
+
+
+class TradeFlowStrategy(TickStrategy):
+    """
+    Beispielstrategie nur auf Trades: folgt dem Vorzeichen des Taker-Volumens
+    der letzten `window` Trades (für Tapes ohne Orderbuch-Aufzeichnung).
+    """
+
+    def __init__(self, window=500, threshold=0.3, qty=0.01):
+        self.window = deque(maxlen=window)
+        self.threshold = threshold
+        self.qty = qty
+        self.flow = 0.0
+        self.volume = 0.0
+
+    def on_trade(self, bt, time_ms, price, qty, maker):
+        window = self.window
+        if len(window) == window.maxlen:
+            old = window[0]
+            self.flow -= old
+            self.volume -= abs(old)
+        signed = -qty if maker else qty
+        window.append(signed)
+        self.flow += signed
+        self.volume += qty
+        if len(window) < window.maxlen or bt.in_flight:
+            return
+        pressure = self.flow / self.volume
+        if pressure > self.threshold and bt.position <= 0:
+            bt.buy(self.qty - bt.position)
+        elif pressure < -self.threshold and bt.position >= 0:
+            bt.sell(self.qty + bt.position)
+
+
+def _trade_chunks(tape, symbol, start_ms, end_ms):
+    """Trades tageweise, damit nie mehr als ein Tag gleichzeitig im Speicher liegt"""
+    fixed = festkomma.for_symbol(symbol)
+    day = datetime.fromtimestamp(start_ms / 1000, tz=timezone.utc).date()
+    for name in tape.days(symbol):
+        if name < day.isoformat():
+            continue
+        day_start = int(datetime.fromisoformat(name).replace(tzinfo=timezone.utc).timestamp() * 1000)
+        if day_start >= end_ms:
+            return
+        chunk = tape.query(symbol, max(start_ms, day_start), min(end_ms, day_start + 86_400_000), fixed)
+        if len(chunk):
+            yield to_float(chunk, fixed)
+
+
+def backtest_ticks(symbol, strategy, start_ms, end_ms, tape=None, books=None, depth=None, **kwargs):
+    """
+    Tick-Backtest eines Symbols über [start_ms, end_ms).
+
+    :param tape: TradeTape mit den Trades (Standard: trade_tape.TAPE_DIR)
+    :param books: optionales BookTape; ohne Orderbuch wird zum letzten Tradepreis ausgeführt
+    :param depth: Anzahl Level pro Seite, die der Strategie bzw. der Ausführung zur Verfügung stehen
+    :param kwargs: weitere Argumente für TickBacktest (latency, cash, taker_fee, maker_fee)
+    """
+    tape = tape or TradeTape()
+    bt = TickBacktest(strategy, **kwargs)
+    replay = books.replay(symbol, start_ms, end_ms, depth) if books is not None else ()
+    result = bt.run(_trade_chunks(tape, symbol, start_ms, end_ms), replay)
+    result["fill_log"] = bt.fills
+    return result
+
+
+if __name__ == "__main__":
+    # Durchsatz mit synthetischen Daten: 2 Mio. Trades und ein Orderbuch-Stand alle 100 ms
+    rng = np.random.default_rng(0)
+    n = 2_000_000
+    start_ms = 1_700_000_000_000
+    trades = np.empty(n, dtype=FLOAT_DTYPE)
+    trades["trade_id"] = np.arange(n)
+    trades["time"] = start_ms + np.cumsum(rng.integers(0, 3, n))
+    trades["price"] = 50_000 * np.exp(np.cumsum(rng.normal(0, 0.00002, n)))
+    trades["qty"] = rng.exponential(0.05, n)
+    trades["maker"] = rng.random(n) < 0.5
+
+    def synthetic_books(depth=20):
+        times = trades["time"]
+        steps = np.arange(times[0], times[-1], 100)
+        mids = trades["price"][np.searchsorted(times, steps)]
+        offsets = np.arange(1, depth + 1) * 0.5
+        for t, mid in zip(steps.tolist(), mids.tolist()):
+            sizes = rng.exponential(0.5, (2, depth))
+            yield (t, np.column_stack([mid - offsets, sizes[0]]), np.column_stack([mid + offsets, sizes[1]]))
+
+    for name, strategy, books in (
+        ("ohne Strategie", TickStrategy(), ()),
+        ("TradeFlowStrategy", TradeFlowStrategy(), ()),
+        ("BookImbalanceStrategy", BookImbalanceStrategy(threshold=0.6), synthetic_books()),
+    ):
+        result = TickBacktest(strategy).run([trades], books)
+        print(f"{name:<22} {result['events']:>10,} Ereignisse, {result['events_per_second'] * 60 / 1e6:6.1f} Mio./min, "
+              f"{result['fills']:>6} Fills, PnL {result['pnl']:10.2f}")
@@ -0,0 +1,241 @@
+import os
+import struct
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import festkomma
+
+# Globale Einstellungen
+TAPE_DIR = "tape"         # Wurzelverzeichnis für die Trade-Logs
+FLUSH_EVERY = 1000        # Anzahl gepufferter Trades bis zum Schreiben auf die Platte
+
+MAGIC = b"TAPE"
+VERSION = 1
+HEADER = struct.Struct("<4sIIBBH")  # Magic, Version, Recordgröße, Preis-/Mengenstellen, reserviert
+
+# Fester Record pro Trade (33 Bytes, ohne Padding). Preis und Menge als
+# Festkomma (int64) mit den Stellen aus dem Dateiheader, siehe festkomma.py.
+TRADE_DTYPE = np.dtype([
+    ("trade_id", "<i8"),
+    ("time", "<i8"),          # Trade-Zeit (Feld "T") in Millisekunden
+    ("price", "<i8"),
+    ("qty", "<i8"),
+    ("maker", "u1"),          # 1 = Käufer war Maker (Feld "m")
+])
+
+# Gleiche Felder mit float64 für Preis und Menge (für Auswertungen, siehe to_float)
+FLOAT_DTYPE = np.dtype([
+    ("trade_id", "<i8"),
+    ("time", "<i8"),
+    ("price", "<f8"),
+    ("qty", "<f8"),
+    ("maker", "u1"),
+])
+
+
+def to_float(records, fixed):
+    """Festkomma-Records (Stellen von `fixed`) -> Records im Format FLOAT_DTYPE"""
+    result = np.empty(len(records), dtype=FLOAT_DTYPE)
+    for name in ("trade_id", "time", "maker"):
+        result[name] = records[name]
+    result["price"] = fixed.to_price(records["price"])
+    result["qty"] = fixed.to_qty(records["qty"])
+    return result
+
+
+def _day_of(time_ms):
+    return datetime.fromtimestamp(time_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+class TradeTape:
+    """
+    Append-only Trade-Log mit einer Datei pro Symbol und Tag:
+
+        <root>/<SYMBOL>/<YYYY-MM-DD>.tape
+
+    Jede Datei besteht aus einem 16-Byte-Header und danach lückenlos
+    aneinandergereihten Records im Format TRADE_DTYPE. Preise und Mengen sind
+    ganzzahlig (Festkomma mit den Stellen aus tickSize/stepSize, im Header
+    vermerkt). Gelesen wird über np.memmap, so dass auch wochenlange Tickdaten
+    nicht in den Speicher geladen werden müssen.
+    """
+
+    def __init__(self, root=TAPE_DIR, flush_every=FLUSH_EVERY):
+        self.root = root
+        self.flush_every = flush_every
+        self._buffers = {}  # (symbol, day, Preisstellen, Mengenstellen) -> Liste von Tupeln
+
+    def path(self, symbol, day):
+        return os.path.join(self.root, symbol.upper(), f"{day}.tape")
+
+    def append(self, symbol, trade_id, time_ms, price, qty, maker, fixed=None):
+        """
+        :param price, qty: Festkomma-Einheiten von `fixed` (Standard: festkomma.for_symbol)
+        """
+        fixed = fixed or festkomma.for_symbol(symbol)
+        key = (symbol.upper(), _day_of(time_ms), fixed.price_decimals, fixed.qty_decimals)
+        buffer = self._buffers.setdefault(key, [])
+        buffer.append((trade_id, time_ms, price, qty, maker))
+        if len(buffer) >= self.flush_every:
+            self._flush(key)
+
+    def append_message(self, symbol, trade):
+        """Übernimmt eine Nachricht aus dem <symbol>@trade-Stream"""
+        fixed = festkomma.for_symbol(symbol)
+        self.append(symbol, trade["t"], trade["T"], fixed.price(trade["p"]),
+                    fixed.qty(trade["q"]), trade["m"], fixed)
+
+    def flush(self):
+        for key in list(self._buffers):
+            self._flush(key)
+
+    def _flush(self, key):
+        buffer = self._buffers.get(key)
+        if not buffer:
+            self._buffers.pop(key, None)
+            return
+        symbol, day, price_decimals, qty_decimals = key
+        path = self.path(symbol, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        records = np.array(buffer, dtype=TRADE_DTYPE)
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER.size:
+            # Bestehende Datei behält ihre Stellen (z.B. nach nachträglich geladener exchangeInfo);
+            # hätten die neuen Trades dafür zu viele Stellen, wird die Datei auf die feinere Skalierung umgestellt
+            _, _, _, file_price, file_qty, _ = self._header(path)
+            try:
+                prices = festkomma.rescale(records["price"], price_decimals, file_price)
+                quantities = festkomma.rescale(records["qty"], qty_decimals, file_qty)
+            except ValueError:
+                file_price, file_qty = max(file_price, price_decimals), max(file_qty, qty_decimals)
+                self._rescale_file(symbol, day, file_price, file_qty)
+                prices = festkomma.rescale(records["price"], price_decimals, file_price)
+                quantities = festkomma.rescale(records["qty"], qty_decimals, file_qty)
+            records["price"], records["qty"] = prices, quantities
+            with open(path, "ab") as f:
+                f.write(records.tobytes())
+        else:
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, TRADE_DTYPE.itemsize, price_decimals, qty_decimals, 0))
+                f.write(records.tobytes())
+        # Erst nach erfolgreichem Schreiben verwerfen; bei einem Fehler bleiben die Trades gepuffert
+        del self._buffers[key]
+
+    def _rescale_file(self, symbol, day, price_decimals, qty_decimals):
+        """Schreibt die Datei eines Tages mit neuen Stellen neu (atomar über eine temporäre Datei)"""
+        path = self.path(symbol, day)
+        stored = self.fixed_point(symbol, day)
+        records = np.array(self.read_day(symbol, day))
+        records["price"] = festkomma.rescale(records["price"], stored.price_decimals, price_decimals)
+        records["qty"] = festkomma.rescale(records["qty"], stored.qty_decimals, qty_decimals)
+        temp = path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, TRADE_DTYPE.itemsize, price_decimals, qty_decimals, 0))
+            f.write(records.tobytes())
+        os.replace(temp, path)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _header(path):
+        with open(path, "rb") as f:
+            return HEADER.unpack(f.read(HEADER.size))
+
+    def fixed_point(self, symbol, day):
+        """Festkomma-Stellen der Datei eines Tages (None ohne Datei)"""
+        path = self.path(symbol, day)
+        if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+            return None
+        _, _, _, price_decimals, qty_decimals, _ = self._header(path)
+        return festkomma.FixedPoint(symbol.upper(), price_decimals, qty_decimals)
+
+    def read_day(self, symbol, day):
+        """
+        Liefert alle Trades eines Tages als schreibgeschütztes memmap-Array
+        (leeres Array, falls keine Datei existiert). Preise und Mengen in den
+        Einheiten von fixed_point(symbol, day).
+        """
+        path = self.path(symbol, day)
+        if not os.path.exists(path) or os.path.getsize(path) <= HEADER.size:
+            return np.empty(0, dtype=TRADE_DTYPE)
+        magic, version, record_size, _, _, _ = self._header(path)
+        if magic != MAGIC or version != VERSION or record_size != TRADE_DTYPE.itemsize:
+            raise ValueError(f"Unbekanntes Tape-Format: {path}")
+        count = (os.path.getsize(path) - HEADER.size) // TRADE_DTYPE.itemsize
+        return np.memmap(path, dtype=TRADE_DTYPE, mode="r", offset=HEADER.size, shape=(count,))
+
+    def _read(self, symbol, day, fixed):
+        """Trades eines Tages in den Einheiten von `fixed` (ohne Kopie, wenn die Stellen übereinstimmen)"""
+        tape = self.read_day(symbol, day)
+        if not len(tape):
+            return tape
+        stored = self.fixed_point(symbol, day)
+        if (stored.price_decimals, stored.qty_decimals) == (fixed.price_decimals, fixed.qty_decimals):
+            return tape
+        converted = np.array(tape)
+        converted["price"] = festkomma.rescale(converted["price"], stored.price_decimals, fixed.price_decimals)
+        converted["qty"] = festkomma.rescale(converted["qty"], stored.qty_decimals, fixed.qty_decimals)
+        return converted
+
+    def query(self, symbol, start_ms, end_ms, fixed=None):
+        """
+        Liefert alle Trades mit start_ms <= time < end_ms, Preise und Mengen in
+        den Einheiten von `fixed` (Standard: festkomma.for_symbol; mit
+        to_float(trades, fixed) in float umrechenbar).
+
+        Die Records einer Datei sind nach Trade-Zeit sortiert (Reihenfolge des
+        Streams), daher dient die Zeitspalte selbst als Index: per Binärsuche
+        werden nur die Seiten des gesuchten Fensters eingelesen. Liegt das
+        Fenster innerhalb eines Tages und stimmen die Stellen überein, ist das
+        Ergebnis eine View ohne Kopie.
+
+        :raise ValueError: wenn gespeicherte Werte mehr Stellen haben, als `fixed` darstellen kann
+        """
+        fixed = fixed or festkomma.for_symbol(symbol)
+        parts = []
+        day = datetime.fromtimestamp(start_ms / 1000, tz=timezone.utc).date()
+        last_day = datetime.fromtimestamp((end_ms - 1) / 1000, tz=timezone.utc).date()
+        while day <= last_day:
+            tape = self._read(symbol, day.isoformat(), fixed)
+            if len(tape):
+                times = tape["time"]
+                lo = np.searchsorted(times, start_ms, side="left")
+                hi = np.searchsorted(times, end_ms, side="left")
+                if hi > lo:
+                    parts.append(tape[lo:hi])
+            day += timedelta(days=1)
+        if not parts:
+            return np.empty(0, dtype=TRADE_DTYPE)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def days(self, symbol):
+        """Alle Tage, für die ein Tape existiert"""
+        directory = os.path.join(self.root, symbol.upper())
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-5] for name in os.listdir(directory) if name.endswith(".tape"))
+
+
+if __name__ == "__main__":
+    import time
+
+    tape = TradeTape()
+    symbol = "BTCUSDT"
+    now_ms = int(time.time() * 1000)
+    fixed = festkomma.for_symbol(symbol)
+    trades = tape.query(symbol, now_ms - 3_600_000, now_ms, fixed)
+    print(f"{len(trades)} Trades in der letzten Stunde für {symbol}")
+    if len(trades):
+        print(f"Volumen (exakt): {fixed.format_qty(trades['qty'].sum())}")
+        trades = to_float(trades, fixed)
+        print(f"Volumen: {trades['qty'].sum():.4f}, VWAP: "
+              f"{(trades['price'] * trades['qty']).sum() / trades['qty'].sum():.2f}")